@@ -0,0 +1,45 @@
+import hashlib
+import json
+import os
+from typing import Optional, Sequence
+
+from cache import MISSING, TieredCache
+from intent_cache import normalize_query
+
+# ANSWER CACHE
+#
+# meal_recommendation and recipe_query answers are written by Gemini from the
+# retrieved recipes. The same question that retrieves the same recipes gets
+# the same prompt, so the answer is kept under (intent, normalized query,
+# ordered recipe ids, prompt version, model). Changing a prompt template
+# means bumping PROMPT_VERSION in main.py; changing the recipes changes the
+# retrieved ids.
+
+ANSWER_CACHE = TieredCache(
+    "answers",
+    max_entries=int(os.getenv("MATKOMPIS_ANSWER_CACHE_SIZE", "1024")),
+    ttl=float(os.getenv("MATKOMPIS_ANSWER_CACHE_TTL", str(6 * 3600))) or None,
+    db_path=os.getenv("MATKOMPIS_ANSWER_CACHE_DB") or None,
+    disk_max_entries=int(os.getenv("MATKOMPIS_ANSWER_CACHE_DISK_SIZE", "50000")) or None,
+)
+
+
+def answer_key(intent: str, query: str, recipe_ids: Sequence[str], prompt_version: str,
+               model_name: str, **params) -> str:
+    """Digest of everything that goes into a RAG prompt; `params` are other prompt inputs (e.g. quantity)."""
+    parts = [intent, normalize_query(query or ""), list(recipe_ids), prompt_version, model_name,
+             sorted((k, str(v)) for k, v in params.items())]
+    raw = json.dumps(parts, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def cached_answer(key: Optional[str]) -> Optional[str]:
+    if not key:
+        return None
+    value = ANSWER_CACHE.get(key)
+    return None if value is MISSING else value
+
+
+def store_answer(key: Optional[str], answer: str):
+    if key and answer:
+        ANSWER_CACHE.set(key, answer)
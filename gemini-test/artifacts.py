@@ -0,0 +1,167 @@
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import faiss
+import numpy as np
+
+from telemetry import get_logger
+
+# ARTIFACT STORE
+#
+# FAISS indexes and embedding matrices are opened once and shared by every
+# request. `.npy` files are memory-mapped so several workers on one host share
+# the same pages, and a watcher thread swaps in new versions when the files on
+# disk change (write the new file next to the old one and os.replace() it).
+
+log = get_logger(__name__)
+
+
+def default_search_dirs() -> List[Path]:
+    dirs = []
+    if os.getenv("MATKOMPIS_ARTIFACT_DIR"):
+        dirs.append(Path(os.getenv("MATKOMPIS_ARTIFACT_DIR")))
+    dirs.append(Path(__file__).parent)
+    dirs.append(Path.cwd())
+    return dirs
+
+
+def load_npy(path: Path):
+    return np.load(path, mmap_mode="r")
+
+
+def load_json(path: Path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def load_faiss(path: Path):
+    try:
+        return faiss.read_index(str(path), faiss.IO_FLAG_MMAP)
+    except RuntimeError:
+        # Not every index type can be mapped; fall back to a normal read
+        return faiss.read_index(str(path))
+
+
+LOADERS = {
+    ".npy": load_npy,
+    ".faiss": load_faiss,
+    ".json": load_json,
+}
+
+
+class Artifact:
+    def __init__(self, name: str, filename: str, loader: Callable[[Path], Any]):
+        self.name = name
+        self.filename = filename
+        self.loader = loader
+        self.path: Optional[Path] = None
+        self.value: Any = None
+        self.version: Optional[Tuple[int, int]] = None
+
+
+def file_version(path: Path) -> Tuple[int, int]:
+    st = path.stat()
+    return (st.st_mtime_ns, st.st_size)
+
+
+class ArtifactStore:
+    def __init__(self, search_dirs: Optional[List[Path]] = None, poll_interval: float = 5.0):
+        self.search_dirs = search_dirs or default_search_dirs()
+        self.poll_interval = poll_interval
+        self._artifacts: Dict[str, Artifact] = {}
+        self._listeners: Dict[str, List[Callable[[str, Any], None]]] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def register(self, name: str, filename: str, loader: Optional[Callable[[Path], Any]] = None):
+        if loader is None:
+            loader = LOADERS[Path(filename).suffix]
+        self._artifacts[name] = Artifact(name, filename, loader)
+
+    def subscribe(self, name: str, callback: Callable[[str, Any], None]):
+        """Call `callback(name, value)` after `name` is (re)loaded."""
+        self._listeners.setdefault(name, []).append(callback)
+
+    def resolve(self, filename: str) -> Path:
+        for d in self.search_dirs:
+            path = Path(d) / filename
+            if path.exists():
+                return path
+        raise FileNotFoundError(f"{filename} not found in {[str(d) for d in self.search_dirs]}")
+
+    def _load(self, art: Artifact) -> bool:
+        path = self.resolve(art.filename)
+        version = file_version(path)
+        if art.value is not None and art.path == path and art.version == version:
+            return False
+        value = art.loader(path)
+        # Readers hold on to whatever they fetched; swapping the reference is atomic
+        art.path, art.version, art.value = path, version, value
+        log.info(f"Loaded artifact {art.name} from {path}")
+        for cb in self._listeners.get(art.name, []):
+            try:
+                cb(art.name, value)
+            except Exception as e:
+                log.warning(f"Artifact listener for {art.name} failed: {e}")
+        return True
+
+    def get(self, name: str) -> Any:
+        art = self._artifacts[name]
+        value = art.value
+        if value is not None:
+            return value
+        with self._lock:
+            if art.value is None:
+                self._load(art)
+            return art.value
+
+    def version(self, name: str) -> Optional[Tuple[int, int]]:
+        art = self._artifacts[name]
+        if art.value is None:
+            self.get(name)
+        return art.version
+
+    def refresh(self):
+        """Reload every artifact whose file changed since it was loaded."""
+        changed = []
+        for art in list(self._artifacts.values()):
+            if art.value is None:
+                continue
+            try:
+                with self._lock:
+                    if self._load(art):
+                        changed.append(art.name)
+            except Exception as e:
+                # A half-written file stays unloaded; we keep serving the old one
+                log.warning(f"Error reloading artifact {art.name}: {e}")
+        return changed
+
+    def _watch(self):
+        while not self._stop.wait(self.poll_interval):
+            self.refresh()
+
+    def start_watching(self):
+        if self.poll_interval <= 0 or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._watch, name="artifact-watcher", daemon=True)
+        self._thread.start()
+
+    def stop_watching(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.poll_interval + 1)
+            self._thread = None
+
+
+ARTIFACTS = ArtifactStore(poll_interval=float(os.getenv("MATKOMPIS_ARTIFACT_POLL", "5")))
+ARTIFACTS.register("recipe_index", "recipes_index.faiss")
+ARTIFACTS.register("product_embeddings", "product_embeddings.npy")
+ARTIFACTS.register("recipe_embeddings", "recipes_embeddings.npy")
+# Row keys written by embedding_index.py
+ARTIFACTS.register("recipe_ids", "recipes_embeddings.ids.json")
+ARTIFACTS.register("product_ids", "product_embeddings.ids.json")
@@ -0,0 +1,158 @@
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from queue import Empty, Queue
+from typing import Dict, List
+
+import numpy as np
+
+from model_registry import MODELS, ModelRegistry
+
+# MICRO-BATCHING ENCODER
+#
+# Concurrent requests each want a handful of embeddings. Instead of calling
+# model.encode() once per request, texts are queued and a single worker thread
+# encodes them together, flushing when the batch is full or the oldest text has
+# waited `max_wait_ms`. Every caller gets back exactly its own rows.
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+
+
+class BatchEncoder:
+    def __init__(self, alias: str, registry: ModelRegistry = MODELS,
+                 max_batch: int = 32, max_wait_ms: float = 5.0):
+        self.alias = alias
+        self.registry = registry
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue: Queue = Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._reset_stats()
+
+    def _reset_stats(self):
+        self.batches = 0
+        self.items = 0
+        self.size_histogram = {b: 0 for b in BATCH_SIZE_BUCKETS}
+        self.wait_ms = deque(maxlen=1000)
+        self.encode_ms = deque(maxlen=1000)
+
+    def _ensure_worker(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name=f"encoder-{self.alias}", daemon=True)
+                self._thread.start()
+
+    def submit(self, text: str) -> Future:
+        self._ensure_worker()
+        fut: Future = Future()
+        self._queue.put((text, fut, time.perf_counter()))
+        return fut
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Encode `texts` through the shared batch queue; returns one row per text."""
+        futures = [self.submit(t) for t in texts]
+        rows = [f.result() for f in futures]
+        if not rows:
+            dim = self.registry.get(self.alias).get_sentence_embedding_dimension()
+            return np.zeros((0, dim), dtype=np.float32)
+        return np.stack(rows).astype(np.float32, copy=False)
+
+    def _collect(self):
+        first = self._queue.get()
+        batch = [first]
+        deadline = first[2] + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            texts = [t for t, _, _ in batch]
+            started = time.perf_counter()
+            try:
+                model = self.registry.get(self.alias)
+                emb = model.encode(texts, batch_size=len(texts),
+                                   convert_to_numpy=True, show_progress_bar=False)
+            except Exception as e:
+                for _, fut, _ in batch:
+                    fut.set_exception(e)
+                continue
+            done = time.perf_counter()
+            for i, (_, fut, _) in enumerate(batch):
+                fut.set_result(emb[i])
+            self._record(batch, started, done)
+
+    def _record(self, batch, started: float, done: float):
+        with self._stats_lock:
+            self.batches += 1
+            self.items += len(batch)
+            for b in BATCH_SIZE_BUCKETS:
+                if len(batch) <= b:
+                    self.size_histogram[b] += 1
+                    break
+            else:
+                self.size_histogram[BATCH_SIZE_BUCKETS[-1]] += 1
+            self.wait_ms.extend((started - queued) * 1000 for _, _, queued in batch)
+            self.encode_ms.append((done - started) * 1000)
+
+    def stats(self) -> Dict[str, object]:
+        with self._stats_lock:
+            wait = np.array(self.wait_ms) if self.wait_ms else np.zeros(1)
+            enc = np.array(self.encode_ms) if self.encode_ms else np.zeros(1)
+            return {
+                "model": self.registry.models.get(self.alias),
+                "max_batch": self.max_batch,
+                "max_wait_ms": self.max_wait * 1000,
+                "batches": self.batches,
+                "items": self.items,
+                "avg_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+                "batch_size_histogram": {f"<={b}": n for b, n in self.size_histogram.items()},
+                "queue_wait_ms": {"p50": round(float(np.percentile(wait, 50)), 3),
+                                  "p95": round(float(np.percentile(wait, 95)), 3),
+                                  "max": round(float(wait.max()), 3)},
+                "encode_ms": {"p50": round(float(np.percentile(enc, 50)), 3),
+                              "p95": round(float(np.percentile(enc, 95)), 3),
+                              "max": round(float(enc.max()), 3)},
+                "queued": self._queue.qsize(),
+            }
+
+
+_ENCODERS: Dict[str, BatchEncoder] = {}
+_ENCODERS_LOCK = threading.Lock()
+
+
+def get_encoder(alias: str) -> BatchEncoder:
+    enc = _ENCODERS.get(alias)
+    if enc is None:
+        with _ENCODERS_LOCK:
+            enc = _ENCODERS.get(alias)
+            if enc is None:
+                enc = BatchEncoder(
+                    alias,
+                    max_batch=int(os.getenv("MATKOMPIS_BATCH_SIZE", "32")),
+                    max_wait_ms=float(os.getenv("MATKOMPIS_BATCH_WAIT_MS", "5")),
+                )
+                _ENCODERS[alias] = enc
+    return enc
+
+
+def encode(alias: str, texts: List[str]) -> np.ndarray:
+    return get_encoder(alias).encode(texts)
+
+
+def encoder_stats() -> Dict[str, Dict[str, object]]:
+    return {alias: enc.stats() for alias, enc in _ENCODERS.items()}
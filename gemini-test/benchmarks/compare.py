@@ -0,0 +1,47 @@
+"""Compare two benchmark result files (micro.py, load.py or product_ann.py --json).
+
+    python benchmarks/compare.py results/before.json results/after.json
+
+Prints every latency/throughput figure found in both files with its change.
+"""
+import argparse
+import json
+from pathlib import Path
+from typing import Dict, Iterator, Tuple
+
+METRICS = ("p50_ms", "p95_ms", "p99_ms", "qps", "recall@1", "recall@5", "index_mb", "build_s")
+
+
+def flatten(value, prefix: str = "") -> Iterator[Tuple[str, float]]:
+    """("catalog.0.find_product.p50_ms", 0.35) for every known metric, using names where rows have them."""
+    if isinstance(value, dict):
+        for k, v in value.items():
+            if k in METRICS and isinstance(v, (int, float)):
+                yield f"{prefix}{k}", float(v)
+            elif k != "run":
+                yield from flatten(v, f"{prefix}{k}.")
+    elif isinstance(value, list):
+        for i, v in enumerate(value):
+            label = v.get("config") or v.get("products") if isinstance(v, dict) else None
+            yield from flatten(v, f"{prefix}{label if label is not None else i}.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("before", type=Path)
+    parser.add_argument("after", type=Path)
+    args = parser.parse_args()
+
+    before: Dict[str, float] = dict(flatten(json.loads(args.before.read_text(encoding="utf-8"))))
+    after: Dict[str, float] = dict(flatten(json.loads(args.after.read_text(encoding="utf-8"))))
+    keys = [k for k in after if k in before]
+    width = max((len(k) for k in keys), default=10)
+    print(f"{'metric':>{width}}  {'before':>10}  {'after':>10}  {'change':>8}")
+    for k in keys:
+        b, a = before[k], after[k]
+        change = f"{(a - b) / b * 100:+.1f}%" if b else "n/a"
+        print(f"{k:>{width}}  {b:>10g}  {a:>10g}  {change:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""Load generator for /ask: throughput and p50/p95/p99 latency per intent.
+
+    python benchmarks/load.py                                  # in-process app, fake LLM
+    python benchmarks/load.py --requests 2000 --concurrency 32 --json results/load.json
+    python benchmarks/load.py --cold                           # unique queries, no cache hits
+    python benchmarks/load.py --url http://127.0.0.1:8000      # a running server
+
+In-process runs import main.py with MATKOMPIS_LLM_BACKEND=fake (unless set
+otherwise), so Gemini is replaced by the deterministic local backend and its
+MATKOMPIS_FAKE_LLM_LATENCY. Start a server the same way to load test it over
+HTTP: `MATKOMPIS_LLM_BACKEND=fake uvicorn main:app --workers 4`.
+
+Queries are drawn from a mixed-intent corpus (--corpus: one query per line,
+optionally "intent<TAB>query"). Results are grouped by the intent the service
+returned.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+# The backend modules first: benchmarks/product_ann.py must not shadow product_ann.py
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(1, str(Path(__file__).resolve().parent))
+
+import httpx  # noqa: E402
+
+from report import summarize, write_json  # noqa: E402
+
+# Weighted roughly like the Gradio examples and what people type
+DEFAULT_CORPUS: Dict[str, Tuple[float, List[str]]] = {
+    "product_nutrient": (0.25, [
+        "How much protein is in Kycklingfilé?", "kcal in Laxfilé", "What is the fat in Bacon?",
+        "sugar in Äppeljuice", "How much salt is in Falukorv?", "protein in Kvarg",
+    ]),
+    "price_query": (0.25, [
+        "How much does Kyckling Lårfilé cost?", "price of lax", "What does Nötfärs cost?",
+        "How much is Bröd?", "price of ris", "How much does Mjölk cost?",
+    ]),
+    "recipe_query": (0.2, [
+        "recipes with chicken", "recipes with salmon", "give me 3 recipes with lentils",
+        "recipes with tofu", "recipes with mushrooms", "recipes with spinach",
+    ]),
+    "meal_recommendation": (0.2, [
+        "Find a high-protein vegan meal", "quick vegetarian dinner", "low carb lunch ideas",
+        "something spicy with beans", "a cozy winter soup", "healthy breakfast with eggs",
+    ]),
+    "recipe_detail": (0.1, [
+        "show Miso-Butter Roast Chicken With Acorn Squash Panzanella", "show Lentil Burgers",
+        "show Crispy Salt and Pepper Potatoes", "show Thanksgiving Mac and Cheese",
+    ]),
+}
+
+
+def load_corpus(path: Optional[Path]) -> Tuple[List[str], np.ndarray]:
+    if path is None:
+        queries, weights = [], []
+        for weight, items in DEFAULT_CORPUS.values():
+            queries += items
+            weights += [weight / len(items)] * len(items)
+    else:
+        queries = [line.split("\t", 1)[-1].strip() for line in path.read_text(encoding="utf-8").splitlines()]
+        queries = [q for q in queries if q]
+        weights = [1.0] * len(queries)
+    w = np.asarray(weights, dtype=np.float64)
+    return queries, w / w.sum()
+
+
+def make_client(url: Optional[str], timeout: float) -> httpx.AsyncClient:
+    if url:
+        return httpx.AsyncClient(base_url=url, timeout=timeout)
+    os.environ.setdefault("MATKOMPIS_LLM_BACKEND", "fake")
+    import main
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://bench",
+                             timeout=timeout)
+
+
+async def run(client: httpx.AsyncClient, queries: List[str], concurrency: int):
+    """(query, intent, seconds, ok) per request, and the wall time."""
+    results = []
+    pending = iter(queries)
+
+    async def worker():
+        for q in pending:
+            t0 = time.perf_counter()
+            try:
+                response = await client.get("/ask", params={"q": q})
+                ok = response.status_code == 200
+                intent = response.json().get("intent", "unknown") if ok else f"http_{response.status_code}"
+            except Exception as e:
+                ok, intent = False, type(e).__name__
+            results.append((q, intent, time.perf_counter() - t0, ok))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return results, time.perf_counter() - started
+
+
+async def main_async(args):
+    corpus, weights = load_corpus(args.corpus)
+    rng = np.random.default_rng(args.seed)
+    picks = rng.choice(len(corpus), args.requests, p=weights)
+    queries = [corpus[i] for i in picks]
+    if args.cold:
+        # A distinct suffix per request defeats the intent and answer caches
+        queries = [f"{q} {i}" for i, q in enumerate(queries)]
+
+    async with make_client(args.url, args.timeout) as client:
+        if args.warmup:
+            await run(client, [corpus[i % len(corpus)] for i in range(args.warmup)], args.concurrency)
+        results, wall = await run(client, queries, args.concurrency)
+
+    by_intent: Dict[str, List[float]] = {}
+    for _, intent, seconds, _ in results:
+        by_intent.setdefault(intent, []).append(seconds)
+    report = {
+        "overall": summarize([r[2] for r in results], wall),
+        "errors": sum(1 for r in results if not r[3]),
+        "wall_s": round(wall, 3),
+        # qps per intent is its share of the overall throughput
+        "intents": {intent: summarize(s, wall) for intent, s in sorted(by_intent.items())},
+    }
+
+    cols = ["n", "p50_ms", "p95_ms", "p99_ms", "qps"]
+    print(f"{len(results)} requests, concurrency {args.concurrency}, {wall:.2f}s, {report['errors']} errors")
+    print(f"{'intent':>22}  " + "  ".join(f"{c:>9}" for c in cols))
+    for intent, s in list(report["intents"].items()) + [("overall", report["overall"])]:
+        print(f"{intent:>22}  " + "  ".join(f"{s[c]:>9}" for c in cols))
+    if args.json:
+        config = {k: str(v) if isinstance(v, Path) else v for k, v in vars(args).items()}
+        config["llm_backend"] = os.getenv("MATKOMPIS_LLM_BACKEND", "gemini") if not args.url else "server"
+        config["fake_llm_latency"] = os.getenv("MATKOMPIS_FAKE_LLM_LATENCY", "0.05")
+        write_json(args.json, {"benchmark": "load", "config": config, **report})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=None, help="Base URL of a running server (default: in-process)")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--warmup", type=int, default=20, help="Requests sent before measuring")
+    parser.add_argument("--corpus", type=Path, default=None, help="Query file, one per line")
+    parser.add_argument("--cold", action="store_true", help="Make every query unique (no cache hits)")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", type=Path, default=None, help="Also write the results here")
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+"""Micro-benchmarks of the request path pieces at synthetic catalog sizes.
+
+    python benchmarks/micro.py                               # 10k and 100k products, 20k recipes
+    python benchmarks/micro.py --sizes 10000,100000,1000000  # 1M takes minutes and a few GB
+    python benchmarks/micro.py --json results/micro.json
+
+Per catalog size: loading (build_catalog, canonical grouping, the product
+name index), find_product and the product side of recipe_detail_payload
+(IngredientMatcher over the canonical products, where_to_buy offers). Per
+recipe corpus: find_recipe_by_id_or_title and retrieve_recipes (hybrid_search:
+FAISS + BM25 + fusion, with the service's MATKOMPIS_HYBRID_* settings).
+
+Embeddings are random vectors with the real models' dimensions, written as
+artifacts to a temporary directory so the service's RowMap, ProductANN and
+retrieval code read them as they would the real ones. Query encoding is
+measured by /stats/encoders, not here, so none of this needs the
+sentence-transformers models or an API key.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Sequence
+
+import numpy as np
+
+# The backend modules first: benchmarks/product_ann.py must not shadow product_ann.py
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(1, str(Path(__file__).resolve().parent))
+
+import faiss  # noqa: E402
+
+from artifacts import ARTIFACTS  # noqa: E402
+from canonical import CanonicalCatalog, group_products  # noqa: E402
+from catalog import build_catalog  # noqa: E402
+from embedding_index import PRODUCT_EMBEDDINGS, RECIPE_EMBEDDINGS, RowMap, recipe_keys, write_embeddings  # noqa: E402
+from ingredient_matcher import IngredientMatcher, canonical_filter, where_to_buy  # noqa: E402
+from product_ann import ProductANN, index_params_from_env  # noqa: E402
+from product_index import ProductIndex  # noqa: E402
+from recipe_bm25 import BM25Index  # noqa: E402
+from recipe_index import RecipeIndex  # noqa: E402
+from recipe_retrieval import HYBRID, hybrid_search, needs_rerank_vectors  # noqa: E402
+from report import summarize, write_json  # noqa: E402
+from synthetic import make_products, make_recipes  # noqa: E402
+from vector_index import build_index  # noqa: E402
+
+PRODUCT_DIM = 768  # paraphrase-multilingual-mpnet-base-v2
+RECIPE_DIM = 384   # all-MiniLM-L6-v2
+
+
+def timed(fn: Callable, inputs: Sequence) -> Dict[str, float]:
+    seconds: List[float] = []
+    for x in inputs:
+        t0 = time.perf_counter()
+        fn(x)
+        seconds.append(time.perf_counter() - t0)
+    return summarize(seconds)
+
+
+def stopwatch(fn: Callable):
+    t0 = time.perf_counter()
+    value = fn()
+    return value, round(time.perf_counter() - t0, 3)
+
+
+def random_unit(rng, n: int, d: int) -> np.ndarray:
+    x = rng.standard_normal((n, d)).astype(np.float32)
+    faiss.normalize_L2(x)
+    return x
+
+
+def write_artifact(out_dir: Path, filename: str, matrix: np.ndarray, keys) -> None:
+    """Embeddings plus ids file, as embedding_index.py writes them, then reload what changed."""
+    hashes = [f"{len(keys)}-{i}" for i in range(len(keys))]
+    write_embeddings(out_dir, filename, matrix, list(keys), hashes, "random")
+    ARTIFACTS.refresh()
+
+
+def bench_products(n: int, args) -> Dict[str, object]:
+    rng = np.random.default_rng(args.seed)
+    products, make_s = stopwatch(lambda: make_products(n, args.seed))
+    catalog, catalog_s = stopwatch(lambda: build_catalog(products))
+    group_of, canonical_s = stopwatch(lambda: group_products(products, catalog))
+    canonical = CanonicalCatalog(catalog, products, group_of)
+    index, index_s = stopwatch(lambda: ProductIndex(canonical.entries))
+    print(f"{n} products: catalog {catalog_s}s, canonical {canonical_s}s, name index {index_s}s")
+
+    # find_product: whole names, their first word, and a couple of misspelled/partial ones
+    names = [products[int(i)]["name"] for i in rng.choice(n, args.queries)]
+    queries = [q if k % 3 == 0 else q.split()[0] if k % 3 == 1 else q[:max(3, len(q) // 2)]
+               for k, q in enumerate(names)]
+    find_product = timed(index.best, queries)
+
+    # recipe_detail_payload, product side: ingredient vectors -> IngredientMatcher
+    # (ANN over one row per group) -> where_to_buy offers, as main.py wires them
+    embeddings = random_unit(rng, n, args.product_dim)
+    write_artifact(args.workdir, PRODUCT_EMBEDDINGS, embeddings, catalog.keys)
+    rows = RowMap("product_ids", catalog.keys)
+    ann = ProductANN(os.getenv("MATKOMPIS_PRODUCT_INDEX", "flat").lower(), index_params_from_env(),
+                     rerank=int(os.getenv("MATKOMPIS_RERANK", "0")),
+                     row_filter=canonical_filter(canonical, rows))
+    matcher = IngredientMatcher(rows, catalog.keys, ann=ann)
+    _, ann_s = stopwatch(ann.index)
+    ingredients = embeddings[rng.choice(n, args.queries * 10)] + 0.05 * random_unit(rng, args.queries * 10, args.product_dim)
+    faiss.normalize_L2(ingredients)
+    names = [f"ingredient {i}" for i in range(10)]
+
+    def detail(batch: np.ndarray):
+        return where_to_buy(canonical, names, matcher.nearest(batch))
+
+    batches = [ingredients[i:i + 10] for i in range(0, len(ingredients), 10)]
+    recipe_detail = timed(detail, batches)
+    return {
+        "products": n,
+        "groups": len(canonical),
+        "load_s": {"synthesize": make_s, "build_catalog": catalog_s, "canonical": canonical_s,
+                   "product_index": index_s, "product_ann": ann_s},
+        "find_product": find_product,
+        "recipe_detail_payload_10_ingredients": recipe_detail,
+    }
+
+
+def bench_recipes(n: int, args) -> Dict[str, object]:
+    rng = np.random.default_rng(args.seed)
+    recipes = make_recipes(n, args.seed)
+    index, index_s = stopwatch(lambda: RecipeIndex(recipes))
+    bm25, bm25_s = stopwatch(lambda: BM25Index.build(recipes))
+    embeddings = rng.standard_normal((n, args.recipe_dim)).astype(np.float32)
+    write_artifact(args.workdir, RECIPE_EMBEDDINGS, embeddings, recipe_keys(recipes))
+    rows = RowMap("recipe_ids", recipe_keys(recipes))
+    kind = os.getenv("MATKOMPIS_RECIPE_INDEX", "flat")
+    faiss_index, faiss_s = stopwatch(lambda: build_index(embeddings, kind, "l2"))
+    rerank_vectors = embeddings if needs_rerank_vectors(faiss_index) else None
+    print(f"{n} recipes: title index {index_s}s, BM25 {bm25_s}s, FAISS {faiss_s}s")
+
+    picks = rng.choice(n, args.queries)
+    queries = [recipes[int(i)]["id"] if k % 2 else " ".join(recipes[int(i)]["title"].split()[1:])
+               for k, i in enumerate(picks)]
+    find_recipe = timed(index.lookup, queries)
+
+    texts = [recipes[int(i)]["title"] for i in picks]
+    vectors = embeddings[picks] + 0.1 * rng.standard_normal((len(picks), args.recipe_dim)).astype(np.float32)
+
+    def retrieve(k: int, lexical: bool = HYBRID):
+        positions = hybrid_search(texts[k], vectors[k:k + 1], faiss_index, rows, bm25 if lexical else None,
+                                  embeddings=rerank_vectors)
+        return [recipes[i] for i in positions]
+
+    return {
+        "recipes": n,
+        "load_s": {"recipe_index": index_s, "bm25": bm25_s, "faiss": faiss_s},
+        "find_recipe_by_id_or_title": find_recipe,
+        "retrieve_recipes": timed(retrieve, range(len(picks))),
+        "retrieve_recipes_dense_only": timed(lambda k: retrieve(k, lexical=False), range(len(picks))),
+        "retrieve_recipes_bm25_only": timed(lambda k: bm25.search(texts[k], 20), range(len(picks))),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10000,100000", help="Comma-separated catalog sizes")
+    parser.add_argument("--recipes", type=int, default=20000, help="Recipe corpus size")
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--product-dim", type=int, default=PRODUCT_DIM)
+    parser.add_argument("--recipe-dim", type=int, default=RECIPE_DIM)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", type=Path, default=None, help="Also write the results here")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="matkompis-bench-") as workdir:
+        # Only the synthetic artifacts, never the real ones next to the backend
+        args.workdir = Path(workdir)
+        ARTIFACTS.search_dirs = [args.workdir]
+        results = {
+            "catalog": [bench_products(int(n), args) for n in args.sizes.split(",") if n],
+            "recipes": bench_recipes(args.recipes, args),
+        }
+        del args.workdir
+
+    cols = ["n", "p50_ms", "p95_ms", "p99_ms", "qps"]
+    print(f"{'benchmark':>44}  " + "  ".join(f"{c:>9}" for c in cols))
+    for row in results["catalog"]:
+        for name in ("find_product", "recipe_detail_payload_10_ingredients"):
+            label = f"{name} @ {row['products']}"
+            print(f"{label:>44}  " + "  ".join(f"{row[name][c]:>9}" for c in cols))
+    for name, value in results["recipes"].items():
+        if isinstance(value, dict) and "p50_ms" in value:
+            label = f"{name} @ {results['recipes']['recipes']}"
+            print(f"{label:>44}  " + "  ".join(f"{value[c]:>9}" for c in cols))
+    if args.json:
+        write_json(args.json, {"benchmark": "micro", "config": vars(args) | {"json": str(args.json)},
+                               **results})
+
+
+if __name__ == "__main__":
+    main()
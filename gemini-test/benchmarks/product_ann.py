@@ -0,0 +1,146 @@
+"""Recall, memory and latency of the vector index choices against exact search.
+
+    python benchmarks/product_ann.py                     # product_embeddings.npy, noisy product queries
+    python benchmarks/product_ann.py --ingredients       # real recipe ingredients (loads the encoder)
+    python benchmarks/product_ann.py --recipes           # recipes_embeddings.npy with L2, as retrieve_recipes
+    python benchmarks/product_ann.py --synthetic 200000  # random catalog, e.g. to plan for growth
+    python benchmarks/product_ann.py --config hnsw:ef_search=32 --config sq8:rerank=4 --json out.json
+
+Recall@k is the share of the exact top-k (flat index) that the index also
+returns; latency is measured one query at a time, as in a request. `rerank=N`
+re-scores N*k candidates of a compressed index with the float rows.
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import faiss  # noqa: E402
+
+from vector_index import build_index, index_bytes, search  # noqa: E402
+
+DEFAULT_CONFIGS = [
+    "flat",
+    "hnsw:ef_search=16", "hnsw:ef_search=32", "hnsw:ef_search=64", "hnsw:ef_search=128",
+    "ivf:nprobe=1", "ivf:nprobe=4", "ivf:nprobe=8", "ivf:nprobe=16",
+    "fp16", "sq8", "sq8:rerank=4", "pq", "pq:rerank=4", "pq:rerank=16",
+]
+
+
+def parse_config(spec: str) -> Tuple[str, Dict[str, int]]:
+    """"hnsw:hnsw_m=16,ef_search=32" -> ("hnsw", {"hnsw_m": 16, "ef_search": 32})."""
+    kind, _, rest = spec.partition(":")
+    params = {}
+    for part in filter(None, rest.split(",")):
+        key, value = part.split("=", 1)
+        params[key.strip()] = int(value)
+    return kind.strip(), params
+
+
+def load_embeddings(args) -> np.ndarray:
+    if args.synthetic:
+        rng = np.random.default_rng(args.seed)
+        xb = rng.standard_normal((args.synthetic, args.dim)).astype(np.float32)
+    else:
+        from artifacts import ARTIFACTS
+        name = "recipe_embeddings" if args.recipes else "product_embeddings"
+        xb = np.array(ARTIFACTS.get(name), dtype=np.float32)
+    if args.metric == "ip":
+        faiss.normalize_L2(xb)
+    return xb
+
+
+def make_queries(args, xb: np.ndarray) -> np.ndarray:
+    if args.ingredients:
+        from intent_cache import normalize_query
+        from loaders import load_recipes
+        from model_registry import MODELS, PRODUCT_MODEL
+        texts = sorted({normalize_query(i) for r in load_recipes() for i in r.get("ingredients") or []} - {""})
+        rng = np.random.default_rng(args.seed)
+        texts = [texts[i] for i in rng.choice(len(texts), min(args.queries, len(texts)), replace=False)]
+        xq = np.asarray(MODELS.get(PRODUCT_MODEL).encode(texts, convert_to_numpy=True), dtype=np.float32)
+    else:
+        # Perturbed catalog rows: near-duplicates, like an ingredient close to a product name
+        rng = np.random.default_rng(args.seed + 1)
+        rows = rng.choice(len(xb), args.queries, replace=len(xb) < args.queries)
+        xq = xb[rows] + args.noise * rng.standard_normal((len(rows), xb.shape[1])).astype(np.float32)
+    xq = np.ascontiguousarray(xq, dtype=np.float32)
+    if args.metric == "ip":
+        faiss.normalize_L2(xq)
+    return xq
+
+
+def exact_topk(xb: np.ndarray, xq: np.ndarray, k: int, metric: str) -> np.ndarray:
+    return build_index(xb, "flat", metric).search(xq, k)[1]
+
+
+def recall(found: np.ndarray, truth: np.ndarray, k: int) -> float:
+    hits = [len(set(f[:k].tolist()) & set(t[:k].tolist())) for f, t in zip(found, truth)]
+    return float(np.mean(hits)) / k
+
+
+def run(spec: str, xb: np.ndarray, xq: np.ndarray, truth: np.ndarray, k: int, metric: str) -> dict:
+    kind, params = parse_config(spec)
+    rerank = params.pop("rerank", 0)
+    started = time.perf_counter()
+    index = build_index(xb, kind, metric, **params)
+    build = time.perf_counter() - started
+
+    found = np.empty((len(xq), k), dtype=np.int64)
+    timings: List[float] = []
+    for i in range(len(xq)):
+        t0 = time.perf_counter()
+        found[i] = search(index, xq[i:i + 1], k, xb, rerank, metric)[1][0]
+        timings.append(time.perf_counter() - t0)
+    ms = np.asarray(timings) * 1000
+    return {
+        "config": spec,
+        "build_s": round(build, 3),
+        "index_mb": round(index_bytes(index) / 1e6, 2),
+        "recall@1": round(recall(found, truth, 1), 4),
+        "recall@5": round(recall(found, truth, min(5, k)), 4),
+        "p50_ms": round(float(np.percentile(ms, 50)), 4),
+        "p95_ms": round(float(np.percentile(ms, 95)), 4),
+        "qps": round(len(xq) / ms.sum() * 1000, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--config", action="append", help="kind[:param=value,...]; repeatable")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--noise", type=float, default=0.05, help="Noise added to product rows used as queries")
+    parser.add_argument("--ingredients", action="store_true", help="Use encoded recipe ingredients as queries")
+    parser.add_argument("--recipes", action="store_true", help="Benchmark the recipe embeddings (L2) instead")
+    parser.add_argument("--synthetic", type=int, default=0, help="Random catalog with this many rows")
+    parser.add_argument("--dim", type=int, default=768, help="Dimension of the synthetic catalog")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", type=Path, default=None, help="Also write the results here")
+    args = parser.parse_args()
+    args.metric = "l2" if args.recipes else "ip"
+
+    xb = load_embeddings(args)
+    xq = make_queries(args, xb)
+    k = 5
+    truth = exact_topk(xb, xq, k, args.metric)
+    print(f"{len(xb)} {'recipes' if args.recipes else 'products'} x {xb.shape[1]} dims "
+          f"({xb.nbytes / 1e6:.1f} MB as float32), {len(xq)} queries, {args.metric}")
+
+    results = [run(spec, xb, xq, truth, k, args.metric) for spec in (args.config or DEFAULT_CONFIGS)]
+    cols = ["config", "build_s", "index_mb", "recall@1", "recall@5", "p50_ms", "p95_ms", "qps"]
+    print("  ".join(f"{c:>20}" if c == "config" else f"{c:>9}" for c in cols))
+    for r in results:
+        print("  ".join(f"{r[c]:>20}" if c == "config" else f"{r[c]:>9}" for c in cols))
+    if args.json:
+        args.json.write_text(json.dumps({"rows": len(xb), "dim": int(xb.shape[1]), "metric": args.metric,
+                                         "queries": len(xq), "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""Latency summaries and JSON result files shared by the benchmarks."""
+import json
+import platform
+import subprocess
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Sequence
+
+import numpy as np
+
+
+def summarize(seconds: Sequence[float], wall: Optional[float] = None) -> Dict[str, float]:
+    """p50/p95/p99 in ms and throughput; `wall` is the elapsed time when calls overlapped."""
+    ms = np.asarray(seconds, dtype=np.float64) * 1000
+    if not len(ms):
+        return {"n": 0}
+    total = wall if wall is not None else ms.sum() / 1000
+    return {
+        "n": int(len(ms)),
+        "mean_ms": round(float(ms.mean()), 4),
+        "p50_ms": round(float(np.percentile(ms, 50)), 4),
+        "p95_ms": round(float(np.percentile(ms, 95)), 4),
+        "p99_ms": round(float(np.percentile(ms, 99)), 4),
+        "qps": round(len(ms) / total, 1) if total else 0.0,
+    }
+
+
+def run_info() -> Dict[str, Any]:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, cwd=Path(__file__).parent).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+    }
+
+
+def write_json(path: Path, results: Dict[str, Any]):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps({"run": run_info(), **results}, indent=2, ensure_ascii=False))
+    print(f"Wrote {path}")
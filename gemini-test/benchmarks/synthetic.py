@@ -0,0 +1,71 @@
+"""Synthetic products and recipes for benchmarks at catalog sizes we don't have yet."""
+import copy
+from typing import List
+
+import numpy as np
+
+VARIANTS = ["Eko", "Fryst", "Klassisk", "Original", "Mild", "Stark", "Lätt", "Familjepack",
+            "Skivad", "Strimlad", "Grillad", "Rökt", "Naturell", "Extra", "Premium", "Svensk"]
+BRANDS = ["ICA", "Garant", "Findus", "Scan", "Arla", "Felix", "Kronfågel", "Dafgård", "Pågen", "Eldorado"]
+
+INGREDIENTS = [
+    "chicken thighs", "salmon fillet", "ground beef", "tofu", "chickpeas", "lentils", "rice", "pasta",
+    "potatoes", "onion", "garlic", "ginger", "tomatoes", "spinach", "kale", "carrots", "zucchini",
+    "bell pepper", "mushrooms", "lemon", "lime", "olive oil", "butter", "cream", "parmesan",
+    "feta", "yogurt", "eggs", "flour", "sugar", "honey", "soy sauce", "miso", "coconut milk",
+    "cumin", "paprika", "cinnamon", "basil", "parsley", "cilantro", "thyme", "rosemary", "chili",
+    "black beans", "corn", "avocado", "cucumber", "shrimp", "pork shoulder", "bacon", "quinoa",
+]
+DISHES = ["Roast", "Stew", "Salad", "Curry", "Soup", "Tacos", "Bowl", "Pie", "Skewers", "Stir-Fry",
+          "Casserole", "Burgers", "Pasta", "Risotto", "Frittata", "Wraps"]
+STYLES = ["Spicy", "Creamy", "Smoky", "Crispy", "Lemony", "Garlicky", "Herby", "Sticky", "Quick", "Slow-Cooked"]
+STEPS = [
+    "Preheat oven to 425°F. Line a baking sheet with foil.",
+    "Season {a} with salt and pepper. Let sit 10 minutes.",
+    "Heat oil in a large skillet over medium-high heat. Cook {a} until browned, 5 to 7 minutes.",
+    "Add {b} and cook, stirring often, until softened.",
+    "Stir in {c} and simmer until thickened, about 15 minutes.",
+    "Taste and adjust seasoning. Serve warm with {b}.",
+]
+
+
+def make_products(n: int, seed: int = 0) -> List[dict]:
+    """`n` products resampled from the scraped catalog, with distinct names, URLs and prices."""
+    from catalog import parse_price
+    from loaders import load_all_products
+    base = load_all_products()
+    rng = np.random.default_rng(seed)
+    out = []
+    for i in range(n):
+        p = copy.deepcopy(base[i % len(base)])
+        if i >= len(base):
+            extra = [VARIANTS[rng.integers(len(VARIANTS))], BRANDS[rng.integers(len(BRANDS))]]
+            p["name"] = f"{p['name']} {' '.join(extra)}"
+            p["url"] = f"{p.get('url', '')}?v={i}"
+            price = parse_price(p.get("price"))
+            price = 10.0 if np.isnan(price) else price
+            p["price"] = f"{price * rng.uniform(0.8, 1.25):.2f}".replace(".", ",")
+        out.append(p)
+    return out
+
+
+def make_recipes(n: int, seed: int = 0) -> List[dict]:
+    """Recipes shaped like load_recipes() output: lists for ingredients and steps."""
+    rng = np.random.default_rng(seed)
+    out = []
+    for i in range(n):
+        picks = [INGREDIENTS[j] for j in rng.choice(len(INGREDIENTS), int(rng.integers(5, 14)), replace=False)]
+        a, b, c = picks[:3]
+        title = f"{STYLES[rng.integers(len(STYLES))]} {a.title()} {DISHES[rng.integers(len(DISHES))]}"
+        ingredients = [f"{int(rng.integers(1, 4))} cups {x}" for x in picks]
+        steps = [s.format(a=a, b=b, c=c) for s in STEPS[:int(rng.integers(3, len(STEPS) + 1))]]
+        out.append({
+            "id": f"recipe-{i}",
+            "title": title,
+            "ingredients": ingredients,
+            "cleaned_ingredients": ingredients,
+            "instructions": "\n".join(steps),
+            "steps": steps,
+            "image": "",
+        })
+    return out
@@ -0,0 +1,309 @@
+import argparse
+import json
+import os
+import re
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from artifacts import ARTIFACTS
+from catalog import MULTIPACK_RE, PACK_RE, ProductCatalog, build_catalog
+from product_index import fold
+from telemetry import get_logger
+
+# CANONICAL PRODUCTS
+#
+# The same item shows up several times: once per category file it was scraped
+# from, and once per store ("Kycklingfilé 900g Kronfågel" at ICA next to
+# "Kycklingfilé Fryst 900g" at Hemköp). `python canonical.py build` clusters
+# near-identical products into equivalence groups and writes them to
+# canonical_groups.json as lists of product keys:
+#
+#   1. same store|url key, or same name tokens (sizes removed) and known pack size
+#   2. across stores: overlapping name tokens, no conflicting pack size (most
+#      Hemköp rows have none) and, when the product embeddings are built, a
+#      high cosine similarity
+#
+# The service indexes one entry per group and answers "where is it cheapest"
+# from the group's offers instead of re-scoring the whole catalog. Without the
+# file only step 1 runs, at startup.
+
+log = get_logger(__name__)
+
+GROUPS_FILE = "canonical_groups.json"
+
+ARTIFACTS.register("canonical_groups", GROUPS_FILE)
+
+# Words that describe the pack rather than the product
+PACK_WORDS = {"ca", "st", "p", "pack", "frp", "port", "portioner"}
+
+# Numbers stay one token ("2,8%" -> "2.8%") so fat content and class numbers tell products apart
+NAME_TOKEN_RE = re.compile(r"\d+(?:[.,]\d+)?%?|\w+", re.UNICODE)
+
+
+def name_tokens(name: str) -> List[str]:
+    """Name tokens without pack sizes: "Kalops 400g Dafgård" -> ["kalops", "dafgard"].
+
+    Other numbers are kept: "Havredryck 2,8%" -> ["havredryck", "2.8%"], "Klass 1" -> ["klass", "1"].
+    """
+    text = PACK_RE.sub(" ", MULTIPACK_RE.sub(" ", fold(name)))
+    return [t.replace(",", ".") for t in NAME_TOKEN_RE.findall(text) if t not in PACK_WORDS]
+
+
+def size_keys(catalog: ProductCatalog) -> np.ndarray:
+    """Pack unit and size (in grams, ml or pieces) per row as one int, -1 when unknown."""
+    size = catalog.columns["pack_size"]
+    known = np.isfinite(size) & (catalog.pack_units >= 0)
+    keys = np.full(len(catalog), -1, dtype=np.int64)
+    keys[known] = np.round(size[known] * 1000).astype(np.int64) * 4 + catalog.pack_units[known]
+    return keys
+
+
+class UnionFind:
+    def __init__(self, n: int):
+        self.parent = np.arange(n, dtype=np.int64)
+
+    def find(self, i: int) -> int:
+        root = i
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[i] != root:
+            self.parent[i], i = root, self.parent[i]
+        return int(root)
+
+    def union(self, a: int, b: int):
+        ra, rb = self.find(a), self.find(b)
+        if ra != rb:
+            self.parent[max(ra, rb)] = min(ra, rb)
+
+    def labels(self) -> np.ndarray:
+        """Dense group id per element, numbered in order of first appearance."""
+        roots = np.fromiter((self.find(i) for i in range(len(self.parent))), dtype=np.int64,
+                            count=len(self.parent))
+        _, first, inverse = np.unique(roots, return_index=True, return_inverse=True)
+        order = np.argsort(np.argsort(first))
+        return order[inverse]
+
+
+def group_products(products: Sequence[dict], catalog: ProductCatalog,
+                   embeddings: Optional[np.ndarray] = None, min_overlap: float = 0.5,
+                   min_similarity: float = 0.9, max_block: int = 200) -> np.ndarray:
+    """Group id per catalog row.
+
+    `embeddings` are normalized product vectors aligned with the catalog rows
+    (NaN rows for products without one). Without them, cross-store pairs need
+    a name overlap of 0.75 instead of `min_overlap`. Within a store, rows
+    without a known pack size only group with their own store|url duplicates;
+    across stores a pair is only kept apart on size when both sizes are known
+    and differ.
+    """
+    n = len(catalog)
+    field = getattr(products, "field", None)
+    names = [field("name", int(i)) if field else products[int(i)].get("name") for i in catalog.product_ids]
+    tokens = [frozenset(name_tokens(name)) for name in names]
+    sizes = size_keys(catalog)
+    stores = catalog.store_codes
+    uf = UnionFind(n)
+
+    # 1. Exact: duplicated keys, and the same name at the same known pack size.
+    # An unknown size is not a match: a weighed "_KG" fillet and a fixed pack
+    # of the same name are different offers.
+    first: Dict[object, int] = {}
+    for i in range(n):
+        for key in (catalog.keys[i], (tokens[i], int(sizes[i])) if tokens[i] and sizes[i] >= 0 else None):
+            if key is None:
+                continue
+            if key in first:
+                uf.union(first[key], i)
+            else:
+                first[key] = i
+
+    # 2. Cross-store: candidates share their rarest name token that occurs more
+    # than once (a brand only one store prints matches nothing), and do not
+    # disagree on pack size
+    df = Counter(t for toks in tokens for t in toks)
+    blocks: Dict[str, List[int]] = {}
+    for i in range(n):
+        shared = [t for t in tokens[i] if df[t] > 1]
+        if shared:
+            blocks.setdefault(min(shared, key=lambda t: (df[t], t)), []).append(i)
+    threshold = min_overlap if embeddings is not None else 0.75
+    for rows in blocks.values():
+        if len(rows) < 2 or len(rows) > max_block or len({int(stores[r]) for r in rows}) < 2:
+            continue
+        sims = None
+        if embeddings is not None:
+            vecs = embeddings[rows]
+            sims = np.nan_to_num(vecs @ vecs.T, nan=-1.0)
+        for a in range(len(rows)):
+            for b in range(a + 1, len(rows)):
+                i, j = rows[a], rows[b]
+                if stores[i] == stores[j]:
+                    continue
+                if sizes[i] >= 0 and sizes[j] >= 0 and sizes[i] != sizes[j]:
+                    continue
+                overlap = len(tokens[i] & tokens[j]) / len(tokens[i] | tokens[j])
+                if overlap < threshold:
+                    continue
+                if sims is not None and sims[a, b] < min_similarity:
+                    continue
+                uf.union(i, j)
+    return uf.labels()
+
+
+class CanonicalCatalog:
+    """Equivalence groups over the catalog rows, with each group's offers."""
+
+    def __init__(self, catalog: ProductCatalog, products: Sequence[dict], group_of: np.ndarray):
+        self.catalog = catalog
+        self.products = products
+        self.group_of = np.asarray(group_of, dtype=np.int64)
+        self.count = int(self.group_of.max()) + 1 if len(self.group_of) else 0
+        # Members of group g are members[indptr[g]:indptr[g + 1]], cheapest first
+        price = np.nan_to_num(catalog.columns["price"], nan=np.inf)
+        self.members = np.lexsort((price, self.group_of)).astype(np.int64)
+        self.indptr = np.zeros(self.count + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.group_of, minlength=self.count), out=self.indptr[1:])
+        # The first row of each group (in catalog order) names it
+        _, self.representative = np.unique(self.group_of, return_index=True)
+        self.entries = GroupEntries(self)
+
+    def __len__(self):
+        return self.count
+
+    def rows(self, group: int) -> np.ndarray:
+        return self.members[self.indptr[group]:self.indptr[group + 1]]
+
+    def product(self, row: int) -> dict:
+        return self.products[int(self.catalog.product_ids[row])]
+
+    def offers(self, group: int) -> np.ndarray:
+        """Cheapest row per store in the group, cheapest store first."""
+        rows = self.rows(group)
+        _, first = np.unique(self.catalog.store_codes[rows], return_index=True)
+        return rows[np.sort(first)]
+
+    def embedding_rows(self, positions: np.ndarray) -> np.ndarray:
+        """One embedding row per group, given the catalog row of each embedding row (-1 = none)."""
+        embedded = np.flatnonzero(positions >= 0)
+        _, first = np.unique(self.group_of[positions[embedded]], return_index=True)
+        return embedded[np.sort(first)]
+
+    def stats(self):
+        sizes = np.diff(self.indptr)
+        stores = np.zeros(self.count, dtype=np.int64)
+        for code in np.unique(self.catalog.store_codes):
+            stores += np.bincount(self.group_of[self.catalog.store_codes == code], minlength=self.count) > 0
+        return {
+            "products": int(len(self.group_of)),
+            "groups": self.count,
+            "merged_groups": int((sizes > 1).sum()),
+            "cross_store_groups": int((stores > 1).sum()),
+        }
+
+
+class GroupEntries:
+    """One product-like entry per group (the representative), for ProductIndex."""
+
+    def __init__(self, canonical: CanonicalCatalog):
+        self.canonical = canonical
+
+    def __len__(self):
+        return self.canonical.count
+
+    def __getitem__(self, group: int) -> dict:
+        return self.canonical.product(int(self.canonical.representative[group]))
+
+    def field(self, name: str, group: int):
+        canonical = self.canonical
+        field = getattr(canonical.products, "field", None)
+        product_id = int(canonical.catalog.product_ids[canonical.representative[group]])
+        return field(name, product_id) if field else canonical.products[product_id].get(name)
+
+
+def catalog_embeddings(catalog: ProductCatalog) -> Optional[np.ndarray]:
+    """Product embeddings reordered to catalog rows (NaN where missing), if built."""
+    try:
+        matrix = ARTIFACTS.get("product_embeddings")
+        keys = ARTIFACTS.get("product_ids")["keys"]
+    except FileNotFoundError:
+        return None
+    out = np.full((len(catalog), matrix.shape[1]), np.nan, dtype=np.float32)
+    for r, k in enumerate(keys):
+        row = catalog.row_of.get(k)
+        if row is not None:
+            out[row] = matrix[r]
+    return out
+
+
+def load_canonical(catalog: ProductCatalog, products: Sequence[dict]) -> CanonicalCatalog:
+    """Groups from canonical_groups.json; products it does not know about are grouped on their own."""
+    started = time.perf_counter()
+    try:
+        data = ARTIFACTS.get("canonical_groups")
+    except FileNotFoundError:
+        group_of = group_products(products, catalog)
+        log.info(f"No {GROUPS_FILE}; grouped {len(catalog)} products by name and size "
+                 f"in {time.perf_counter() - started:.2f}s")
+        return CanonicalCatalog(catalog, products, group_of)
+
+    uf = UnionFind(len(catalog))
+    for members in data["groups"]:
+        rows = [catalog.row_of[k] for k in members if k in catalog.row_of]
+        for r in rows[1:]:
+            uf.union(rows[0], r)
+    # Duplicate keys map to one row in row_of; attach the other copies too
+    seen: Dict[str, int] = {}
+    for i, k in enumerate(catalog.keys):
+        uf.union(seen.setdefault(k, i), i)
+    canonical = CanonicalCatalog(catalog, products, uf.labels())
+    log.info(f"Loaded {canonical.count} canonical products from {GROUPS_FILE}")
+    return canonical
+
+
+def build(out_dir: Path, products: Sequence[dict], use_embeddings: bool = True,
+          min_similarity: float = 0.9) -> Path:
+    started = time.perf_counter()
+    catalog = build_catalog(products)
+    embeddings = catalog_embeddings(catalog) if use_embeddings else None
+    if use_embeddings and embeddings is None:
+        log.info("No product embeddings; grouping by name and size only")
+    canonical = CanonicalCatalog(catalog, products, group_products(products, catalog, embeddings,
+                                                                   min_similarity=min_similarity))
+    groups = []
+    for g in range(canonical.count):
+        keys = sorted({catalog.keys[r] for r in canonical.rows(g)})
+        if len(keys) > 1:
+            groups.append(keys)
+
+    path = out_dir / GROUPS_FILE
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "embeddings": embeddings is not None,
+            "stats": canonical.stats(),
+            "groups": groups,
+        }, f, ensure_ascii=False)
+    os.replace(tmp, path)
+    log.info(f"{canonical.stats()} in {time.perf_counter() - started:.1f}s -> {path}")
+    return path
+
+
+if __name__ == "__main__":
+    from embedding_index import default_out_dir
+    from loaders import load_all_products
+
+    parser = argparse.ArgumentParser(description="Group equivalent products across stores")
+    sub = parser.add_subparsers(dest="command", required=True)
+    cmd = sub.add_parser("build", help=f"Write {GROUPS_FILE}")
+    cmd.add_argument("--out", type=Path, default=None, help="Artifact directory (default: backend folder)")
+    cmd.add_argument("--no-embeddings", action="store_true", help="Group by name and size only")
+    cmd.add_argument("--min-similarity", type=float, default=0.9,
+                     help="Cosine similarity needed to merge products from different stores")
+    args = parser.parse_args()
+
+    build(args.out or default_out_dir(), load_all_products(), not args.no_embeddings, args.min_similarity)
@@ -0,0 +1,235 @@
+import re
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+# PRODUCT CATALOG
+#
+# The scraped nutrition values are strings with store-specific keys and units
+# ("energi": "134 kilokalori" at Hemköp, "energi (kcal)": "130 kcal" at ICA,
+# "4.3 g" vs "17 gram") and prices like "67,95". They are parsed once into
+# float32 NumPy columns (per 100 g, NaN when missing) so nutrient and price
+# queries can be answered with array operations. Row i is PRODUCTS[product_ids[i]].
+
+COLUMNS = ("kcal", "fat", "carbs", "sugar", "protein", "salt", "fiber", "price")
+
+# Pack size (kg, l or st) and price per kg / l / st
+PACK_COLUMNS = ("pack_size", "unit_price")
+
+UNITS = {
+    "kcal": "kcal", "fat": "g", "carbs": "g", "sugar": "g",
+    "protein": "g", "salt": "g", "fiber": "g", "price": "kr",
+}
+
+# Raw nutrition key -> column. Energy keys are handled separately.
+KEY_MAP = {
+    "fett": "fat",
+    "kolhydrat": "carbs",
+    "kolhydrater": "carbs",
+    "varav sockerarter": "sugar",
+    "protein": "protein",
+    "salt": "salt",
+    "fiber": "fiber",
+}
+
+# How users (and Gemini slots) name nutrients -> column
+NUTRIENT_ALIASES = {
+    "kcal": "kcal", "calories": "kcal", "calorie": "kcal", "energy": "kcal", "energi": "kcal",
+    "fat": "fat", "fett": "fat",
+    "carbs": "carbs", "carb": "carbs", "carbohydrate": "carbs", "carbohydrates": "carbs",
+    "kolhydrat": "carbs", "kolhydrater": "carbs",
+    "sugar": "sugar", "sugars": "sugar", "socker": "sugar",
+    "protein": "protein", "proteins": "protein",
+    "salt": "salt",
+    "fiber": "fiber", "fibre": "fiber",
+    "price": "price", "pris": "price",
+}
+
+GRAM_SCALE = {
+    "g": 1.0, "gram": 1.0,
+    "mg": 1e-3, "milligram": 1e-3,
+    "µg": 1e-6, "μg": 1e-6, "ug": 1e-6, "mikrogram": 1e-6,
+}
+
+KJ_PER_KCAL = 4.184
+
+QUANTITY_RE = re.compile(r"([<>]?\s*\d+(?:[.,]\d+)?)\s*([^\d\s]*)")
+
+
+def parse_quantity(value) -> Optional[tuple]:
+    """"4,3 g" -> (4.3, "g"); "134 kilokalori" -> (134.0, "kilokalori")."""
+    m = QUANTITY_RE.search(str(value or ""))
+    if not m:
+        return None
+    number = m.group(1).lstrip("<> ").replace(",", ".")
+    return float(number), m.group(2).lower()
+
+
+def parse_price(value) -> float:
+    m = re.search(r"\d+(?:[.,]\d+)?", str(value or "").replace(" ", ""))
+    return float(m.group(0).replace(",", ".")) if m else np.nan
+
+
+def parse_nutrition(nutrition: Dict[str, str]) -> Dict[str, float]:
+    out: Dict[str, float] = {}
+    kj = None
+    for key, raw in (nutrition or {}).items():
+        key = key.lower().strip()
+        q = parse_quantity(raw)
+        if q is None:
+            continue
+        value, unit = q
+        if key.startswith("energi"):
+            if unit in ("kcal", "kilokalori", "kilokalorier") or key == "energi (kcal)":
+                out["kcal"] = value
+            elif unit in ("kj", "kilojoule"):
+                kj = value
+            continue
+        col = KEY_MAP.get(key)
+        if col:
+            out[col] = value * GRAM_SCALE.get(unit, 1.0)
+    if "kcal" not in out and kj is not None:
+        out["kcal"] = kj / KJ_PER_KCAL
+    return out
+
+
+# Pack sizes are normalized to kg, litre or pieces so unit prices compare
+PACK_UNITS = {
+    "kg": ("kg", 1.0), "g": ("kg", 1e-3), "gram": ("kg", 1e-3), "hg": ("kg", 0.1),
+    "l": ("l", 1.0), "liter": ("l", 1.0), "dl": ("l", 0.1), "cl": ("l", 0.01), "ml": ("l", 1e-3),
+    "st": ("st", 1.0), "per frp": ("st", 1.0),
+}
+PACK_UNIT_CODES = {"kg": 0, "l": 1, "st": 2}
+PACK_UNIT_NAMES = {v: k for k, v in PACK_UNIT_CODES.items()}
+
+PACK_RE = re.compile(r"(\d+(?:[.,]\d+)?)\s*(kg|gram|g|hg|liter|l|dl|cl|ml|st|per frp)\b", re.I)
+# "4x125g", "10 x 90 g", "4 st x 125 gram": count times the size of each
+MULTIPACK_RE = re.compile(r"(\d+)\s*(?:st\s*)?[x×]\s*(\d+(?:[.,]\d+)?)\s*(kg|gram|g|hg|liter|l|dl|cl|ml)\b", re.I)
+# Nutrient and climate figures are not pack sizes: "1,4 g/100g", "1,39kg CO₂e/kg"
+PER_UNIT_RE = re.compile(r"\s*(?:co[2₂]e\s*)?/\s*(?:\d+\s*)?(?:kg|g|l|ml|st)\b", re.I)
+# Hemköp descriptions that open with the pack size: "Ca 850 gram."
+LEADING_SIZE_RE = re.compile(r"\s*ca\.?\s+(\d+(?:[.,]\d+)?)\s*(kg|gram|g|hg|liter|l|dl|cl|ml|st)\b", re.I)
+UNIT_PRICE_RE = re.compile(r"(\d[\d\s]*(?:,\d+)?)\s*kr/(kg|l|st)\b", re.I)
+
+
+def _pack_amount(number: str, unit: str, count: int = 1) -> Optional[tuple]:
+    unit, scale = PACK_UNITS[unit.lower()]
+    amount = count * float(number.replace(",", ".")) * scale
+    return (amount, unit) if amount > 0 else None
+
+
+def _pack_in(text: str) -> Optional[tuple]:
+    m = MULTIPACK_RE.search(text)
+    if m and not PER_UNIT_RE.match(text, m.end()):
+        return _pack_amount(m.group(2), m.group(3), int(m.group(1)))
+    pos = 0
+    while True:
+        m = PACK_RE.search(text, pos)
+        if m is None:
+            return None
+        per_unit = PER_UNIT_RE.match(text, m.end())
+        if not per_unit:
+            return _pack_amount(m.group(1), m.group(2))
+        # Skip the "/100g" too, it is not a pack size either
+        pos = per_unit.end()
+
+
+def parse_pack_size(size=None, name=None, description=None) -> Optional[tuple]:
+    """Pack size from the size field, else the name, else a description opening with it.
+
+    "0.5L" -> (0.5, "l"); "Jasminris 4x125g" -> (0.5, "kg"); "Ca 850 gram." -> (0.85, "kg").
+    Free description text is not searched: it holds nutrient amounts ("1,4 g/100g"),
+    ingredient shares and piece counts that are not the pack.
+    """
+    for text in (size, name):
+        pack = _pack_in(str(text or ""))
+        if pack:
+            return pack
+    m = LEADING_SIZE_RE.match(str(description or ""))
+    if m and not PER_UNIT_RE.match(m.string, m.end()):
+        return _pack_amount(m.group(1), m.group(2))
+    return None
+
+
+def parse_unit_price(value) -> Optional[tuple]:
+    """"2 012,50 kr/kg" -> (2012.5, "kg")."""
+    m = UNIT_PRICE_RE.search(str(value or ""))
+    if not m:
+        return None
+    return float(re.sub(r"\s", "", m.group(1)).replace(",", ".")), m.group(2).lower()
+
+
+def product_key(p: dict) -> str:
+    """Stable id for a product across reloads: store plus URL (or name)."""
+    return f"{p.get('store', '')}|{p.get('url') or p.get('name', '')}"
+
+
+def nutrient_column(nutrient: str) -> Optional[str]:
+    return NUTRIENT_ALIASES.get(str(nutrient or "").lower().strip())
+
+
+class ProductCatalog:
+    def __init__(self, columns: Dict[str, np.ndarray], product_ids: np.ndarray, keys: List[str],
+                 store_codes: np.ndarray, store_names: List[str], pack_units: np.ndarray):
+        self.columns = columns
+        self.product_ids = product_ids
+        self.keys = keys
+        self.row_of = {k: i for i, k in enumerate(keys)}
+        # Store per row as a small int code, so store filters are array compares too
+        self.store_codes = store_codes
+        self.store_names = store_names
+        # Pack unit per row: 0 = kg, 1 = litre, 2 = pieces, -1 = unknown
+        self.pack_units = pack_units
+        # Ratio columns such as protein_per_kr, filled in on first use
+        self.derived: Dict[str, np.ndarray] = {}
+
+    def __len__(self):
+        return len(self.product_ids)
+
+    def column(self, name: str) -> np.ndarray:
+        return self.columns[name]
+
+    def store_code(self, store: str) -> int:
+        lowered = [s.lower() for s in self.store_names]
+        return lowered.index(store.lower()) if store.lower() in lowered else -1
+
+    def value(self, row: int, name: str) -> Optional[float]:
+        v = float(self.columns[name][row])
+        return None if np.isnan(v) else v
+
+
+def build_catalog(products: Sequence[dict]) -> ProductCatalog:
+    n = len(products)
+    columns = {c: np.full(n, np.nan, dtype=np.float32) for c in COLUMNS + PACK_COLUMNS}
+    listed_unit_price = np.full(n, np.nan, dtype=np.float32)
+    pack_units = np.full(n, -1, dtype=np.int8)
+    listed_units = np.full(n, -1, dtype=np.int8)
+    store_codes = np.zeros(n, dtype=np.int16)
+    store_names: List[str] = []
+    for i, p in enumerate(products):
+        for col, v in parse_nutrition(p.get("nutrition") or {}).items():
+            columns[col][i] = v
+        columns["price"][i] = parse_price(p.get("price"))
+        pack = parse_pack_size(p.get("size"), p.get("name"), p.get("description"))
+        if pack:
+            columns["pack_size"][i] = pack[0]
+            pack_units[i] = PACK_UNIT_CODES[pack[1]]
+        listed = parse_unit_price(p.get("unit_price"))
+        if listed:
+            listed_unit_price[i] = listed[0]
+            listed_units[i] = PACK_UNIT_CODES[listed[1]]
+        store = p.get("store") or ""
+        if store not in store_names:
+            store_names.append(store)
+        store_codes[i] = store_names.index(store)
+
+    # Prefer the store's own comparison price; otherwise price / pack size
+    with np.errstate(divide="ignore", invalid="ignore"):
+        computed = columns["price"] / columns["pack_size"]
+    has_listed = ~np.isnan(listed_unit_price)
+    columns["unit_price"] = np.where(has_listed, listed_unit_price, computed).astype(np.float32)
+    pack_units = np.where(has_listed, listed_units, pack_units).astype(np.int8)
+    columns["unit_price"][pack_units < 0] = np.nan
+
+    return ProductCatalog(columns, np.arange(n, dtype=np.int64), [product_key(p) for p in products],
+                          store_codes, store_names, pack_units)
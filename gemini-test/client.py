@@ -1,36 +1,63 @@
 import gradio as gr
 import requests
+import json
 
 API_URL = "http://127.0.0.1:8000/ask"
+STREAM_URL = f"{API_URL}/stream"
+
+def intent_prefix(intent):
+    # Add a friendly label depending on intent
+    if intent == "product_nutrient":
+        return "🥗 Nutrient info:"
+    elif intent == "price_query":
+        return "💰 Price info:"
+    elif intent == "recipe_query":
+        return "👩‍🍳 Recipe ideas:"
+    return "🤖"
+
+def format_answer(answer):
+    # Format recipe lists a bit prettier
+    if "•" in answer:
+        lines = answer.split("•")
+        formatted = [f"🍽️ {l.strip()}" for l in lines if l.strip()]
+        answer = "\n".join(formatted)
+    return answer
+
+def sse_events(response):
+    """Parse a text/event-stream response into (event, data) pairs."""
+    event, data = "message", []
+    for line in response.iter_lines(decode_unicode=True):
+        if line is None:
+            continue
+        if not line:
+            if data:
+                yield event, json.loads("\n".join(data))
+            event, data = "message", []
+        elif line.startswith("event:"):
+            event = line[len("event:"):].strip()
+        elif line.startswith("data:"):
+            data.append(line[len("data:"):].strip())
 
 def ask_bot(message, history):
-    # Send query to FastAPI backend
+    # Stream the answer from FastAPI so the first tokens show up right away
+    prefix = "🤖"
+    answer = ""
     try:
-        response = requests.get(API_URL, params={"q": message})
-        data = response.json()
-        intent = data.get("intent", "unknown")
-        answer = data.get("answer", "Sorry, something went wrong.")
-        
-        # Add a friendly label depending on intent
-        if intent == "product_nutrient":
-            prefix = "🥗 Nutrient info:"
-        elif intent == "price_query":
-            prefix = "💰 Price info:"
-        elif intent == "recipe_query":
-            prefix = "👩‍🍳 Recipe ideas:"
-        else:
-            prefix = "🤖"
-        
-        # Format recipe lists a bit prettier
-        if "•" in answer:
-            lines = answer.split("•")
-            formatted = [f"🍽️ {l.strip()}" for l in lines if l.strip()]
-            answer = "\n".join(formatted)
-        
-        return f"{prefix}\n{answer}"
+        with requests.get(STREAM_URL, params={"q": message}, stream=True, timeout=120) as response:
+            response.encoding = "utf-8"
+            for event, data in sse_events(response):
+                if event == "intent":
+                    prefix = intent_prefix(data.get("intent", "unknown"))
+                    yield f"{prefix}\n…"
+                elif event == "token":
+                    answer += data.get("text", "")
+                    yield f"{prefix}\n{answer}"
+                elif event == "error":
+                    answer = answer or "Sorry, something went wrong."
+        yield f"{prefix}\n{format_answer(answer or 'Sorry, something went wrong.')}"
     
     except Exception as e:
-        return f"Error contacting server: {e}"
+        yield f"Error contacting server: {e}"
 
 # UI Design
 
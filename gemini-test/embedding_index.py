@@ -0,0 +1,276 @@
+import argparse
+import ast
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import faiss
+import numpy as np
+
+from artifacts import ARTIFACTS
+from catalog import product_key
+from loaders import assign_recipe_ids, load_all_products, load_recipes
+from recipe_bm25 import BM25_FILE, BM25Index
+from vector_index import INDEX_KINDS, build_index, index_bytes
+from telemetry import get_logger
+
+# EMBEDDING INDEX BUILDER
+#
+# Replaces the load_embeddings.ipynb workflow:
+#
+#   python embedding_index.py build            # products and recipes
+#   python embedding_index.py build products   # after re-scraping a category
+#
+# The recipe build also writes the BM25 index (recipe_bm25.py).
+#
+# Every item's text is hashed together with the model name. Rows whose hash is
+# already in the previous artifact are copied over; only new or changed texts
+# are encoded. Next to each embedding matrix we write `<name>.ids.json` with the
+# stable key of every row (store|url for products, recipe id for recipes), so
+# the service maps artifact rows to its own PRODUCTS/RECIPES by key instead of
+# trusting that both were loaded in the same order.
+
+log = get_logger(__name__)
+
+PRODUCT_EMBEDDINGS = "product_embeddings.npy"
+RECIPE_EMBEDDINGS = "recipes_embeddings.npy"
+RECIPE_FAISS = "recipes_index.faiss"
+
+
+def ids_filename(embeddings_file: str) -> str:
+    return embeddings_file.replace(".npy", ".ids.json")
+
+
+def default_out_dir() -> Path:
+    return Path(os.getenv("MATKOMPIS_ARTIFACT_DIR") or Path(__file__).parent)
+
+
+def text_hash(model_name: str, text: str) -> str:
+    return hashlib.sha1(f"{model_name}\0{text}".encode("utf-8")).hexdigest()[:16]
+
+
+def product_text(p: dict) -> str:
+    return str(p.get("name") or "")
+
+
+def recipe_text(r: dict) -> str:
+    # Same text the notebook embedded: title plus the ingredient list
+    title = r.get("title") or r.get("Title") or ""
+    title = "" if isinstance(title, float) else str(title)
+    ingredients = r.get("ingredients") or r.get("Ingredients") or ""
+    if isinstance(ingredients, str):
+        try:
+            ingredients = ast.literal_eval(ingredients)
+        except Exception:
+            ingredients = [ingredients]
+    if not isinstance(ingredients, (list, tuple)):
+        ingredients = [ingredients]
+    return title + " " + " ".join(str(i) for i in ingredients)
+
+
+def recipe_keys(recipes: Sequence[dict]) -> List[str]:
+    """Recipe ids, with "#2", "#3"... appended to repeated ids so every row has its own key."""
+    field = getattr(recipes, "field", None)
+    seen: Dict[str, int] = {}
+    keys = []
+    for i in range(len(recipes)):
+        rid = str(field("id", i) if field else recipes[i].get("id"))
+        seen[rid] = seen.get(rid, 0) + 1
+        keys.append(rid if seen[rid] == 1 else f"{rid}#{seen[rid]}")
+    return keys
+
+
+def load_ids(path: Path) -> dict:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def load_previous(out_dir: Path, embeddings_file: str, model_name: str) -> Dict[str, np.ndarray]:
+    """hash -> embedding row of the last build, if it used the same model."""
+    emb_path = out_dir / embeddings_file
+    ids_path = out_dir / ids_filename(embeddings_file)
+    if not emb_path.exists() or not ids_path.exists():
+        return {}
+    try:
+        ids = load_ids(ids_path)
+        if ids.get("model") != model_name:
+            log.warning(f"{embeddings_file}: model changed ({ids.get('model')} -> {model_name}), re-encoding all")
+            return {}
+        emb = np.load(emb_path, mmap_mode="r")
+        if len(emb) != len(ids["hashes"]):
+            log.warning(f"{embeddings_file}: ids do not match the matrix, re-encoding all")
+            return {}
+        return {h: emb[i] for i, h in enumerate(ids["hashes"])}
+    except Exception as e:
+        log.warning(f"Could not read previous {embeddings_file}: {e}")
+        return {}
+
+
+def encode_incremental(texts: Sequence[str], model_name: str, previous: Dict[str, np.ndarray],
+                       encode: Callable[[List[str]], np.ndarray],
+                       normalize: bool = False) -> Tuple[np.ndarray, List[str], int]:
+    """Embeddings for `texts` reusing `previous` rows by hash. Returns (matrix, hashes, n_encoded)."""
+    hashes = [text_hash(model_name, t) for t in texts]
+    todo: Dict[str, str] = {}
+    for h, t in zip(hashes, texts):
+        if h not in previous and h not in todo:
+            todo[h] = t
+    fresh: Dict[str, np.ndarray] = {}
+    if todo:
+        new = np.asarray(encode(list(todo.values())), dtype=np.float32)
+        if normalize:
+            faiss.normalize_L2(new)
+        fresh = dict(zip(todo.keys(), new))
+    dim = len(next(iter(fresh.values()))) if fresh else (len(next(iter(previous.values()))) if previous else 0)
+    matrix = np.empty((len(texts), dim), dtype=np.float32)
+    for i, h in enumerate(hashes):
+        matrix[i] = fresh[h] if h in fresh else previous[h]
+    return matrix, hashes, len(todo)
+
+
+def write_atomic(path: Path, write: Callable[[Path], None]):
+    # The service's artifact watcher picks the file up after the rename
+    tmp = path.with_name(path.name + ".tmp")
+    write(tmp)
+    os.replace(tmp, path)
+
+
+def write_embeddings(out_dir: Path, embeddings_file: str, matrix: np.ndarray,
+                     keys: List[str], hashes: List[str], model_name: str,
+                     dtype: str = "float32") -> str:
+    version = hashlib.sha1("".join(hashes).encode("utf-8")).hexdigest()[:12]
+
+    def save_npy(tmp: Path):
+        # float16 halves the file and the mapped pages; indexes are built from float32
+        with open(tmp, "wb") as f:
+            np.save(f, matrix.astype(dtype))
+
+    def save_ids(tmp: Path):
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({
+                "version": version,
+                "model": model_name,
+                "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "count": len(keys),
+                "dtype": dtype,
+                "keys": keys,
+                "hashes": hashes,
+            }, f, ensure_ascii=False)
+
+    write_atomic(out_dir / embeddings_file, save_npy)
+    write_atomic(out_dir / ids_filename(embeddings_file), save_ids)
+    return version
+
+
+def model_encoder(alias: str) -> Tuple[str, Callable[[List[str]], np.ndarray]]:
+    from model_registry import MODELS
+
+    def encode(texts: List[str]) -> np.ndarray:
+        return MODELS.get(alias).encode(texts, convert_to_numpy=True,
+                                        show_progress_bar=len(texts) > 1000)
+    return MODELS.models[alias], encode
+
+
+def build_products(out_dir: Path, products: Sequence[dict], full: bool = False,
+                   dtype: str = "float32") -> str:
+    from model_registry import PRODUCT_MODEL
+    model_name, encode = model_encoder(PRODUCT_MODEL)
+    previous = {} if full else load_previous(out_dir, PRODUCT_EMBEDDINGS, model_name)
+    started = time.perf_counter()
+    matrix, hashes, encoded = encode_incremental(
+        [product_text(p) for p in products], model_name, previous, encode, normalize=True)
+    version = write_embeddings(out_dir, PRODUCT_EMBEDDINGS, matrix,
+                               [product_key(p) for p in products], hashes, model_name, dtype)
+    log.info(f"Products {version}: {len(products)} rows, {encoded} new texts encoded "
+             f"in {time.perf_counter() - started:.1f}s")
+    return version
+
+
+def build_recipes(out_dir: Path, recipes: Sequence[dict], full: bool = False,
+                  dtype: str = "float32", index_kind: str = "flat") -> str:
+    from model_registry import RECIPE_MODEL
+    model_name, encode = model_encoder(RECIPE_MODEL)
+    previous = {} if full else load_previous(out_dir, RECIPE_EMBEDDINGS, model_name)
+    started = time.perf_counter()
+    matrix, hashes, encoded = encode_incremental(
+        [recipe_text(r) for r in recipes], model_name, previous, encode)
+    keys = recipe_keys(recipes)
+    version = write_embeddings(out_dir, RECIPE_EMBEDDINGS, matrix, keys, hashes, model_name, dtype)
+
+    index = build_index(matrix, index_kind, metric="l2")
+    write_atomic(out_dir / RECIPE_FAISS, lambda tmp: faiss.write_index(index, str(tmp)))
+    BM25Index.build(recipes, keys).save(out_dir / BM25_FILE)
+    log.info(f"Recipes {version}: {len(recipes)} rows, {encoded} new texts encoded, "
+             f"{index_kind} index of {index_bytes(index) / 1e6:.1f} MB "
+             f"in {time.perf_counter() - started:.1f}s")
+    return version
+
+
+class RowMap:
+    """Maps rows of an embedding artifact to positions in the loaded PRODUCTS/RECIPES.
+
+    Rebuilt whenever the artifact's ids file changes. An index built by the old
+    notebook has no ids file and is refused: its rows follow whatever order the
+    notebook loaded the data in, which is not the order the loaders use now.
+    """
+
+    def __init__(self, artifact: str, keys: Sequence[str]):
+        self.artifact = artifact
+        self.position_of = {}
+        for i, k in enumerate(keys):
+            self.position_of.setdefault(k, i)
+        self._version = None
+        self._positions: Optional[np.ndarray] = None
+
+    def positions(self) -> np.ndarray:
+        """Position per artifact row, -1 for rows whose item is no longer loaded."""
+        try:
+            version = ARTIFACTS.version(self.artifact)
+        except FileNotFoundError as e:
+            raise FileNotFoundError(f"{e}. Embeddings without an ids file cannot be matched to the loaded "
+                                    f"items; rebuild them with `python embedding_index.py build`") from e
+        if self._positions is None or version != self._version:
+            keys = ARTIFACTS.get(self.artifact)["keys"]
+            positions = np.fromiter((self.position_of.get(k, -1) for k in keys),
+                                    dtype=np.int64, count=len(keys))
+            missing = int((positions < 0).sum())
+            if missing:
+                log.warning(f"{self.artifact}: {missing} rows have no loaded item (rebuild with "
+                            f"`python embedding_index.py build`)")
+            self._version, self._positions = version, positions
+        return self._positions
+
+    def lookup(self, rows) -> List[int]:
+        """Loaded positions for artifact rows, dropping unknown ones."""
+        positions = self.positions()
+        out = []
+        for r in rows:
+            r = int(r)
+            if 0 <= r < len(positions) and positions[r] >= 0:
+                out.append(int(positions[r]))
+        return out
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Incrementally (re)build the embedding artifacts")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="Encode new or changed items and write the artifacts")
+    build.add_argument("what", nargs="?", choices=("all", "products", "recipes"), default="all")
+    build.add_argument("--out", type=Path, default=None, help="Artifact directory (default: backend folder)")
+    build.add_argument("--full", action="store_true", help="Ignore the previous build and re-encode everything")
+    build.add_argument("--dtype", choices=("float32", "float16"), default="float32",
+                       help="Storage type of the embedding .npy files")
+    build.add_argument("--recipe-index", choices=INDEX_KINDS,
+                       default=os.getenv("MATKOMPIS_RECIPE_INDEX", "flat"),
+                       help="Kind of recipes_index.faiss (see vector_index.py)")
+    args = parser.parse_args()
+
+    out = args.out or default_out_dir()
+    out.mkdir(parents=True, exist_ok=True)
+    if args.what in ("all", "products"):
+        build_products(out, load_all_products(), args.full, args.dtype)
+    if args.what in ("all", "recipes"):
+        build_recipes(out, assign_recipe_ids(load_recipes()), args.full, args.dtype, args.recipe_index)
@@ -0,0 +1,266 @@
+import argparse
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import faiss
+import numpy as np
+
+from artifacts import ARTIFACTS
+from cache import MISSING, LRUCache
+from canonical import CanonicalCatalog
+from embedding_index import RowMap, default_out_dir
+from intent_cache import normalize_query
+from product_ann import PRODUCT_ANN, ProductANN
+from telemetry import get_logger
+
+# INGREDIENT -> PRODUCT MATCHES
+#
+# "Where to buy" links search each ingredient embedding in the product index
+# (product_ann.py). The best product per normalized ingredient text is kept in an LRU
+# (the encoder still sees the lowercased ingredient line, as before caching),
+# and `python ingredient_matcher.py precompute` writes the matches for every
+# ingredient in the recipe corpus to ingredient_matches.json through the same
+# search. Both are tied to the product index and canonical groups versions and
+# dropped as soon as a new product build or grouping is loaded.
+
+log = get_logger(__name__)
+
+MATCHES_FILE = "ingredient_matches.json"
+# Bumped when what gets encoded changes; files of another format are ignored
+MATCHES_FORMAT = 3
+
+ARTIFACTS.register("ingredient_matches", MATCHES_FILE)
+
+
+def product_version() -> str:
+    """Version of the loaded product embeddings (from their ids file, else the file stamp)."""
+    try:
+        return ARTIFACTS.get("product_ids")["version"]
+    except FileNotFoundError:
+        mtime, size = ARTIFACTS.version("product_embeddings")
+        return f"{mtime}-{size}"
+
+
+def canonical_version() -> str:
+    """Stamp of the loaded canonical_groups.json, "none" without one."""
+    try:
+        mtime, size = ARTIFACTS.version("canonical_groups")
+    except FileNotFoundError:
+        return "none"
+    return f"{mtime}-{size}"
+
+
+def match_version() -> str:
+    """What the matches depend on: the product build and the groups indexed from it."""
+    return f"{product_version()}|groups-{canonical_version()}"
+
+
+def canonical_filter(canonical: CanonicalCatalog, rows: RowMap) -> Callable[[np.ndarray], np.ndarray]:
+    """ProductANN row filter that indexes one embedding row per canonical group."""
+    return lambda embeddings: canonical.embedding_rows(rows.positions())
+
+
+class IngredientMatcher:
+    """Best product (key, similarity) per ingredient, cached per match_version()."""
+
+    def __init__(self, rows: RowMap, keys: Sequence[str], max_entries: int = 4096,
+                 ann: ProductANN = PRODUCT_ANN, candidates: int = 8):
+        self.rows = rows  # embedding row -> catalog row
+        self.keys = keys  # catalog row -> product key
+        self.ann = ann
+        self.candidates = candidates
+        self.cache = LRUCache(max_entries)
+        self.precomputed: Dict[str, list] = {}
+        self.version: Optional[str] = None
+        self._lock = threading.Lock()
+        self.hits = self.precomputed_hits = self.misses = 0
+        # A new product build or grouping changes match_version(); a new
+        # matches file does not, so it resets the version explicitly
+        ARTIFACTS.subscribe("ingredient_matches", self._invalidate)
+
+    def _invalidate(self, name=None, value=None):
+        self.version = None
+
+    def _sync(self):
+        version = match_version()
+        if version == self.version:
+            return
+        with self._lock:
+            self.cache.clear()
+            self.precomputed = {}
+            try:
+                data = ARTIFACTS.get("ingredient_matches")
+                if data.get("format") != MATCHES_FORMAT:
+                    log.warning(f"{MATCHES_FILE} is from an older version; ignoring it (rerun "
+                                f"`python ingredient_matcher.py precompute`)")
+                elif data.get("version") == version:
+                    self.precomputed = data["matches"]
+                else:
+                    log.warning(f"{MATCHES_FILE} was built for {data.get('version')}, "
+                                f"not {version}; ignoring it")
+            except FileNotFoundError:
+                pass
+            self.version = version
+
+    def match(self, ingredients: Sequence[str]) -> List[Optional[Tuple[str, float]]]:
+        """(product key, similarity) of the closest product for each ingredient."""
+        self._sync()
+        texts = [normalize_query(i) for i in ingredients]
+        out: List[Optional[Tuple[str, float]]] = [None] * len(texts)
+        # Normalized text -> positions to fill, and the line the encoder sees for it
+        todo: Dict[str, List[int]] = {}
+        originals: Dict[str, str] = {}
+        for i, t in enumerate(texts):
+            if not t:
+                continue
+            hit = self.cache.get(t)
+            if hit is MISSING and t in self.precomputed:
+                hit = tuple(self.precomputed[t])
+                self.precomputed_hits += 1
+                self.cache.set(t, hit)
+            elif hit is not MISSING:
+                self.hits += 1
+            if hit is MISSING:
+                todo.setdefault(t, []).append(i)
+                originals.setdefault(t, ingredients[i].lower())
+            else:
+                out[i] = hit
+        if todo:
+            self.misses += len(todo)
+            for t, hit in zip(todo, self._compute([originals[t] for t in todo])):
+                self.cache.set(t, hit)
+                for i in todo[t]:
+                    out[i] = hit
+        return out
+
+    def _compute(self, texts: List[str]) -> List[Optional[Tuple[str, float]]]:
+        """Closest product for each lowercased ingredient line."""
+        from batch_encoder import encode
+        from model_registry import PRODUCT_MODEL
+        emb = encode(PRODUCT_MODEL, texts)
+        faiss.normalize_L2(emb)
+        return self.nearest(emb)
+
+    def nearest(self, emb: np.ndarray) -> List[Optional[Tuple[str, float]]]:
+        """(product key, similarity) of the closest loaded product for each normalized embedding."""
+        positions = self.rows.positions()
+        # A few extra candidates in case the best rows are products no longer loaded
+        scores, rows = self.ann.search(emb, k=self.candidates)
+        out: List[Optional[Tuple[str, float]]] = []
+        for row_scores, row_ids in zip(scores.tolist(), rows.tolist()):
+            hit = None
+            for s, r in zip(row_scores, row_ids):
+                if 0 <= r < len(positions) and positions[r] >= 0:
+                    hit = (self.keys[positions[r]], float(s))
+                    break
+            out.append(hit)
+        return out
+
+    def stats(self):
+        total = self.hits + self.precomputed_hits + self.misses
+        return {
+            "version": self.version,
+            "hits": self.hits,
+            "precomputed_hits": self.precomputed_hits,
+            "misses": self.misses,
+            "hit_ratio": round((self.hits + self.precomputed_hits) / total, 3) if total else 0.0,
+            "entries": len(self.cache),
+            "precomputed": len(self.precomputed),
+            "index": self.ann.stats(),
+        }
+
+
+def where_to_buy(canonical: CanonicalCatalog, ingredients: Sequence[str],
+                 matches: Sequence[Optional[Tuple[str, float]]], sim_threshold: float = 0.6) -> List[dict]:
+    """recipe_detail_payload's links: the matched product and its group's cheapest offer per store."""
+    catalog = canonical.catalog
+    links = []
+    for ing, match in zip(ingredients, matches):
+        row = catalog.row_of.get(match[0]) if match else None
+        if row is None or match[1] < sim_threshold:
+            links.append({
+                "ingredient": ing,
+                "product_name": None,
+                "store": None,
+                "price": None,
+                "url": None
+            })
+            continue
+
+        best_prod = canonical.product(row)
+        offers = [canonical.product(o) for o in canonical.offers(int(canonical.group_of[row])).tolist()]
+        links.append({
+            "ingredient": ing,
+            "product_name": best_prod["name"],
+            "store": best_prod.get("store"),
+            "price": best_prod.get("price"),
+            "url": best_prod.get("url", ""),
+            "similarity": round(match[1], 3),
+            "offers": [{"name": p["name"], "store": p.get("store"), "price": p.get("price"),
+                        "url": p.get("url", "")} for p in offers],
+        })
+    return links
+
+
+def precompute(out_dir: Path, recipes: Sequence[dict], products: Sequence[dict],
+               batch_size: int = 256) -> Path:
+    """Match every distinct ingredient in `recipes` the way the service does (main.py)."""
+    from canonical import load_canonical
+    from catalog import build_catalog
+
+    started = time.perf_counter()
+    # Keyed like match(): normalized text -> the first lowercased line with it, which is what gets encoded
+    originals: Dict[str, str] = {}
+    for r in recipes:
+        for ing in r.get("ingredients") or []:
+            t = normalize_query(ing)
+            if t:
+                originals.setdefault(t, ing.lower())
+    texts = sorted(originals)
+    catalog = build_catalog(products)
+    rows = RowMap("product_ids", catalog.keys)
+    try:
+        rows.positions()
+    except FileNotFoundError:
+        raise SystemExit("No product_embeddings.ids.json; run `python embedding_index.py build products` first")
+    ann = ProductANN(PRODUCT_ANN.kind, PRODUCT_ANN.params, PRODUCT_ANN.rerank,
+                     canonical_filter(load_canonical(catalog, products), rows))
+    matcher = IngredientMatcher(rows, catalog.keys, ann=ann)
+    version = match_version()
+
+    matches = {}
+    for start in range(0, len(texts), batch_size):
+        batch = texts[start:start + batch_size]
+        for t, hit in zip(batch, matcher._compute([originals[t] for t in batch])):
+            if hit is not None:
+                matches[t] = [hit[0], round(hit[1], 4)]
+
+    path = out_dir / MATCHES_FILE
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({
+            "format": MATCHES_FORMAT,
+            "version": version,
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "matches": matches,
+        }, f, ensure_ascii=False)
+    os.replace(tmp, path)
+    log.info(f"Matched {len(matches)} ingredients against {version} "
+             f"in {time.perf_counter() - started:.1f}s -> {path}")
+    return path
+
+
+if __name__ == "__main__":
+    from loaders import assign_recipe_ids, load_all_products, load_recipes
+
+    parser = argparse.ArgumentParser(description="Precompute ingredient -> product matches")
+    sub = parser.add_subparsers(dest="command", required=True)
+    pre = sub.add_parser("precompute", help="Match every recipe ingredient against the product embeddings")
+    pre.add_argument("--out", type=Path, default=None, help="Artifact directory (default: backend folder)")
+    args = parser.parse_args()
+
+    precompute(args.out or default_out_dir(), assign_recipe_ids(load_recipes()), load_all_products())
@@ -0,0 +1,58 @@
+import copy
+import os
+import re
+import unicodedata
+
+from cache import MISSING, TieredCache
+
+# INTENT CACHE
+#
+# classify() costs a Gemini round trip. Repeats of the same question (and the
+# Gradio examples, which arrive with an emoji prefix) are answered from here.
+
+
+# Kept in the key: "<500 kcal" and ">500 kcal" are different questions
+COMPARISON_CHARS = "<>=≤≥"
+COMPARISON_RE = re.compile(r"\s*([<>=≤≥]+)\s*")
+
+
+def normalize_query(query: str) -> str:
+    """Cache key for a query: casefolded, without emoji/symbols/punctuation, single spaced.
+
+    Comparison operators and decimal separators stay: "Under <1,5 g salt!" -> "under < 1.5 g salt".
+    """
+    s = unicodedata.normalize("NFC", str(query)).casefold()
+    chars = []
+    for i, ch in enumerate(s):
+        cat = unicodedata.category(ch)
+        if cat[0] in ("L", "N"):
+            chars.append(ch)
+        elif ch in COMPARISON_CHARS:
+            chars.append(ch)
+        elif ch in ".," and 0 < i < len(s) - 1 and s[i - 1].isdigit() and s[i + 1].isdigit():
+            chars.append(".")
+        elif cat[0] in ("S", "P", "Z") or ch.isspace():
+            chars.append(" ")
+        # marks and format chars (variation selectors, zero-width joiners) are dropped
+    text = COMPARISON_RE.sub(r" \1 ", "".join(chars))
+    return re.sub(r"\s+", " ", text).strip()
+
+
+INTENT_CACHE = TieredCache(
+    "intents",
+    max_entries=int(os.getenv("MATKOMPIS_INTENT_CACHE_SIZE", "2048")),
+    ttl=float(os.getenv("MATKOMPIS_INTENT_CACHE_TTL", str(24 * 3600))) or None,
+    db_path=os.getenv("MATKOMPIS_INTENT_CACHE_DB") or None,
+)
+
+
+def cached_intent(query: str):
+    value = INTENT_CACHE.get(normalize_query(query))
+    if value is MISSING:
+        return None
+    # Callers are free to mutate the slots they get back
+    return copy.deepcopy(value)
+
+
+def store_intent(query: str, route):
+    INTENT_CACHE.set(normalize_query(query), copy.deepcopy(route))
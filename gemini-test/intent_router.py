@@ -0,0 +1,291 @@
+import os
+import re
+import threading
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from telemetry import get_logger
+
+# LOCAL INTENT ROUTER
+#
+# Most traffic has an obvious intent. Keyword rules catch "show <title>",
+# "how much does X cost" and "protein in X"; everything else goes through a
+# nearest-centroid classifier over embeddings of the labelled examples below.
+# Only when neither is confident do we pay for a Gemini call. The encoder is
+# imported on first use, so the rules work without sentence-transformers.
+
+log = get_logger(__name__)
+
+EXAMPLES: Dict[str, List[str]] = {
+    "product_nutrient": [
+        "What's the protein in tofu?",
+        "How many calories are in Kycklingkebab Fryst?",
+        "How much fat does salmon have?",
+        "Carbs in rice",
+        "Nutrition info for chicken breast",
+        "How much sugar is in yoghurt?",
+        "What is the salt content of bread?",
+        "Hur mycket protein har kyckling?",
+    ],
+    "price_query": [
+        "How much does Kycklingkebab Fryst cost?",
+        "What is the price of salmon?",
+        "How expensive is minced beef?",
+        "Price of rice",
+        "What does a loaf of bread cost?",
+        "Is chicken cheaper at ICA or Hemköp?",
+        "Vad kostar lax?",
+        "Cheapest cheese",
+    ],
+    "recipe_query": [
+        "Suggest a recipe with miso",
+        "Recipes with chicken",
+        "What can I cook with potatoes?",
+        "Give me recipes using salmon",
+        "Any dishes with lentils?",
+        "I have eggs and spinach, what can I make?",
+        "Recipe ideas with tofu",
+        "Something to cook with leftover rice",
+    ],
+    "meal_recommendation": [
+        "Find a high-protein vegan meal",
+        "I want a high-protein lunch under 600 kcal",
+        "Suggest a low carb dinner",
+        "What should I eat for breakfast?",
+        "Healthy pescatarian meal for two",
+        "A quick weeknight dinner for my family",
+        "Give me a light meal after the gym",
+    ],
+    "recipe_detail": [
+        "Show Lentil Burgers",
+        "Show me the recipe for Miso-Butter Roast Chicken",
+        "How to make banana bread",
+        "Details for Crispy Salt and Pepper Potatoes",
+        "Open the recipe Thanksgiving Mac and Cheese",
+        "Get info about Italian Sausage and Bread Stuffing",
+    ],
+    "unknown": [
+        "Hello",
+        "Who are you?",
+        "What's the weather today?",
+        "Tell me a joke",
+        "Thanks!",
+        "How do I reset my password?",
+    ],
+}
+
+NUTRIENT_WORDS = r"protein|proteins|calories|calorie|kcal|energy|energi|fat|fett|carbs|carbohydrates?|kolhydrater?|sugars?|socker|salt|fiber|fibre"
+
+PRICE_PATTERNS = [
+    re.compile(r"how much (?:does|do|is|are) (?:an? |the )?(?P<product>.+?) cost", re.I),
+    re.compile(r"(?:what is|what's) the price (?:of|for) (?:an? |the )?(?P<product>.+)", re.I),
+    re.compile(r"^price (?:of|for) (?P<product>.+)", re.I),
+    re.compile(r"vad kostar (?P<product>.+)", re.I),
+]
+
+NUTRIENT_PATTERNS = [
+    re.compile(rf"(?:how much |how many )?\b(?P<nutrient>{NUTRIENT_WORDS})\b (?:are |is )?\b(?:in|i)\b (?:an? |the )?(?P<product>.+)", re.I),
+    re.compile(rf"how much \b(?P<nutrient>{NUTRIENT_WORDS})\b (?:does|do) (?P<product>.+?) (?:have|contain)", re.I),
+]
+
+INGREDIENT_PATTERN = re.compile(r"\b(?:with|using|containing|from) (?P<ingredient>[^?.!,]+)", re.I)
+
+DIETS = ("vegan", "vegetarian", "pescatarian", "meat")
+
+
+def _clean(s: str) -> str:
+    return s.strip().strip("?.!\"' ").strip()
+
+
+def recipe_detail_rule(query: str) -> Optional[Dict[str, Any]]:
+    """Keyword rules that always mean recipe_detail ("show ...", "how to make ...")."""
+    data = None
+    q_lower = query.lower().strip()
+
+    # Rule-based fallback: "show", "details", "more info", "how to make"
+    if any(kw in q_lower for kw in ["show", "details", "more info", "how to make", "recipe for", "get info"]):
+        # Try extract a title (everything after keyword)
+        title_part = q_lower
+        for kw in ["show", "details", "more info about", "get info about", "how to make", "recipe for"]:
+            if kw in q_lower:
+                title_part = q_lower.split(kw, 1)[-1].strip()
+                break
+        data = {"intent": "recipe_detail", "slots": {"recipe_title": title_part}}
+
+    if q_lower.startswith(("show ", "open ", "details ", "view ")):
+        tail = q_lower.split(" ", 1)[1].strip('" ')
+        data = {"intent": "recipe_detail", "slots": {"recipe_title": tail}}
+    return data
+
+
+def fix_recipe_query_slots(data: Dict[str, Any], query: str):
+    # Tiny validation step: ensure ingredient matches query
+    if data.get("intent") == "recipe_query":
+        slots = data.setdefault("slots", {})
+        ingr = slots.get("ingredient")
+        q_lower = query.lower()
+        if not ingr or ingr.lower() not in q_lower:
+            # fallback: find a food-like word from the query
+            words = [w for w in q_lower.split() if w.isalpha()]
+            slots["ingredient"] = words[-1] if words else "ingredient"
+    return data
+
+
+def price_slots(query: str) -> Optional[Dict[str, Any]]:
+    for pat in PRICE_PATTERNS:
+        m = pat.search(query)
+        if m and _clean(m.group("product")):
+            return {"product": _clean(m.group("product"))}
+    return None
+
+
+def nutrient_slots(query: str) -> Optional[Dict[str, Any]]:
+    for pat in NUTRIENT_PATTERNS:
+        m = pat.search(query)
+        if m and _clean(m.group("product")):
+            return {"product": _clean(m.group("product")), "nutrient": m.group("nutrient").lower()}
+    return None
+
+
+def meal_slots(query: str) -> Dict[str, Any]:
+    q_lower = query.lower()
+    slots: Dict[str, Any] = {"query": query.strip()}
+    diet = next((d for d in DIETS if d in q_lower), None)
+    if diet:
+        slots["diet"] = diet
+    for level in ("high", "low"):
+        m = re.search(rf"{level}[- ](protein|carb|fat|calorie|kcal)", q_lower)
+        if m:
+            slots["nutrient"], slots["level"] = m.group(1), level
+            break
+    meal_type = next((t for t in ("breakfast", "lunch", "dinner") if t in q_lower), None)
+    if meal_type:
+        slots["meal_type"] = meal_type
+    return slots
+
+
+def recipe_query_slots(query: str) -> Dict[str, Any]:
+    m = INGREDIENT_PATTERN.search(query)
+    slots = {"ingredient": _clean(m.group("ingredient"))} if m else {}
+    return fix_recipe_query_slots({"intent": "recipe_query", "slots": slots}, query)["slots"]
+
+
+def slots_for(intent: str, query: str) -> Optional[Dict[str, Any]]:
+    """Slots we can fill without the LLM, or None if this intent needs Gemini."""
+    if intent == "price_query":
+        return price_slots(query)
+    if intent == "product_nutrient":
+        return nutrient_slots(query)
+    if intent == "meal_recommendation":
+        return meal_slots(query)
+    if intent == "recipe_query":
+        return recipe_query_slots(query)
+    if intent == "unknown":
+        return {}
+    # recipe_detail titles come from the keyword rules only
+    return None
+
+
+class IntentRouter:
+    def __init__(self, examples: Dict[str, List[str]] = EXAMPLES, threshold: float = 0.75,
+                 margin: float = 0.05):
+        self.examples = examples
+        self.threshold = threshold
+        self.margin = margin
+        self.labels: List[str] = []
+        self.centroids: Optional[np.ndarray] = None
+        self._lock = threading.Lock()
+        self.rule_hits = 0
+        self.centroid_hits = 0
+        self.fallbacks = 0
+
+    def _fit(self):
+        from batch_encoder import encode
+        from model_registry import RECIPE_MODEL
+
+        with self._lock:
+            if self.centroids is not None:
+                return
+            labels, centroids = [], []
+            for intent, texts in self.examples.items():
+                emb = encode(RECIPE_MODEL, texts)
+                emb /= np.linalg.norm(emb, axis=1, keepdims=True) + 1e-12
+                c = emb.mean(axis=0)
+                centroids.append(c / (np.linalg.norm(c) + 1e-12))
+                labels.append(intent)
+            self.labels = labels
+            self.centroids = np.stack(centroids).astype(np.float32)
+
+    def rules(self, query: str) -> Optional[Dict[str, Any]]:
+        data = recipe_detail_rule(query)
+        if data:
+            return data
+        slots = price_slots(query)
+        if slots:
+            return {"intent": "price_query", "slots": slots}
+        slots = nutrient_slots(query)
+        if slots:
+            return {"intent": "product_nutrient", "slots": slots}
+        return None
+
+    def nearest(self, query: str):
+        """(intent, score, margin) of the closest centroid."""
+        from batch_encoder import encode
+        from model_registry import RECIPE_MODEL
+
+        self._fit()
+        q = encode(RECIPE_MODEL, [query])[0]
+        q /= np.linalg.norm(q) + 1e-12
+        scores = self.centroids @ q
+        order = np.argsort(-scores)
+        best, second = int(order[0]), int(order[1]) if len(order) > 1 else int(order[0])
+        return self.labels[best], float(scores[best]), float(scores[best] - scores[second])
+
+    def route(self, query: str) -> Optional[Dict[str, Any]]:
+        data = self.rules(query)
+        if data:
+            self._count("rule_hits")
+            return data
+        try:
+            intent, score, margin = self.nearest(query)
+        except Exception as e:
+            log.warning(f"Router error: {e}")
+            self._count("fallbacks")
+            return None
+        if score >= self.threshold and margin >= self.margin:
+            slots = slots_for(intent, query)
+            if slots is not None:
+                self._count("centroid_hits")
+                return {"intent": intent, "slots": slots, "confidence": round(score, 3)}
+        self._count("fallbacks")
+        return None
+
+    def _count(self, counter: str):
+        # route() runs on several worker threads at once
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            rule_hits, centroid_hits, fallbacks = self.rule_hits, self.centroid_hits, self.fallbacks
+        total = rule_hits + centroid_hits + fallbacks
+        return {
+            "rule_hits": rule_hits,
+            "centroid_hits": centroid_hits,
+            "llm_fallbacks": fallbacks,
+            "local_ratio": round((total - fallbacks) / total, 4) if total else 0.0,
+            "threshold": self.threshold,
+        }
+
+
+ROUTER = IntentRouter(
+    threshold=float(os.getenv("MATKOMPIS_ROUTER_THRESHOLD", "0.75")),
+    margin=float(os.getenv("MATKOMPIS_ROUTER_MARGIN", "0.05")),
+)
+
+
+def route_locally(query: str) -> Optional[Dict[str, Any]]:
+    if os.getenv("MATKOMPIS_ROUTER", "1").lower() in ("0", "false", "no"):
+        return None
+    return ROUTER.route(query)
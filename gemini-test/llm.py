@@ -0,0 +1,322 @@
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from typing import Any, AsyncIterator, Callable, Dict, Optional
+
+from telemetry import get_logger
+
+# LLM CLIENT
+#
+# Every Gemini call goes through one LLMClient:
+#
+#   - model objects are created once per model name and reused
+#   - a token bucket caps the request rate (MATKOMPIS_LLM_RPS, 0 = no limit)
+#   - a semaphore caps how many calls are in flight (MATKOMPIS_LLM_CONCURRENCY)
+#   - each attempt has a timeout (MATKOMPIS_LLM_TIMEOUT seconds)
+#   - rate limit, timeout and 5xx errors are retried with exponential backoff
+#     and full jitter (MATKOMPIS_LLM_RETRIES)
+#
+# MATKOMPIS_LLM_BACKEND=fake swaps Gemini for a deterministic local backend
+# with MATKOMPIS_FAKE_LLM_LATENCY seconds per call, so the whole pipeline can
+# be load tested and benchmarked offline without an API key.
+
+log = get_logger(__name__)
+
+MODEL_NAME = os.getenv("MATKOMPIS_LLM_MODEL", "models/gemini-2.5-flash")
+LLM_CONCURRENCY = int(os.getenv("MATKOMPIS_LLM_CONCURRENCY", "16"))
+
+
+class LLMError(RuntimeError):
+    pass
+
+
+class TokenBucket:
+    """`rate` requests per second on average, bursts of up to `burst`."""
+
+    def __init__(self, rate: float, burst: Optional[int] = None):
+        self.rate = rate
+        self.capacity = float(burst or max(1, int(rate)))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        """Take a token and return how long to wait before it may be used."""
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            return max(0.0, -self.tokens / self.rate)
+
+    def acquire(self):
+        wait = self._reserve()
+        if wait:
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        wait = self._reserve()
+        if wait:
+            await asyncio.sleep(wait)
+
+
+def is_retryable(error: Exception) -> bool:
+    if isinstance(error, (TimeoutError, asyncio.TimeoutError, ConnectionError)):
+        return True
+    try:
+        from google.api_core import exceptions as gexc
+    except ImportError:
+        return False
+    return isinstance(error, (gexc.ResourceExhausted, gexc.ServiceUnavailable, gexc.DeadlineExceeded,
+                              gexc.InternalServerError, gexc.TooManyRequests))
+
+
+class GeminiBackend:
+    def __init__(self):
+        self._models: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def model(self, name: str):
+        model = self._models.get(name)
+        if model is None:
+            import google.generativeai as genai
+            with self._lock:
+                model = self._models.get(name)
+                if model is None:
+                    model = self._models[name] = genai.GenerativeModel(name)
+        return model
+
+    def generate(self, prompt: str, model_name: str, timeout: float) -> str:
+        return self.model(model_name).generate_content(prompt, request_options={"timeout": timeout}).text
+
+    async def generate_async(self, prompt: str, model_name: str, timeout: float) -> str:
+        response = await self.model(model_name).generate_content_async(
+            prompt, request_options={"timeout": timeout})
+        return response.text
+
+    async def stream_async(self, prompt: str, model_name: str, timeout: float) -> AsyncIterator[str]:
+        response = await self.model(model_name).generate_content_async(
+            prompt, stream=True, request_options={"timeout": timeout})
+        async for chunk in response:
+            try:
+                text = chunk.text
+            except ValueError:
+                # Chunks without text parts (e.g. safety metadata) have no .text
+                continue
+            if text:
+                yield text
+
+
+CLASSIFY_QUERY_RE = re.compile(r'Query: "(.*)"\s*$', re.S)
+
+
+def fake_classification(query: str) -> Dict[str, Any]:
+    """Keyword intent guess, good enough to drive every branch of /ask."""
+    q = query.lower()
+    words = re.findall(r"\w+", q)
+    last = words[-1] if words else ""
+    if re.search(r"\b(price|cost|costs|pris|kostar)\b", q):
+        return {"intent": "price_query", "slots": {"product": last}}
+    if re.search(r"\b(protein|kcal|calories|fat|sugar|carbs|salt|fiber)\b", q):
+        nutrient = next(w for w in words if w in ("protein", "kcal", "calories", "fat", "sugar", "carbs", "salt", "fiber"))
+        return {"intent": "product_nutrient", "slots": {"product": last, "nutrient": nutrient}}
+    if re.search(r"\b(recipes?|recept)\b.*\bwith\b", q):
+        return {"intent": "recipe_query", "slots": {"ingredient": last, "quantity": 5}}
+    return {"intent": "meal_recommendation", "slots": {"query": query}}
+
+
+class FakeBackend:
+    """Deterministic stand-in for Gemini: same prompt, same answer, fixed latency."""
+
+    def __init__(self, latency: float = 0.05, chunks: int = 8,
+                 responder: Optional[Callable[[str], str]] = None):
+        self.latency = latency
+        self.chunks = max(1, chunks)
+        self.responder = responder or self.respond
+
+    @staticmethod
+    def respond(prompt: str) -> str:
+        m = CLASSIFY_QUERY_RE.search(prompt)
+        if m and "JSON" in prompt:
+            return json.dumps(fake_classification(m.group(1)), ensure_ascii=False)
+        digest = hashlib.sha1(prompt.encode("utf-8")).hexdigest()[:8]
+        titles = re.findall(r"^\s*- (.+?):", prompt, re.M)
+        lines = [f"Fake answer {digest} ({len(prompt)} prompt chars)."]
+        lines += [f"{i + 1}. {t}" for i, t in enumerate(titles[:5])]
+        return "\n".join(lines)
+
+    def _check(self, timeout: float):
+        if timeout and self.latency > timeout:
+            raise TimeoutError(f"fake LLM latency {self.latency}s exceeds timeout {timeout}s")
+
+    def generate(self, prompt: str, model_name: str, timeout: float) -> str:
+        self._check(timeout)
+        time.sleep(self.latency)
+        return self.responder(prompt)
+
+    async def generate_async(self, prompt: str, model_name: str, timeout: float) -> str:
+        self._check(timeout)
+        await asyncio.sleep(self.latency)
+        return self.responder(prompt)
+
+    async def stream_async(self, prompt: str, model_name: str, timeout: float) -> AsyncIterator[str]:
+        self._check(timeout)
+        text = self.responder(prompt)
+        size = max(1, -(-len(text) // self.chunks))
+        for start in range(0, len(text), size):
+            await asyncio.sleep(self.latency / self.chunks)
+            yield text[start:start + size]
+
+
+class LLMClient:
+    def __init__(self, backend, model_name: str = MODEL_NAME, concurrency: int = LLM_CONCURRENCY,
+                 rate: float = 0.0, burst: Optional[int] = None, timeout: float = 60.0,
+                 retries: int = 3, backoff: float = 0.5, max_backoff: float = 8.0):
+        self.backend = backend
+        self.model_name = model_name
+        self.concurrency = concurrency
+        self.bucket = TokenBucket(rate, burst)
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._sync_slots = threading.BoundedSemaphore(concurrency)
+        self._async_slots: Optional[asyncio.Semaphore] = None
+        # Counters are bumped from request threads and the event loop at once
+        self._lock = threading.Lock()
+        self.calls = self.retried = self.failures = 0
+        self.seconds = 0.0
+
+    def _count(self, calls: int = 0, retried: int = 0, failures: int = 0, seconds: float = 0.0):
+        with self._lock:
+            self.calls += calls
+            self.retried += retried
+            self.failures += failures
+            self.seconds += seconds
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        if self._async_slots is None:
+            self._async_slots = asyncio.Semaphore(self.concurrency)
+        return self._async_slots
+
+    def _delay(self, attempt: int) -> float:
+        # Full jitter: uniform in [0, backoff * 2**attempt]
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    def _give_up(self, error: Exception, attempt: int) -> bool:
+        if attempt < self.retries and is_retryable(error):
+            self._count(retried=1)
+            log.warning(f"LLM call failed ({type(error).__name__}: {error}); retry {attempt + 1}/{self.retries}")
+            return False
+        self._count(failures=1)
+        return True
+
+    def generate(self, prompt: str, model_name: Optional[str] = None) -> str:
+        model_name = model_name or self.model_name
+        for attempt in range(self.retries + 1):
+            self.bucket.acquire()
+            started = time.perf_counter()
+            try:
+                with self._sync_slots:
+                    self._count(calls=1)
+                    return self.backend.generate(prompt, model_name, self.timeout)
+            except Exception as e:
+                if self._give_up(e, attempt):
+                    raise
+            finally:
+                self._count(seconds=time.perf_counter() - started)
+            time.sleep(self._delay(attempt))
+        raise LLMError("unreachable")
+
+    async def generate_async(self, prompt: str, model_name: Optional[str] = None) -> str:
+        model_name = model_name or self.model_name
+        for attempt in range(self.retries + 1):
+            await self.bucket.acquire_async()
+            started = time.perf_counter()
+            try:
+                async with self._semaphore():
+                    self._count(calls=1)
+                    return await asyncio.wait_for(
+                        self.backend.generate_async(prompt, model_name, self.timeout), self.timeout)
+            except Exception as e:
+                if self._give_up(e, attempt):
+                    raise
+            finally:
+                self._count(seconds=time.perf_counter() - started)
+            await asyncio.sleep(self._delay(attempt))
+        raise LLMError("unreachable")
+
+    async def stream_async(self, prompt: str, model_name: Optional[str] = None) -> AsyncIterator[str]:
+        """Yield the answer chunk by chunk; only retried while nothing has been yielded yet."""
+        model_name = model_name or self.model_name
+        for attempt in range(self.retries + 1):
+            await self.bucket.acquire_async()
+            started = time.perf_counter()
+            sent = False
+            try:
+                async with self._semaphore():
+                    self._count(calls=1)
+                    stream = self.backend.stream_async(prompt, model_name, self.timeout).__aiter__()
+                    while True:
+                        try:
+                            text = await asyncio.wait_for(stream.__anext__(), self.timeout)
+                        except StopAsyncIteration:
+                            return
+                        sent = True
+                        yield text
+            except Exception as e:
+                if sent or self._give_up(e, attempt):
+                    raise
+            finally:
+                self._count(seconds=time.perf_counter() - started)
+            await asyncio.sleep(self._delay(attempt))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            calls, retried, failures, seconds = self.calls, self.retried, self.failures, self.seconds
+        return {
+            "backend": type(self.backend).__name__,
+            "model": self.model_name,
+            "calls": calls,
+            "retries": retried,
+            "failures": failures,
+            "seconds": round(seconds, 3),
+        }
+
+
+def client_from_env() -> LLMClient:
+    if os.getenv("MATKOMPIS_LLM_BACKEND", "gemini").lower() == "fake":
+        backend = FakeBackend(float(os.getenv("MATKOMPIS_FAKE_LLM_LATENCY", "0.05")))
+    else:
+        backend = GeminiBackend()
+    return LLMClient(
+        backend,
+        concurrency=LLM_CONCURRENCY,
+        rate=float(os.getenv("MATKOMPIS_LLM_RPS", "0")),
+        burst=int(os.getenv("MATKOMPIS_LLM_BURST", "0")) or None,
+        timeout=float(os.getenv("MATKOMPIS_LLM_TIMEOUT", "60")),
+        retries=int(os.getenv("MATKOMPIS_LLM_RETRIES", "3")),
+    )
+
+
+LLM = client_from_env()
+
+
+def generate(prompt: str, model_name: str = MODEL_NAME) -> str:
+    return LLM.generate(prompt, model_name)
+
+
+async def generate_async(prompt: str, model_name: str = MODEL_NAME) -> str:
+    return await LLM.generate_async(prompt, model_name)
+
+
+def stream_async(prompt: str, model_name: str = MODEL_NAME) -> AsyncIterator[str]:
+    """Yield the answer text chunk by chunk as Gemini produces it."""
+    return LLM.stream_async(prompt, model_name)
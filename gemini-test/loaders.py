@@ -0,0 +1,174 @@
+from pathlib import Path
+from typing import Optional
+import ast
+import json
+import os
+import re
+
+import pandas as pd
+
+from telemetry import get_logger
+
+# RAW DATA LOADERS
+#
+# Products come from the scraped Hemköp/ICA JSON files and recipes from
+# recipes.csv. The service normally starts from a compiled snapshot (see
+# snapshot.py); these loaders are the fallback and the snapshot's input.
+
+log = get_logger(__name__)
+
+DATA_DIR = Path(__file__).parent / "data"
+# Next to the backend like DATA_DIR, so the snapshot fingerprint does not depend on the cwd
+RECIPES_CSV = Path(__file__).parent / "recipes.csv"
+
+def recipes_csv_path() -> Path:
+    return Path(os.getenv("MATKOMPIS_RECIPES_CSV") or RECIPES_CSV)
+
+# LOAD PRODUCTS
+
+def load_hemkop_jsons(folder: Path):
+    products = []
+    for file in sorted(folder.glob("hemkop_*.json")):
+        try:
+            with open(file, encoding="utf-8") as f:
+                data = json.load(f)
+                for item in data:
+                    name = item.get("title")
+                    nutrition = item.get("nutrition", {})
+                    url = item.get("url", "")
+                    products.append({
+                        "name": name,
+                        "store": "Hemköp",
+                        "url": url,
+                        "price": item.get("price"),
+                        # Hemköp has no size field; the pack size is in the description ("Ca 850 gram.")
+                        "description": item.get("product_description", ""),
+                        "nutrition": nutrition
+                    })
+        except Exception as e:
+            log.warning(f"Error reading {file}: {e}")
+    return products
+
+def load_ica_jsons(folder: Path):
+    products = []
+    for file in sorted(folder.glob("ica_*.json")):
+        try:
+            with open(file, encoding="utf-8") as f:
+                data = json.load(f)
+                for item in data:
+                    name = item.get("title")
+                    nutrition = item.get("nutrition", {})
+                    url = item.get("url", "")
+                    products.append({
+                        "name": name,
+                        "store": "Ica",
+                        "url": url,
+                        "price": item.get("price"),
+                        "size": item.get("size"),
+                        "unit_price": item.get("unit_price"),
+                        "nutrition": nutrition
+                    })
+        except Exception as e:
+            log.warning(f"Error reading {file}: {e}")
+    return products
+
+# def load_ica_csvs(folder: Path):
+#     products = []
+#     for file in folder.glob("ica_*.csv"):
+#         try:
+#             with open(file, encoding="utf-8") as f:
+#                 reader = csv.DictReader(f)
+#                 for row in reader:
+#                     name = row.get("Name")
+#                     nutrition = {
+#                         k: v for k, v in row.items()
+#                         if k and any(word in k.lower() for word in ["energi", "fett", "protein", "salt", "kolhydrat", "fiber"])
+#                     }
+#                     products.append({
+#                         "name": name,
+#                         "store": "ICA",
+#                         "price": row.get("Price"),
+#                         "nutrition": nutrition
+#                     })
+#         except Exception as e:
+#             print(f"Error reading {file}: {e}")
+#     return products
+
+def load_all_products(base: Path = DATA_DIR):
+    hemkop_data = load_hemkop_jsons(base)
+    ica_data = load_ica_jsons(base)
+    products = hemkop_data + ica_data
+    log.info(f"Loaded {len(products)} products ({len(hemkop_data)} Hemköp, {len(ica_data)} ICA)")
+    return products
+
+# LOAD RECIPES
+
+# CSV column -> recipe field
+RECIPE_COLUMNS = {
+    "Title": "title",
+    "Ingredients": "ingredients",
+    "Instructions": "instructions",
+    "Image_Name": "image",
+    "Cleaned_Ingredients": "cleaned_ingredients",
+}
+
+def parse_ingredients_field(val):
+    """Recipes CSV stores ingredients as a python-ish list string."""
+    if isinstance(val, list):
+        return val
+    if val is None or isinstance(val, float):
+        return []
+    s = str(val)
+    try:
+        out = ast.literal_eval(s)
+        if isinstance(out, list):
+            return [str(x) for x in out]
+    except Exception:
+        pass
+    # fallback: split by commas
+    return [x.strip() for x in s.split(",") if x.strip()]
+
+def split_instructions(s: str):
+    if s is None or isinstance(s, float):
+        return []
+    raw = str(s).replace("\r\n", "\n").replace("\r", "\n")
+    parts = [p.strip(" \t") for p in raw.split("\n") if p.strip()]
+    if len(parts) <= 1:
+        # fallback to sentence-ish split
+        parts = [p.strip() for p in re.split(r"\.\s+", raw) if p.strip()]
+    return parts
+
+def load_recipes(path: Optional[Path] = None):
+    """Recipes with `ingredients`/`cleaned_ingredients` as lists and `steps` split out.
+
+    Parsing happens here, column by column, so requests never re-parse the
+    CSV's list strings.
+    """
+    base = path or recipes_csv_path()
+    recipes = []
+    try:
+        df = pd.read_csv(base)
+        for col in RECIPE_COLUMNS:
+            if col not in df:
+                df[col] = ""
+        df = df[list(RECIPE_COLUMNS)].rename(columns=RECIPE_COLUMNS)
+        df["steps"] = df["instructions"].map(split_instructions)
+        df["ingredients"] = df["ingredients"].map(parse_ingredients_field)
+        df["cleaned_ingredients"] = df["cleaned_ingredients"].map(parse_ingredients_field)
+        recipes = df.to_dict("records")
+        log.info(f"Loaded {len(recipes)} recipes")
+    except Exception as e:
+        log.warning(f"Error loading recipes: {e}")
+    return recipes
+
+def slugify(title: str) -> str:
+    s = re.sub(r"[^a-zA-Z0-9]+", "-", title.lower()).strip("-")
+    return s[:80]
+
+def assign_recipe_ids(recipes):
+    # Precompute IDs for recipes
+    for r in recipes:
+        r["id"] = slugify(str(r["title"] if "title" in r else r.get("Title", "")) or str(r.get("title","")))
+        if not r["id"]:
+            r["id"] = slugify(r.get("Title","untitled"))
+    return recipes
@@ -1,18 +1,41 @@
-from fastapi import FastAPI, Query
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 from pathlib import Path
 import json
 import csv
 import os
-from sentence_transformers import SentenceTransformer
+import time
 import faiss
 import numpy as np
 
 from dotenv import load_dotenv
 import google.generativeai as genai
 
+from model_registry import RECIPE_MODEL, PRODUCT_MODEL, warm_up_from_env
+from artifacts import ARTIFACTS
+from batch_encoder import encode, encoder_stats
+from product_index import ProductIndex
+from catalog import build_catalog, nutrient_column, UNITS
+from product_search import SearchError, search_products, describe
+from price_compare import compare_prices, describe_offers
+from recipe_index import RecipeIndex
+from loaders import load_all_products, load_recipes, assign_recipe_ids
+from snapshot import load_snapshot
+from embedding_index import RowMap, recipe_keys
+from ingredient_matcher import IngredientMatcher, canonical_filter, where_to_buy
+from canonical import load_canonical
+from product_ann import PRODUCT_ANN
+from recipe_bm25 import BM25_FILE, load_or_build
+from recipe_retrieval import HYBRID, hybrid_search, needs_rerank_vectors
+from telemetry import (REGISTRY, Trace, current_trace, end_trace, get_logger, log_event, set_intent, span,
+                       start_trace, traced)
+
+log = get_logger("main")
+
 # Load environment variables
 load_dotenv()
 genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
@@ -28,78 +51,74 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# LOAD PRODUCTS
-
-def load_hemkop_jsons(folder: Path):
-    products = []
-    for file in folder.glob("hemkop_*.json"):
-        try:
-            with open(file, encoding="utf-8") as f:
-                data = json.load(f)
-                for item in data:
-                    name = item.get("title")
-                    nutrition = item.get("nutrition", {})
-                    url = item.get("url", "")
-                    products.append({
-                        "name": name,
-                        "store": "Hemköp",
-                        "url": url,
-                        "price": item.get("price"),
-                        "nutrition": nutrition
-                    })
-        except Exception as e:
-            print(f"Error reading {file}: {e}")
-    return products
-
-def load_ica_jsons(folder: Path):
-    products = []
-    for file in folder.glob("ica_*.json"):
-        try:
-            with open(file, encoding="utf-8") as f:
-                data = json.load(f)
-                for item in data:
-                    name = item.get("title")
-                    nutrition = item.get("nutrition", {})
-                    url = item.get("url", "")
-                    products.append({
-                        "name": name,
-                        "store": "Ica",
-                        "url": url,
-                        "price": item.get("price"),
-                        "nutrition": nutrition
-                    })
-        except Exception as e:
-            print(f"Error reading {file}: {e}")
-    return products
-
-# def load_ica_csvs(folder: Path):
-#     products = []
-#     for file in folder.glob("ica_*.csv"):
-#         try:
-#             with open(file, encoding="utf-8") as f:
-#                 reader = csv.DictReader(f)
-#                 for row in reader:
-#                     name = row.get("Name")
-#                     nutrition = {
-#                         k: v for k, v in row.items()
-#                         if k and any(word in k.lower() for word in ["energi", "fett", "protein", "salt", "kolhydrat", "fiber"])
-#                     }
-#                     products.append({
-#                         "name": name,
-#                         "store": "ICA",
-#                         "price": row.get("Price"),
-#                         "nutrition": nutrition
-#                     })
-#         except Exception as e:
-#             print(f"Error reading {file}: {e}")
-#     return products
-
+# Request latency per route and, for /ask, per intent; stage timings come from
+# the spans below (telemetry.py). For /ask/stream the middleware only sees the
+# headers go out, before the intent is known, so the stream itself records its
+# latency, time to first token and request log line when it ends.
+REQUEST_SECONDS = REGISTRY.histogram("matkompis_request_seconds",
+                                     "HTTP request latency (time to headers for streams)", ("path", "status"))
+ASK_SECONDS = REGISTRY.histogram("matkompis_ask_seconds", "Latency of /ask and /ask/stream per intent",
+                                 ("path", "intent"))
+FIRST_TOKEN_SECONDS = REGISTRY.histogram("matkompis_stream_first_token_seconds",
+                                         "Time to the first answer token of /ask/stream per intent", ("intent",))
+
+def finish_ask(path: str, trace: Trace, **fields):
+    seconds = time.perf_counter() - trace.started
+    trace.flush()
+    ASK_SECONDS.observe(seconds, path, trace.intent)
+    log_event(log, "request", path=path, intent=trace.intent, ms=round(seconds * 1000, 3),
+              stages=trace.summary(), **fields)
+
+@app.middleware("http")
+async def telemetry(request: Request, call_next):
+    trace, token = start_trace()
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        seconds = time.perf_counter() - started
+        path = getattr(request.scope.get("route"), "path", "unmatched")
+        REQUEST_SECONDS.observe(seconds, path, str(status))
+        end_trace(token)
+        if path == "/ask" or (path == "/ask/stream" and status != 200):
+            finish_ask(path, trace, status=status)
+        elif path not in ("/metrics", "/ask/stream"):
+            trace.flush()
+            log_event(log, "request", path=path, status=status, intent=trace.intent,
+                      ms=round(seconds * 1000, 3), stages=trace.summary())
+
+@app.on_event("startup")
+def load_models():
+    # Optional eager warm-up so the first request doesn't pay the model load
+    warm_up_from_env()
+    ARTIFACTS.start_watching()
+
+@app.on_event("shutdown")
+def stop_watchers():
+    ARTIFACTS.stop_watching()
+
+@traced("price_lookup")
 def find_price(product_name):
     term = translate_term(product_name)
-    matches = [p for p in PRODUCTS if term in p["name"].lower()]
-    if matches:
-        p = matches[0]
-        return f"{p['name']}  costs {p['price']} ({p['store']})\n Source: {p['url']}"
+    group = PRODUCT_INDEX.best_id(term)
+    if group is not None:
+        # Same product at every store that sells it, cheapest first
+        lines = []
+        for row in CANONICAL.offers(group).tolist():
+            p = CANONICAL.product(row)
+            lines.append(f"{p['name']}  costs {p['price']} ({p['store']})\n Source: {p['url']}")
+        answer = "\n".join(lines)
+        comparison = compare_prices(CATALOG, PRODUCT_INDEX, term, k=3, groups=CANONICAL.group_of)
+        if comparison:
+            unit = comparison["unit"]
+            lines = [f"\nCheapest per {unit} by store:"]
+            for offer in describe_offers(CATALOG, PRODUCTS, comparison["per_store"], unit):
+                lines.append(f"• {offer['name']} ({offer['store']}) {offer['unit_price']:.2f} kr/{unit} | {offer['url']}")
+            answer += "\n".join(lines)
+        return answer
     return f"Sorry, I couldn't find price for {product_name}."
 
 
@@ -119,26 +138,35 @@ def translate_term(term):
     return TRANSLATION_MAP.get(term.lower(), term.lower())
 
 
-def load_all_products():
-    base = Path(__file__).parent / "data"
-    hemkop_data = load_hemkop_jsons(base)
-    ica_data = load_ica_jsons(base)
-    products = hemkop_data + ica_data
-    print(f"Loaded {len(products)} products ({len(hemkop_data)} Hemköp, {len(ica_data)} ICA)")
-    return products
-
-PRODUCTS = load_all_products()
+# Start from the compiled snapshot when it is up to date (python snapshot.py build)
+SNAPSHOT = load_snapshot()
+if SNAPSHOT is not None:
+    PRODUCTS = SNAPSHOT.products
+    CATALOG = SNAPSHOT.catalog
+else:
+    PRODUCTS = load_all_products()
+    CATALOG = build_catalog(PRODUCTS)
+# Equivalent products across stores (python canonical.py build); the name and
+# vector indexes hold one entry per group, prices come from its offers
+CANONICAL = load_canonical(CATALOG, PRODUCTS)
+PRODUCT_INDEX = ProductIndex(CANONICAL.entries)
+# product_embeddings.npy rows -> catalog rows, matched on store|url keys
+PRODUCT_ROWS = RowMap("product_ids", CATALOG.keys)
+PRODUCT_ANN.restrict(canonical_filter(CANONICAL, PRODUCT_ROWS))
+INGREDIENT_MATCHER = IngredientMatcher(PRODUCT_ROWS, CATALOG.keys,
+                                       int(os.getenv("MATKOMPIS_MATCH_CACHE_SIZE", "4096")))
 
 # GEMINI INTENT CLASSIFIER
 
 import json, re
-import google.generativeai as genai
-
-def classify(query: str):
-    # Use a supported model from your list
-    model = genai.GenerativeModel("models/gemini-2.5-flash")
-
-    prompt = f"""
+from llm import LLM, MODEL_NAME, generate, generate_async, stream_async
+from answer_cache import ANSWER_CACHE, answer_key, cached_answer, store_answer
+from rag_context import PROMPT_STATS, build_context, count_tokens
+from intent_cache import INTENT_CACHE, cached_intent, store_intent
+from intent_router import ROUTER, route_locally, recipe_detail_rule, fix_recipe_query_slots
+
+def classification_prompt(query: str) -> str:
+    return f"""
 You are a strict JSON generator.
 
 Your job is to classify food-related questions into one of these intents:
@@ -166,68 +194,78 @@ Examples:
 Query: "{query}"
 """
 
-    try:
-        response = model.generate_content(prompt)
-        text = response.text.strip()
-        print("Raw Gemini output:", text)
-
-        import re, json
-        match = re.search(r"\{.*\}", text, re.DOTALL)
-        if match:
-            text = match.group(0)
-        data = json.loads(text)
-
-        q_lower = query.lower().strip()
-
-        # Rule-based fallback: "show", "details", "more info", "how to make"
-        if any(kw in q_lower for kw in ["show", "details", "more info", "how to make", "recipe for", "get info"]):
-            # Try extract a title (everything after keyword)
-            title_part = q_lower
-            for kw in ["show", "details", "more info about", "get info about", "how to make", "recipe for"]:
-                if kw in q_lower:
-                    title_part = q_lower.split(kw, 1)[-1].strip()
-                    break
-            data = {"intent": "recipe_detail", "slots": {"recipe_title": title_part}}
+def parse_classification(text: str, query: str):
+    text = text.strip()
+    log.debug(f"Raw Gemini output: {text}")
 
+    match = re.search(r"\{.*\}", text, re.DOTALL)
+    if match:
+        text = match.group(0)
+    data = json.loads(text)
 
-        q_lower = query.lower().strip()
-        if q_lower.startswith(("show ", "open ", "details ", "view ")):
-            tail = q_lower.split(" ", 1)[1].strip('" ')
-            data = {"intent": "recipe_detail", "slots": {"recipe_title": tail}}
+    # "show <title>" and friends always mean recipe_detail, whatever Gemini says
+    data = recipe_detail_rule(query) or data
+    return fix_recipe_query_slots(data, query)
 
-        # Tiny validation step: ensure ingredient matches query
-        if data.get("intent") == "recipe_query":
-            slots = data.setdefault("slots", {})
-            ingr = slots.get("ingredient")
-            q_lower = query.lower()
-            if not ingr or ingr.lower() not in q_lower:
-                # fallback: find a food-like word from the query
-                words = [w for w in q_lower.split() if w.isalpha()]
-                slots["ingredient"] = words[-1] if words else "ingredient"
+@traced("classify")
+def classify(query: str):
+    data = cached_intent(query)
+    if data is not None:
+        return data
+    with span("route_locally"):
+        data = route_locally(query)
+    if data is not None:
+        store_intent(query, data)
+        return data
+    try:
+        with span("llm_classify"):
+            text = generate(classification_prompt(query))
+        data = parse_classification(text, query)
+    except Exception as e:
+        log.warning(f"Classification error: {e}")
+        return {"intent": "unknown", "slots": {}}
+    store_intent(query, data)
+    return data
 
+@traced("classify")
+async def classify_async(query: str):
+    data = cached_intent(query)
+    if data is not None:
+        return data
+    # Rules and the centroid router answer the obvious queries without Gemini
+    with span("route_locally"):
+        data = await run_in_threadpool(route_locally, query)
+    if data is not None:
+        store_intent(query, data)
         return data
+    try:
+        with span("llm_classify"):
+            text = await generate_async(classification_prompt(query))
+        data = parse_classification(text, query)
     except Exception as e:
-        print("Classification error:", e)
+        # Failures are not cached so the next request gets a fresh try
+        log.warning(f"Classification error: {e}")
         return {"intent": "unknown", "slots": {}}
+    store_intent(query, data)
+    return data
 
 
 # ANSWER BUILDER 
 
 def find_product(name: str):
-    for p in PRODUCTS:
-        if name.lower() in p["name"].lower():
-            return p
-    return None
+    return PRODUCT_INDEX.best(name)
 
-def answer_query(intent: str, slots: Dict[str, Any]) -> str:
+def answer_locally(intent: str, slots: Dict[str, Any]) -> str:
     if intent == "product_nutrient":
         product_name = slots.get("product")
         nutrient = slots.get("nutrient")
         if not product_name or not nutrient:
             return "Please specify a product and nutrient."
-        product = find_product(product_name)
-        if not product:
+        group = PRODUCT_INDEX.best_id(product_name)
+        if group is None:
             return f"Sorry, I couldn’t find {product_name}."
+        row = int(CANONICAL.representative[group])
+        product = CANONICAL.product(row)
         
         # value = None
         # for k, v in product["nutrition"].items():
@@ -238,6 +276,12 @@ def answer_query(intent: str, slots: Dict[str, Any]) -> str:
         #     return f"{nutrient.capitalize()} in {product['name']}: {value} per 100 g.\nSource: {product['url']}"
         # return f"Sorry, I couldn't find {nutrient} info for {product['name']}.\nSource: {product['url']}"
         if nutrient and nutrient != 'nutrition':
+            # Known nutrients come straight from the parsed numeric columns
+            col = nutrient_column(nutrient)
+            if col and col != "price":
+                number = CATALOG.value(row, col)
+                if number is not None:
+                    return f"{nutrient.capitalize()} in {product['name']}: {number:g} {UNITS[col]} per 100 g.\nSource: {product['url']}"
             value = None
             for k, v in product["nutrition"].items():
                 if nutrient.lower() in k.lower():
@@ -259,6 +303,56 @@ def answer_query(intent: str, slots: Dict[str, Any]) -> str:
             return "Please specify a product name."
         return find_price(product_name)
 
+    elif intent == "recipe_detail":
+        rid_or_title = slots.get("recipe_title") or slots.get("recipe_id") or ""
+        if not rid_or_title:
+            return "Tell me which recipe: 'show <title>' or 'show <id>'."
+        # accept id or partial title
+        r = RECIPE_INDEX.get(rid_or_title)
+        if not r:
+            r = find_recipe_by_id_or_title(rid_or_title)
+        if not r:
+            return f"Couldn’t find a recipe matching '{rid_or_title}'."
+        payload = recipe_detail_payload(r)
+        # format a friendly text answer
+        out = [f"🍽️ {payload['title']}\n",
+            "Ingredients:"]
+        out += [f"• {ing}" for ing in payload["ingredients"]]
+        out += ["\nSteps:"]
+        out += [f"{i+1}) {s}" for i, s in enumerate(payload["steps"])]
+        out += ["\nWhere to buy (best match):"]
+        for link in payload["where_to_buy"]:
+            if link["product_name"]:
+                out.append(f"• {link['ingredient']} → {link['product_name']} ({link['store']}) {link['price']} | {link['url']}")
+            else:
+                out.append(f"• {link['ingredient']} → (no match)")
+        return "\n".join(out)
+    
+    return "I’m not sure how to help with that yet."
+
+RAG_INTENTS = ("meal_recommendation", "recipe_query")
+# Part of the answer cache key: bump it when a RAG prompt template changes
+PROMPT_VERSION = "2"
+
+def recipe_context(recipes):
+    # Compact, token-budgeted lines for the RAG prompts (rag_context.py)
+    return build_context(recipes)
+
+def record_prompt(intent: str, prompt: str, context: Dict[str, Any]):
+    tokens = count_tokens(prompt)
+    PROMPT_STATS.record(tokens, context)
+    log_event(log, "rag_prompt", intent=intent, prompt_tokens=tokens, context_tokens=context["tokens"],
+              context_budget=context["budget"], recipes=context["recipes"])
+
+@traced("prepare_rag")
+def prepare_rag(intent: str, slots: Dict[str, Any]):
+    """Retrieve context for a RAG intent.
+
+    Returns (prompt, None, cache_key) when Gemini has to write the answer,
+    (None, cached answer, cache_key) when it already did for the same
+    request and recipes, or (None, answer, None) when we can reply without it.
+    Only prompts that go to Gemini are built and recorded.
+    """
     
     # elif intent == "recipe_query":
     #     ingredient = slots.get("ingredient")
@@ -274,11 +368,15 @@ def answer_query(intent: str, slots: Dict[str, Any]) -> str:
     #         + "\n".join(lines)
     #         + "\n\nAsk: 'show <title>' or 'show <id>' to see full details.")
     
-    elif intent == "meal_recommendation":
+    if intent == "meal_recommendation":
         query_text = slots.get("query")
         retrieved = retrieve_recipes(query_text, top_k=5)
+        key = answer_key(intent, query_text, [r["id"] for r in retrieved], PROMPT_VERSION, MODEL_NAME)
+        cached = cached_answer(key)
+        if cached is not None:
+            return None, cached, key
 
-        context_text = "\n".join([f"- {r['title']}: {r.get('instructions', '')}, {r.get('ingredients', [])}" for r in retrieved])
+        context_text, context = recipe_context(retrieved)
 
 
         rag_prompt = f"""
@@ -292,9 +390,8 @@ def answer_query(intent: str, slots: Dict[str, Any]) -> str:
 
         Please answer in a friendly and concise way.
         """
-        model = genai.GenerativeModel("models/gemini-2.5-flash")
-        answer = model.generate_content(rag_prompt).text
-        return answer
+        record_prompt(intent, rag_prompt, context)
+        return rag_prompt, None, key
 
     # elif intent == "meal_recommendation":
         query = slots.get("query", "")
@@ -320,25 +417,30 @@ def answer_query(intent: str, slots: Dict[str, Any]) -> str:
             recipes = [r for r in recipes if meal_type.lower() in str(r.get("title", "")).lower()]
 
         if not recipes:
-            return f"Sorry, I couldn’t find any recipes."
+            return None, f"Sorry, I couldn’t find any recipes.", None
         
         import random
         selected_recipes = random.sample(recipes, min(quantity, len(recipes)))
         lines = [f"{i+1}. 🍽️ {r['title']}" for i, r in enumerate(selected_recipes)]
-        return f"🌱 Here are some recipes" + (f" rich in {nutrient}" if nutrient else "") + ":\n" + "\n".join(lines)
+        return None, f"🌱 Here are some recipes" + (f" rich in {nutrient}" if nutrient else "") + ":\n" + "\n".join(lines), None
 
     elif intent == "recipe_query":
         ingredient = slots.get("ingredient")
         quantity = slots.get("quantity", 5)
         if not ingredient:
-            return "Please specify an ingredient or type of meal (e.g., 'recipes with chicken')."
+            return None, "Please specify an ingredient or type of meal (e.g., 'recipes with chicken').", None
 
         # hits = list_recipes_by_ingredient(ingredient, limit=quantity)
         hits = retrieve_recipes(ingredient, top_k=quantity)
         if not hits:
-            return f"Sorry, I couldn’t find recipes with {ingredient}."
-
-        context_text = "\n".join([f"- {r['title']}: {r.get('instructions', '')}, {r.get('ingredients', [])}" for r in hits])
+            return None, f"Sorry, I couldn’t find recipes with {ingredient}.", None
+        key = answer_key(intent, ingredient, [r["id"] for r in hits], PROMPT_VERSION, MODEL_NAME,
+                         quantity=quantity)
+        cached = cached_answer(key)
+        if cached is not None:
+            return None, cached, key
+
+        context_text, context = recipe_context(hits)
         
         rag_prompt = f"""
         You are a helpful cooking assistant.
@@ -352,10 +454,8 @@ def answer_query(intent: str, slots: Dict[str, Any]) -> str:
         Format:
         1. Title - brief description
         """
-        model = genai.GenerativeModel("models/gemini-2.5-flash")
-        answer = model.generate_content(rag_prompt).text
-
-        return answer
+        record_prompt(intent, rag_prompt, context)
+        return rag_prompt, None, key
         # Titles only (no ids, no instructions)
         # lines = [f"{i+1}. 🍽️ {h['title']}" for i, h in enumerate(hits)]
 
@@ -365,35 +465,38 @@ def answer_query(intent: str, slots: Dict[str, Any]) -> str:
             "• *Show Lentil Burgers*\n"
             "• *Show Miso-Butter Roast Chicken With Acorn Squash Panzanella*")
 
-        return f"Here are some recipes with **{ingredient}**:\n" + "\n".join(lines) + follow_ups
+        return None, f"Here are some recipes with **{ingredient}**:\n" + "\n".join(lines) + follow_ups, None
 
 
-    elif intent == "recipe_detail":
-        rid_or_title = slots.get("recipe_title") or slots.get("recipe_id") or ""
-        if not rid_or_title:
-            return "Tell me which recipe: 'show <title>' or 'show <id>'."
-        # accept id or partial title
-        r = next((x for x in RECIPES if x["id"] == rid_or_title), None)
-        if not r:
-            r = find_recipe_by_id_or_title(rid_or_title)
-        if not r:
-            return f"Couldn’t find a recipe matching '{rid_or_title}'."
-        payload = recipe_detail_payload(r)
-        # format a friendly text answer
-        out = [f"🍽️ {payload['title']}\n",
-            "Ingredients:"]
-        out += [f"• {ing}" for ing in payload["ingredients"]]
-        out += ["\nSteps:"]
-        out += [f"{i+1}) {s}" for i, s in enumerate(payload["steps"])]
-        out += ["\nWhere to buy (best match):"]
-        for link in payload["where_to_buy"]:
-            if link["product_name"]:
-                out.append(f"• {link['ingredient']} → {link['product_name']} ({link['store']}) {link['price']} | {link['url']}")
-            else:
-                out.append(f"• {link['ingredient']} → (no match)")
-        return "\n".join(out)
-    
-    return "I’m not sure how to help with that yet."
+    return None, "I’m not sure how to help with that yet.", None
+
+@traced("answer_query")
+def answer_query(intent: str, slots: Dict[str, Any]) -> str:
+    if intent in RAG_INTENTS:
+        prompt, answer, key = prepare_rag(intent, slots)
+        if not prompt:
+            return answer
+        with span("generation"):
+            answer = generate(prompt)
+        store_answer(key, answer)
+        return answer
+    with span("answer_locally"):
+        return answer_locally(intent, slots)
+
+@traced("answer_query")
+async def answer_query_async(intent: str, slots: Dict[str, Any]) -> str:
+    # Retrieval and local lookups are CPU bound, keep them off the event loop
+    if intent in RAG_INTENTS:
+        prompt, answer, key = await run_in_threadpool(prepare_rag, intent, slots)
+        if not prompt:
+            return answer
+        with span("generation"):
+            answer = await generate_async(prompt)
+        store_answer(key, answer)
+        return answer
+    with span("answer_locally"):
+        return await run_in_threadpool(answer_locally, intent, slots)
+
 
 # API ENDPOINT
 
@@ -403,76 +506,181 @@ class AskResponse(BaseModel):
     slots: Optional[Dict[str, Any]] = None
 
 @app.get("/ask", response_model=AskResponse)
-def ask(q: str = Query(..., description="User query")):
-    route = classify(q)
-    print("🔍 Route:", route)
+async def ask(q: str = Query(..., description="User query")):
+    route = await classify_async(q)
     intent = route.get("intent", "unknown")
     slots = route.get("slots", {})
-    answer = answer_query(intent, slots)
+    set_intent(intent)
+    log_event(log, "route", query=q, intent=intent, slots=slots)
+    answer = await answer_query_async(intent, slots)
     return {"intent": intent, "answer": answer, "slots": slots}
 
+@app.get("/products/search")
+def products_search(
+    where: List[str] = Query([], description="Filters like protein>=20 or kcal<=150 (per 100 g, price in kr)"),
+    sort: Optional[str] = Query(None, description="Column to sort by, e.g. protein or protein_per_kr"),
+    order: str = Query("desc", pattern="^(asc|desc)$"),
+    store: Optional[str] = Query(None, description="Only products from this store (Hemköp, Ica)"),
+    offset: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=200),
+):
+    try:
+        total, rows = search_products(CATALOG, where, sort, order == "desc", store, offset, limit)
+        results = describe(CATALOG, PRODUCTS, rows, sort)
+    except SearchError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"total": total, "offset": offset, "limit": limit, "results": results}
+
+@app.get("/products/compare")
+def products_compare(
+    q: str = Query(..., description="Item to compare, e.g. kycklingfilé"),
+    unit: Optional[str] = Query(None, pattern="^(kg|l|st)$"),
+    limit: int = Query(5, ge=1, le=50),
+):
+    comparison = compare_prices(CATALOG, PRODUCT_INDEX, translate_term(q), k=limit, unit=unit,
+                                groups=CANONICAL.group_of)
+    if not comparison:
+        return {"query": q, "unit": unit, "matches": 0, "cheapest": [], "per_store": []}
+    u = comparison["unit"]
+    return {
+        "query": q,
+        "unit": u,
+        "matches": comparison["matches"],
+        "cheapest": describe_offers(CATALOG, PRODUCTS, comparison["cheapest"], u),
+        "per_store": describe_offers(CATALOG, PRODUCTS, comparison["per_store"], u),
+    }
+
+def sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@app.get("/ask/stream")
+async def ask_stream(q: str = Query(..., description="User query")):
+    """Server-sent events: `intent` first, then `token` chunks, then `done`."""
+    async def events():
+        # The request's trace, opened by the middleware before the body is sent
+        trace = current_trace() or Trace()
+        first_token = None
+        outcome = "done"
+
+        def token(text: str) -> str:
+            nonlocal first_token
+            if first_token is None:
+                first_token = time.perf_counter() - trace.started
+                FIRST_TOKEN_SECONDS.observe(first_token, trace.intent)
+            return sse("token", {"text": text})
+
+        try:
+            route = await classify_async(q)
+            intent = route.get("intent", "unknown")
+            slots = route.get("slots", {})
+            set_intent(intent)
+            log_event(log, "route", query=q, intent=intent, slots=slots)
+            yield sse("intent", {"intent": intent, "slots": slots})
+            try:
+                if intent in RAG_INTENTS:
+                    prompt, answer, key = await run_in_threadpool(prepare_rag, intent, slots)
+                    if prompt:
+                        chunks = []
+                        with span("generation"):
+                            async for text in stream_async(prompt):
+                                chunks.append(text)
+                                yield token(text)
+                        store_answer(key, "".join(chunks))
+                    else:
+                        yield token(answer)
+                else:
+                    answer = await run_in_threadpool(answer_locally, intent, slots)
+                    yield token(answer)
+            except Exception as e:
+                outcome = "error"
+                log.warning(f"Streaming error: {e}")
+                yield sse("error", {"message": str(e)})
+            yield sse("done", {})
+        except BaseException:
+            # Client went away (or the server is stopping) mid-stream
+            outcome = "disconnected"
+            raise
+        finally:
+            finish_ask("/ask/stream", trace, status=200, outcome=outcome,
+                       first_token_ms=round(first_token * 1000, 3) if first_token is not None else None)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 # Root 
 
 @app.get("/")
 def root():
     return {"message": "SmartRecipe API is running 🚀"}
 
-import pandas as pd
-
-# LOAD RECIPES
-def load_recipes():
-    base = Path.cwd() / "recipes.csv"
-    recipes = []
-    try:
-        df = pd.read_csv(base)
-        for _, row in df.iterrows():
-            recipes.append({
-                "title": row["Title"],
-                "ingredients": row["Ingredients"],
-                "instructions": row["Instructions"],
-                "image": row.get("Image_Name", ""),
-                "cleaned_ingredients": row.get("Cleaned_Ingredients", "")
-            })
-        print(f"Loaded {len(recipes)} recipes")
-    except Exception as e:
-        print("Error loading recipes:", e)
-    return recipes
-
-RECIPES = load_recipes()
-
-import re, ast
-
-def slugify(title: str) -> str:
-    s = re.sub(r"[^a-zA-Z0-9]+", "-", title.lower()).strip("-")
-    return s[:80]
+@app.get("/stats/encoders")
+def encoders():
+    # Batch sizes and queue/encode latency per encoder, for tuning the batcher
+    return encoder_stats()
+
+@app.get("/stats/cache")
+def caches():
+    # Hit/miss counts; every intent hit is one Gemini call saved
+    return {"intent": INTENT_CACHE.stats(), "ingredient_matches": INGREDIENT_MATCHER.stats(),
+            "answers": ANSWER_CACHE.stats(), "canonical": CANONICAL.stats()}
+
+@app.get("/stats/llm")
+def llm_stats():
+    # Gemini (or fake backend) calls, retries and failures
+    return {**LLM.stats(), "prompts": PROMPT_STATS.stats()}
+
+def cache_counts():
+    intent, answers, matches = INTENT_CACHE.stats(), ANSWER_CACHE.stats(), INGREDIENT_MATCHER.stats()
+    router = ROUTER.stats()
+    return {
+        "intent": (intent["hits"], intent["misses"]),
+        "answers": (answers["hits"], answers["misses"]),
+        "ingredient_matches": (matches["hits"] + matches["precomputed_hits"], matches["misses"]),
+        "router": (router["rule_hits"] + router["centroid_hits"], router["llm_fallbacks"]),
+    }
 
-def parse_ingredients_field(val):
-    """Recipes CSV stores ingredients as a python-ish list string."""
-    if isinstance(val, list):
-        return val
-    s = str(val)
-    try:
-        out = ast.literal_eval(s)
-        if isinstance(out, list):
-            return [str(x) for x in out]
-    except Exception:
-        pass
-    # fallback: split by commas
-    return [x.strip() for x in s.split(",") if x.strip()]
-
-def split_instructions(s: str):
-    raw = str(s).replace("\r\n", "\n").replace("\r", "\n")
-    parts = [p.strip(" \t") for p in raw.split("\n") if p.strip()]
-    if len(parts) <= 1:
-        # fallback to sentence-ish split
-        parts = [p.strip() for p in re.split(r"\.\s+", raw) if p.strip()]
-    return parts
-
-# Precompute IDs for recipes
-for r in RECIPES:
-    r["id"] = slugify(str(r["title"] if "title" in r else r.get("Title", "")) or str(r.get("title","")))
-    if not r["id"]:
-        r["id"] = slugify(r.get("Title","untitled"))
+REGISTRY.collect("matkompis_cache_hits_total", "Cache hits (router: queries routed without Gemini)",
+                 "counter", ("cache",), lambda: {(k,): v[0] for k, v in cache_counts().items()})
+REGISTRY.collect("matkompis_cache_misses_total", "Cache misses (router: queries sent to Gemini)",
+                 "counter", ("cache",), lambda: {(k,): v[1] for k, v in cache_counts().items()})
+REGISTRY.collect("matkompis_cache_hit_ratio", "Share of lookups answered from the cache", "gauge", ("cache",),
+                 lambda: {(k,): v[0] / (v[0] + v[1]) for k, v in cache_counts().items() if v[0] + v[1]})
+REGISTRY.collect("matkompis_llm_calls_total", "LLM calls, including retries", "counter", ("backend",),
+                 lambda: {(LLM.stats()["backend"],): LLM.stats()["calls"]})
+REGISTRY.collect("matkompis_llm_retries_total", "LLM calls retried after an error", "counter", ("backend",),
+                 lambda: {(LLM.stats()["backend"],): LLM.stats()["retries"]})
+REGISTRY.collect("matkompis_llm_failures_total", "LLM calls that failed for good", "counter", ("backend",),
+                 lambda: {(LLM.stats()["backend"],): LLM.stats()["failures"]})
+REGISTRY.collect("matkompis_llm_prompt_tokens_avg", "Average estimated RAG prompt tokens", "gauge", (),
+                 lambda: {(): PROMPT_STATS.stats()["avg_prompt_tokens"]})
+
+@app.get("/metrics")
+def metrics():
+    # Prometheus text format: latency histograms per stage and intent, cache and LLM counters
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/stats/router")
+def router():
+    # How many queries were routed locally vs sent to Gemini
+    return ROUTER.stats()
+
+RECIPES = SNAPSHOT.recipes if SNAPSHOT is not None else assign_recipe_ids(load_recipes())
+
+import re
+
+RECIPE_INDEX = RecipeIndex(RECIPES)
+# recipes_index.faiss rows -> RECIPES positions, matched on recipe ids
+RECIPE_ROWS = RowMap("recipe_ids", recipe_keys(RECIPES))
+
+# Lexical BM25 next to FAISS, merged with reciprocal rank fusion (recipe_retrieval.py)
+try:
+    _bm25_path = ARTIFACTS.resolve(BM25_FILE)
+except FileNotFoundError:
+    _bm25_path = None
+RECIPE_BM25 = load_or_build(RECIPES, recipe_keys(RECIPES), _bm25_path) if HYBRID else None
 
 def _rec_title(r):
     return r.get("title") or r.get("Title") or "Untitled"
@@ -502,33 +710,17 @@ def _rec_title(r):
 
 
 def find_recipe_by_id_or_title(q: str):
-    ql = str(q).lower().strip()
-    best = None
-    best_score = 0
-    for r in RECIPES:
-        title = _rec_title(r)
-        # 🔹 Ensure it's always a string
-        title_str = str(title) if not isinstance(title, float) else ""
-        tl = title_str.lower()
-        # 🔹 Simple overlap score
-        score = 0
-        if ql in tl:
-            score += 3
-        # 🔹 Token overlap
-        tokens = set(re.findall(r"[a-z0-9]+", ql))
-        score += len(tokens & set(re.findall(r"[a-z0-9]+", tl)))
-        if score > best_score:
-            best_score = score
-            best = r
-    return best
+    return RECIPE_INDEX.lookup(q)
 
+@traced("retrieve_recipes")
 def retrieve_recipes(query, top_k=5):
-    model = SentenceTransformer('all-MiniLM-L6-v2')
-    query_emb = model.encode([query])
-
-    recipe_index = faiss.read_index("recipes_index.faiss")
-    distances, indices = recipe_index.search(query_emb, top_k)
-    return [RECIPES[i] for i in indices[0]]
+    with span("encode"):
+        query_emb = encode(RECIPE_MODEL, [query])
+    recipe_index = ARTIFACTS.get("recipe_index")
+    # Candidates are re-scored with recipes_embeddings.npy when the index is compressed
+    embeddings = ARTIFACTS.get("recipe_embeddings") if needs_rerank_vectors(recipe_index) else None
+    positions = hybrid_search(query, query_emb, recipe_index, RECIPE_ROWS, RECIPE_BM25, top_k, embeddings)
+    return [RECIPES[i] for i in positions]
 
 # def filter_recipes_by_diet(diet: str):
     diet = diet.lower()
@@ -634,43 +826,16 @@ def retrieve_recipes(query, top_k=5):
 #     }
 
 
+@traced("recipe_detail_payload")
 def recipe_detail_payload(r, sim_threshold: float = 0.6):
-    model = SentenceTransformer('KBLab/sentence-bert-swedish-cased')
     title = _rec_title(r)
-    ingredients = parse_ingredients_field(r.get("ingredients") or r.get("Ingredients",""))
-    steps = split_instructions(r.get("instructions") or r.get("Instructions",""))
-
-    ing_texts = [ing.lower() for ing in ingredients]
-    ing_embeddings = model.encode(ing_texts, convert_to_numpy=True, show_progress_bar=False)
-    faiss.normalize_L2(ing_embeddings)
-
-    product_embeddings = np.load("product_embeddings.npy")
-    sims = ing_embeddings @ product_embeddings.T  # shape = (num_ingredients, num_products)
-
-    mapped_links = []
-    for i, ing in enumerate(ingredients):
-        best_idx = int(np.argmax(sims[i]))
-        best_score = float(sims[i, best_idx])
+    # Parsed once by load_recipes / the snapshot
+    ingredients = r.get("ingredients") or []
+    steps = r.get("steps") or []
 
-        if best_score < sim_threshold:
-            mapped_links.append({
-                "ingredient": ing,
-                "product_name": None,
-                "store": None,
-                "price": None,
-                "url": None
-            })
-            continue
-        
-        best_prod = PRODUCTS[best_idx]
-        mapped_links.append({
-            "ingredient": ing,
-            "product_name": best_prod["name"],
-            "store": best_prod.get("store"),
-            "price": best_prod.get("price"),
-            "url": best_prod.get("url", ""),
-            "similarity": round(best_score, 3)
-        })
+    with span("product_matching"):
+        matches = INGREDIENT_MATCHER.match(ingredients)
+    mapped_links = where_to_buy(CANONICAL, ingredients, matches, sim_threshold)
 
     return {
         "id": r["id"],
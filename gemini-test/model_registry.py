@@ -0,0 +1,93 @@
+import os
+import threading
+from typing import Dict, Iterable, Optional
+
+from sentence_transformers import SentenceTransformer
+
+from telemetry import get_logger
+
+# MODEL REGISTRY
+#
+# Loading a SentenceTransformer takes seconds, so every encoder is loaded once
+# per process and shared by all requests and threads.
+
+log = get_logger(__name__)
+
+RECIPE_MODEL = "recipes"
+PRODUCT_MODEL = "products"
+
+DEFAULT_MODELS = {
+    RECIPE_MODEL: "all-MiniLM-L6-v2",
+    PRODUCT_MODEL: "KBLab/sentence-bert-swedish-cased",
+}
+
+
+def models_from_env() -> Dict[str, str]:
+    """Read the model set from MATKOMPIS_MODELS, e.g. "recipes=all-MiniLM-L6-v2,products=..."."""
+    models = dict(DEFAULT_MODELS)
+    raw = os.getenv("MATKOMPIS_MODELS", "")
+    for part in raw.split(","):
+        if "=" not in part:
+            continue
+        alias, name = part.split("=", 1)
+        if alias.strip() and name.strip():
+            models[alias.strip()] = name.strip()
+    return models
+
+
+class ModelRegistry:
+    def __init__(self, models: Optional[Dict[str, str]] = None, device: Optional[str] = None):
+        self.models = dict(models or DEFAULT_MODELS)
+        self.device = device
+        self._loaded: Dict[str, SentenceTransformer] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._guard = threading.Lock()
+
+    def register(self, alias: str, model_name: str):
+        with self._guard:
+            if alias in self._loaded and self.models.get(alias) != model_name:
+                del self._loaded[alias]
+            self.models[alias] = model_name
+
+    def _lock_for(self, alias: str) -> threading.Lock:
+        with self._guard:
+            return self._locks.setdefault(alias, threading.Lock())
+
+    def get(self, alias: str) -> SentenceTransformer:
+        """Return the encoder for `alias`, loading it on first use."""
+        model = self._loaded.get(alias)
+        if model is not None:
+            return model
+        if alias not in self.models:
+            raise KeyError(f"Unknown model alias: {alias}")
+        # One lock per alias so two different models can load in parallel,
+        # while concurrent first requests for the same model wait for one load.
+        with self._lock_for(alias):
+            model = self._loaded.get(alias)
+            if model is None:
+                log.info(f"Loading model {alias} ({self.models[alias]})")
+                model = SentenceTransformer(self.models[alias], device=self.device)
+                self._loaded[alias] = model
+        return model
+
+    def warm_up(self, aliases: Optional[Iterable[str]] = None):
+        """Eagerly load the given models (all configured models by default)."""
+        for alias in aliases or list(self.models):
+            self.get(alias)
+
+    def is_loaded(self, alias: str) -> bool:
+        return alias in self._loaded
+
+
+MODELS = ModelRegistry(models_from_env(), device=os.getenv("MATKOMPIS_DEVICE") or None)
+
+
+def warm_up_from_env():
+    """MATKOMPIS_WARMUP=1 loads every model, or a comma list of aliases loads just those."""
+    raw = os.getenv("MATKOMPIS_WARMUP", "").strip()
+    if not raw or raw.lower() in ("0", "false", "no"):
+        return
+    if raw.lower() in ("1", "true", "yes", "all"):
+        MODELS.warm_up()
+    else:
+        MODELS.warm_up([a.strip() for a in raw.split(",") if a.strip()])
@@ -0,0 +1,76 @@
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from catalog import PACK_UNIT_CODES, PACK_UNIT_NAMES, ProductCatalog
+from product_index import ProductIndex
+
+# CROSS-STORE PRICE COMPARISON
+#
+# For an item like "kycklingfilé" we score every product name against it in one
+# pass over the index, keep the close matches that have a unit price in the
+# same unit (kr/kg, kr/l or kr/st), and pick the cheapest per store with a
+# lexsort instead of looping over products. With `groups` (canonical.py) the
+# index holds one entry per canonical product and each score is spread to all
+# of its catalog rows.
+
+
+def compare_prices(catalog: ProductCatalog, index: ProductIndex, query: str, k: int = 5,
+                   min_score: float = 1.0, relative: float = 0.75,
+                   unit: Optional[str] = None, groups: Optional[np.ndarray] = None) -> Optional[Dict[str, Any]]:
+    """Cheapest equivalent products per kg/l/st, overall and per store (catalog rows)."""
+    score = index.scores(query)
+    if groups is not None:
+        score = score[groups]
+    unit_price = catalog.columns["unit_price"]
+    mask = np.isfinite(unit_price) & (score >= min_score)
+    if not mask.any():
+        return None
+    # "Equivalent" = close to the best match, not just sharing a trigram or two
+    mask &= score >= relative * score[mask].max()
+
+    if unit:
+        code = PACK_UNIT_CODES.get(unit.lower(), -1)
+    else:
+        # Compare in the unit of the most relevant match
+        code = int(catalog.pack_units[np.argmax(np.where(mask, score, -np.inf))])
+    mask &= catalog.pack_units == code
+    rows = np.flatnonzero(mask)
+    if not len(rows):
+        return None
+
+    prices = unit_price[rows]
+    cheapest = rows[np.argsort(prices, kind="stable")[:k]]
+
+    # Sort by (store, unit price); the first row of each store run is its cheapest
+    order = np.lexsort((prices, catalog.store_codes[rows]))
+    by_store = rows[order]
+    stores = catalog.store_codes[by_store]
+    first = np.ones(len(by_store), dtype=bool)
+    first[1:] = stores[1:] != stores[:-1]
+    per_store = by_store[first]
+    per_store = per_store[np.argsort(unit_price[per_store], kind="stable")]
+
+    return {
+        "unit": PACK_UNIT_NAMES.get(code, ""),
+        "matches": int(len(rows)),
+        "cheapest": cheapest,
+        "per_store": per_store,
+    }
+
+
+def describe_offers(catalog: ProductCatalog, products: Sequence[dict], rows: np.ndarray,
+                    unit: str) -> List[Dict[str, Any]]:
+    out = []
+    for row in rows.tolist():
+        p = products[int(catalog.product_ids[row])]
+        out.append({
+            "name": p.get("name"),
+            "store": p.get("store"),
+            "price": p.get("price"),
+            "size": p.get("size"),
+            "unit_price": round(float(catalog.columns["unit_price"][row]), 2),
+            "unit": f"kr/{unit}",
+            "url": p.get("url", ""),
+        })
+    return out
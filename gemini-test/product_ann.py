@@ -0,0 +1,118 @@
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import numpy as np
+
+from artifacts import ARTIFACTS
+from vector_index import INDEX_KINDS, build_index, index_bytes, search
+from telemetry import get_logger
+
+# PRODUCT ANN INDEX
+#
+# Inner-product search over the (L2-normalized) product embeddings, so scores
+# are cosine similarities like the old `ing_embeddings @ product_embeddings.T`.
+# MATKOMPIS_PRODUCT_INDEX picks the structure:
+#
+#   flat  exact, cost grows linearly with the catalog (default)
+#   hnsw  graph search; MATKOMPIS_HNSW_M, MATKOMPIS_HNSW_EF_SEARCH
+#   ivf   inverted lists; MATKOMPIS_IVF_NLIST (0 = about 4*sqrt(n)), MATKOMPIS_IVF_NPROBE
+#   fp16, sq8, pq  compressed vectors (see vector_index.py); MATKOMPIS_PQ_M
+#
+# MATKOMPIS_RERANK=4 re-scores the top 4*k candidates of a compressed index
+# with the float rows. benchmarks/product_ann.py measures recall@1/@5,
+# memory and latency of each choice. With a row filter (main.py passes the
+# canonical products, see canonical.py) only those embedding rows are indexed;
+# results are still embedding rows. The index is rebuilt when the embeddings,
+# their ids file or canonical_groups.json change, since the filter reads them.
+
+log = get_logger(__name__)
+
+
+def index_params_from_env() -> Dict[str, int]:
+    return {
+        "hnsw_m": int(os.getenv("MATKOMPIS_HNSW_M", "32")),
+        "ef_construction": int(os.getenv("MATKOMPIS_HNSW_EF_CONSTRUCTION", "80")),
+        "ef_search": int(os.getenv("MATKOMPIS_HNSW_EF_SEARCH", "64")),
+        "nlist": int(os.getenv("MATKOMPIS_IVF_NLIST", "0")),
+        "nprobe": int(os.getenv("MATKOMPIS_IVF_NPROBE", "8")),
+        "pq_m": int(os.getenv("MATKOMPIS_PQ_M", "0")),
+    }
+
+
+def _stamp(name: str) -> Optional[Tuple[int, int]]:
+    try:
+        return ARTIFACTS.version(name)
+    except FileNotFoundError:
+        return None
+
+
+def build_ann_index(embeddings: np.ndarray, kind: str = "flat", **params):
+    """Inner-product index of the given kind over `embeddings`."""
+    return build_index(embeddings, kind, metric="ip", **params)
+
+
+class ProductANN:
+    """Lazily built index over the product_embeddings artifact, rebuilt when it changes."""
+
+    def __init__(self, kind: str = "flat", params: Optional[Dict[str, int]] = None, rerank: int = 0,
+                 row_filter: Optional[Callable[[np.ndarray], np.ndarray]] = None):
+        if kind not in INDEX_KINDS:
+            raise ValueError(f"Unknown product index '{kind}'. Use one of {', '.join(INDEX_KINDS)}.")
+        self.kind = kind
+        self.params = params or {}
+        self.rerank = rerank
+        self.row_filter = row_filter
+        self._index = None
+        self._source = None
+        self._stamps = None  # ids and canonical groups files the row filter saw
+        self._rows: Optional[np.ndarray] = None  # index id -> embedding row, None = all
+        self._vectors = None  # what the index ids point into, for re-ranking
+        self._lock = threading.Lock()
+        self.build_seconds = 0.0
+
+    def restrict(self, row_filter: Optional[Callable[[np.ndarray], np.ndarray]]):
+        """Index only the embedding rows `row_filter(embeddings)` returns; rebuilt on next use."""
+        with self._lock:
+            self.row_filter = row_filter
+            self._index = self._source = self._stamps = None
+
+    def index(self) -> Tuple[Any, Optional[np.ndarray], np.ndarray]:
+        """(index, index id -> embedding row or None, vectors), consistent with each other."""
+        embeddings = ARTIFACTS.get("product_embeddings")
+        stamps = (_stamp("product_ids"), _stamp("canonical_groups")) if self.row_filter else None
+        with self._lock:
+            if self._index is None or self._source is not embeddings or self._stamps != stamps:
+                started = time.perf_counter()
+                rows = self.row_filter(embeddings) if self.row_filter else None
+                vectors = embeddings if rows is None else np.asarray(embeddings[rows])
+                self._index = build_ann_index(vectors, self.kind, **self.params)
+                self._rows, self._vectors = rows, vectors
+                self._source, self._stamps = embeddings, stamps
+                self.build_seconds = time.perf_counter() - started
+                log.info(f"Built {self.kind} product index over {len(vectors)} rows "
+                         f"in {self.build_seconds:.2f}s")
+            return self._index, self._rows, self._vectors
+
+    def search(self, queries: np.ndarray, k: int = 5) -> Tuple[np.ndarray, np.ndarray]:
+        """(scores, embedding rows) of the k most similar products per query; rows are -1 past the end."""
+        index, rows, vectors = self.index()
+        scores, ids = search(index, queries, k, vectors, self.rerank, metric="ip")
+        if rows is not None:
+            ids = np.where(ids >= 0, rows[np.maximum(ids, 0)], -1)
+        return scores, ids
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "kind": self.kind,
+            "params": self.params,
+            "rerank": self.rerank,
+            "rows": self._index.ntotal if self._index is not None else 0,
+            "index_bytes": index_bytes(self._index) if self._index is not None else 0,
+            "build_seconds": round(self.build_seconds, 3),
+        }
+
+
+PRODUCT_ANN = ProductANN(os.getenv("MATKOMPIS_PRODUCT_INDEX", "flat").lower(), index_params_from_env(),
+                         rerank=int(os.getenv("MATKOMPIS_RERANK", "0")))
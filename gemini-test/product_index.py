@@ -0,0 +1,146 @@
+import re
+import unicodedata
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# PRODUCT INDEX
+#
+# Inverted index over product names: whole tokens plus character trigrams, so
+# "kyckling" finds "Kycklingkebab Fryst" and "apple" still finds "Äpple".
+# Text is folded (å/ä → a, ö → o, é → e) before indexing; an exact match on the
+# unfolded name gets a small bonus so Swedish spellings rank first.
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def normalize(text: str) -> str:
+    return unicodedata.normalize("NFC", str(text or "")).lower()
+
+
+def fold(text: str) -> str:
+    """Lowercase and strip diacritics: "Äpple Röd" -> "apple rod"."""
+    decomposed = unicodedata.normalize("NFKD", normalize(text))
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_RE.findall(fold(text))
+
+
+def trigrams(tokens: Sequence[str]) -> List[str]:
+    s = f" {' '.join(tokens)} "
+    return list({s[i:i + 3] for i in range(len(s) - 2)})
+
+
+class ProductIndex:
+    def __init__(self, products: Sequence[dict], key: str = "name"):
+        self.key = key
+        # Kept by reference: a snapshot-backed sequence stays lazy
+        self.products: Sequence[dict] = products
+        self._owned = False
+        self.names: List[str] = []
+        self.folded: List[str] = []
+        self._tokens: Dict[str, List[int]] = {}
+        self._grams: Dict[str, List[int]] = {}
+        self._gram_counts: List[int] = []
+        self._arrays: Dict[str, np.ndarray] = {}
+        field = getattr(products, "field", None)
+        for i in range(len(products)):
+            self._index_name(i, field(key, i) if field else products[i].get(key))
+
+    def __len__(self):
+        return len(self.names)
+
+    def add(self, product: dict) -> int:
+        """Index one more product (e.g. a new store or category) and return its id."""
+        if not self._owned:
+            # Copy on first add so the caller's sequence is never modified
+            self.products = list(self.products)
+            self._owned = True
+        self.products.append(product)
+        return self._index_name(len(self.names), product.get(self.key))
+
+    def _index_name(self, idx: int, name) -> int:
+        name = str(name or "")
+        tokens = tokenize(name)
+        grams = trigrams(tokens)
+        self.names.append(normalize(name))
+        self.folded.append(" ".join(tokens))
+        self._gram_counts.append(len(grams))
+        for t in set(tokens):
+            self._tokens.setdefault(t, []).append(idx)
+        for g in grams:
+            self._grams.setdefault(g, []).append(idx)
+        self._arrays.clear()
+        return idx
+
+    def _postings(self, table: Dict[str, List[int]], key: str) -> Optional[np.ndarray]:
+        cache_key = f"{id(table)}:{key}"
+        arr = self._arrays.get(cache_key)
+        if arr is None:
+            ids = table.get(key)
+            if ids is None:
+                return None
+            arr = self._arrays[cache_key] = np.asarray(ids, dtype=np.int64)
+        return arr
+
+    def scores(self, query: str) -> np.ndarray:
+        """Relevance of every product to `query` (0 where nothing is shared)."""
+        n = len(self.names)
+        q_tokens = tokenize(query)
+        if not n or not q_tokens:
+            return np.zeros(n, dtype=np.float32)
+        q_grams = trigrams(q_tokens)
+
+        gram_lists = [a for a in (self._postings(self._grams, g) for g in q_grams) if a is not None]
+        if not gram_lists:
+            return np.zeros(n, dtype=np.float32)
+        shared = np.bincount(np.concatenate(gram_lists), minlength=n).astype(np.float32)
+        name_grams = self._arrays.get("gram_counts")
+        if name_grams is None:
+            name_grams = self._arrays["gram_counts"] = np.asarray(self._gram_counts, dtype=np.float32)
+
+        containment = shared / len(q_grams)
+        jaccard = shared / (len(q_grams) + name_grams - shared + 1e-9)
+        score = containment + 0.5 * jaccard
+
+        token_lists = [a for a in (self._postings(self._tokens, t) for t in set(q_tokens)) if a is not None]
+        if token_lists:
+            score += np.bincount(np.concatenate(token_lists), minlength=n) / len(set(q_tokens))
+        return score
+
+    def search(self, query: str, k: int = 10, min_score: float = 0.0) -> List[Tuple[int, float]]:
+        """Ranked (product id, score) candidates for `query`, best first."""
+        n = len(self.names)
+        q_tokens = tokenize(query)
+        if not n or not q_tokens:
+            return []
+        score = self.scores(query)
+
+        # Only the best few candidates get the (Python-level) substring checks
+        top = min(n, max(k * 5, 50))
+        cand = np.argpartition(-score, top - 1)[:top]
+        q_folded = " ".join(q_tokens)
+        q_exact = normalize(query).strip()
+        results = []
+        for i in cand:
+            s = float(score[i])
+            if s <= 0:
+                continue
+            if q_folded in self.folded[i]:
+                s += 1.0
+            if q_exact and q_exact in self.names[i]:
+                s += 0.1
+            if s >= min_score:
+                results.append((int(i), s))
+        results.sort(key=lambda x: (-x[1], len(self.names[x[0]])))
+        return results[:k]
+
+    def best_id(self, query: str, min_score: float = 1.0) -> Optional[int]:
+        hits = self.search(query, k=1, min_score=min_score)
+        return hits[0][0] if hits else None
+
+    def best(self, query: str, min_score: float = 1.0) -> Optional[dict]:
+        idx = self.best_id(query, min_score)
+        return self.products[idx] if idx is not None else None
@@ -0,0 +1,130 @@
+import re
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from catalog import COLUMNS, PACK_UNIT_CODES, ProductCatalog
+
+# STRUCTURED PRODUCT SEARCH
+#
+# Multi-attribute filters and sorts over the numeric catalog, e.g.
+#   filters=["protein>=20", "kcal<=150"], sort_by="protein_per_kr"
+# Every filter is one vectorized compare over a whole column (NaN never
+# passes), and sorting only fully orders the rows up to the requested page,
+# with ties broken by catalog row so consecutive pages never overlap.
+
+OPS = {
+    ">=": np.greater_equal,
+    "<=": np.less_equal,
+    ">": np.greater,
+    "<": np.less,
+    "=": np.equal,
+    "==": np.equal,
+}
+
+FILTER_RE = re.compile(r"^\s*([a-z_]+)\s*(>=|<=|==|=|>|<)\s*(-?\d+(?:[.,]\d+)?)\s*$")
+
+# "kr" and "krona" read better in a URL than "unit_price". Per krona means per
+# krona of kr/kg (or kr/l), so a small pack does not win on its low shelf price;
+# "<a>_per_price" still divides by the pack price.
+PER_ALIASES = {"kr": "unit_price", "krona": "unit_price", "sek": "unit_price"}
+
+# Nutrients are per 100 g and unit_price is kr per kg: amount per krona = a * 10 / unit_price
+UNIT_PRICE_SCALE = 10.0
+
+
+class SearchError(ValueError):
+    pass
+
+
+def column_for(catalog: ProductCatalog, name: str) -> np.ndarray:
+    """A base column, or a ratio column "<a>_per_<b>" (e.g. protein_per_kr) computed once."""
+    name = name.lower()
+    if name in catalog.columns:
+        return catalog.columns[name]
+    if "_per_" in name:
+        num, den = name.split("_per_", 1)
+        den = PER_ALIASES.get(den, den)
+        if num in COLUMNS and (den in COLUMNS or den == "unit_price"):
+            cache = catalog.derived
+            key = f"{num}_per_{den}"
+            if key not in cache:
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    if den == "unit_price":
+                        # A price per piece says nothing about grams
+                        per_kg = np.where(catalog.pack_units == PACK_UNIT_CODES["st"], np.nan,
+                                          catalog.columns["unit_price"])
+                        ratio = catalog.columns[num] * UNIT_PRICE_SCALE / per_kg
+                    else:
+                        ratio = catalog.columns[num] / catalog.columns[den]
+                ratio[~np.isfinite(ratio)] = np.nan
+                cache[key] = ratio.astype(np.float32)
+            return cache[key]
+    raise SearchError(f"Unknown column '{name}'. Use one of {', '.join(COLUMNS)}, unit_price or <a>_per_<b>.")
+
+
+def parse_filter(expr: str) -> Tuple[str, str, float]:
+    m = FILTER_RE.match(expr.lower())
+    if not m:
+        raise SearchError(f"Bad filter '{expr}'. Expected e.g. 'protein>=20'.")
+    return m.group(1), m.group(2), float(m.group(3).replace(",", "."))
+
+
+def filter_mask(catalog: ProductCatalog, filters: Sequence[Tuple[str, str, float]],
+                store: Optional[str] = None) -> np.ndarray:
+    mask = np.ones(len(catalog), dtype=bool)
+    for col, op, value in filters:
+        with np.errstate(invalid="ignore"):
+            mask &= OPS[op](column_for(catalog, col), value)
+    if store:
+        mask &= catalog.store_codes == catalog.store_code(store)
+    return mask
+
+
+def search_products(catalog: ProductCatalog, filters: Sequence[str] = (), sort_by: Optional[str] = None,
+                    descending: bool = True, store: Optional[str] = None,
+                    offset: int = 0, limit: int = 20) -> Tuple[int, np.ndarray]:
+    """Return (total matches, catalog rows for the requested page)."""
+    parsed = [parse_filter(f) for f in filters]
+    # Resolved before the empty-page return so a bad column is an error on every page
+    sort_col = column_for(catalog, sort_by) if sort_by else None
+    rows = np.flatnonzero(filter_mask(catalog, parsed, store))
+    total = len(rows)
+    end = min(total, offset + limit)
+    if offset >= end:
+        return total, rows[:0]
+    if sort_col is not None:
+        key = sort_col[rows].astype(np.float64)
+        if descending:
+            key = -key
+        key[np.isnan(key)] = np.inf  # rows without a value go last
+        if end < total:
+            # Only the first `end` rows need an exact order. Every row tied with
+            # the end-th key is kept, so ties break by row the same way on each page.
+            bound = key[np.argpartition(key, end - 1)[end - 1]]
+            part = np.flatnonzero(key <= bound)
+        else:
+            part = np.arange(total)
+        rows = rows[part[np.lexsort((rows[part], key[part]))]]
+    return total, rows[offset:end]
+
+
+def describe(catalog: ProductCatalog, products: Sequence[dict], rows: np.ndarray,
+             sort_by: Optional[str] = None) -> List[Dict[str, object]]:
+    out = []
+    sort_col = column_for(catalog, sort_by) if sort_by else None
+    for row in rows.tolist():
+        p = products[int(catalog.product_ids[row])]
+        item: Dict[str, object] = {
+            "name": p.get("name"),
+            "store": p.get("store"),
+            "url": p.get("url"),
+        }
+        for c in COLUMNS:
+            v = catalog.value(row, c)
+            item[c] = None if v is None else round(v, 3)
+        if sort_col is not None and sort_by not in COLUMNS:
+            v = float(sort_col[row])
+            item[sort_by] = None if np.isnan(v) else round(v, 4)
+        out.append(item)
+    return out
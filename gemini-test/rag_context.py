@@ -0,0 +1,151 @@
+import math
+import os
+import re
+import threading
+from typing import Any, Dict, List, Sequence, Tuple
+
+from intent_cache import normalize_query
+
+# RAG CONTEXT
+#
+# The recommendation prompts used to paste every retrieved recipe's full
+# instructions and raw ingredient lines ("2 tablespoons finely chopped fresh
+# parsley, divided"). The context is now one compact line per recipe:
+# title, cleaned ingredients, and the first sentence of the first few steps,
+# within MATKOMPIS_RAG_CONTEXT_TOKENS tokens for the whole context. Each recipe,
+# in rank order, gets an even share of what is left, so room a short line does
+# not use goes to the ones after it. A line over its share loses steps first,
+# then ingredients; recipes with no room left are dropped.
+#
+# Token counts are estimated at ~4 characters per token (Gemini's tokenizer is
+# only available through an API call), which is close for English recipe text.
+
+CHARS_PER_TOKEN = 4
+CONTEXT_TOKENS = int(os.getenv("MATKOMPIS_RAG_CONTEXT_TOKENS", "600"))
+MAX_INGREDIENTS = 12
+MAX_STEPS = 3
+STEP_CHARS = 120
+# No recipe line is cut shorter than this
+MIN_LINE_CHARS = 20
+
+SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+
+
+def count_tokens(text: str) -> int:
+    return math.ceil(len(text or "") / CHARS_PER_TOKEN)
+
+
+def trim(text: str, max_chars: int) -> str:
+    """Cut at a word boundary and mark the cut with an ellipsis."""
+    text = " ".join(str(text or "").split())
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max_chars].rsplit(" ", 1)[0] or text[:max_chars]
+    return cut.rstrip(",;:.") + "…"
+
+
+def recipe_ingredients(r: dict) -> List[str]:
+    """Cleaned ingredients (else the raw lines), without repeats."""
+    items = r.get("cleaned_ingredients") or r.get("ingredients") or []
+    out, seen = [], set()
+    for item in items:
+        key = normalize_query(item)
+        if key and key not in seen:
+            seen.add(key)
+            out.append(" ".join(str(item).split()))
+    return out
+
+
+def step_summary(r: dict, max_steps: int = MAX_STEPS, step_chars: int = STEP_CHARS) -> str:
+    """A stored `summary`, else the first sentence of each of the first steps."""
+    if r.get("summary"):
+        return trim(r["summary"], max_steps * step_chars)
+    out, seen = [], set()
+    for step in r.get("steps") or []:
+        first = SENTENCE_RE.split(str(step).strip(), 1)[0]
+        key = normalize_query(first)
+        if not key or key in seen:
+            continue
+        seen.add(key)
+        out.append(trim(first, step_chars))
+        if len(out) == max_steps:
+            break
+    return " ".join(out)
+
+
+def recipe_line(r: dict, max_chars: int) -> str:
+    """"- Title: ingredients | steps" in at most `max_chars`, dropping steps before ingredients."""
+    title = trim(r.get("title") or "", 100)
+    ingredients = ", ".join(recipe_ingredients(r)[:MAX_INGREDIENTS])
+    steps = step_summary(r)
+    line = f"- {title}: {ingredients}"
+    if steps:
+        full = f"{line} | {steps}"
+        if len(full) <= max_chars:
+            return full
+        room = max_chars - len(line) - 3
+        if room >= 40:
+            return f"{line} | {trim(steps, room)}"
+    return trim(line, max_chars)
+
+
+class PromptStats:
+    """Running totals of estimated prompt and context tokens, for /stats/llm."""
+
+    def __init__(self):
+        self.prompts = self.prompt_tokens = self.context_tokens = self.max_prompt_tokens = 0
+        self.dropped_recipes = 0
+        self._lock = threading.Lock()
+
+    def record(self, prompt_tokens: int, context: Dict[str, Any]):
+        with self._lock:
+            self.prompts += 1
+            self.prompt_tokens += prompt_tokens
+            self.context_tokens += context["tokens"]
+            self.max_prompt_tokens = max(self.max_prompt_tokens, prompt_tokens)
+            self.dropped_recipes += context["dropped"]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "prompts": self.prompts,
+            "avg_prompt_tokens": round(self.prompt_tokens / self.prompts, 1) if self.prompts else 0.0,
+            "avg_context_tokens": round(self.context_tokens / self.prompts, 1) if self.prompts else 0.0,
+            "max_prompt_tokens": self.max_prompt_tokens,
+            "context_budget": CONTEXT_TOKENS,
+            "dropped_recipes": self.dropped_recipes,
+        }
+
+
+PROMPT_STATS = PromptStats()
+
+
+def build_context(recipes: Sequence[dict], budget: int = CONTEXT_TOKENS) -> Tuple[str, Dict[str, Any]]:
+    """Context lines for the retrieved recipes within `budget` tokens, and what it cost."""
+    lines: List[str] = []
+    seen_titles = set()
+    remaining = budget * CHARS_PER_TOKEN
+    unique = []
+    for r in recipes:
+        key = normalize_query(r.get("title") or "")
+        if key in seen_titles:
+            continue
+        seen_titles.add(key)
+        unique.append(r)
+    # Recipes with neither ingredients nor steps would be a bare title; their room goes to the rest
+    unique = [r for r in unique if recipe_ingredients(r) or step_summary(r)]
+    for i, r in enumerate(unique):
+        # An even share of what is left, so unused room rolls over to later recipes;
+        # when that is too short to be useful, the next recipes still get a minimal line
+        if remaining < MIN_LINE_CHARS:
+            break
+        share = max(remaining // (len(unique) - i), MIN_LINE_CHARS)
+        line = recipe_line(r, share)
+        lines.append(line)
+        remaining -= len(line) + 1
+    text = "\n".join(lines)
+    return text, {
+        "recipes": len(lines),
+        "dropped": len(recipes) - len(lines),
+        "tokens": count_tokens(text),
+        "budget": budget,
+    }
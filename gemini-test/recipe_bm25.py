@@ -0,0 +1,161 @@
+import re
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from telemetry import get_logger
+
+# RECIPE BM25 INDEX
+#
+# Lexical side of retrieve_recipes: BM25 over title (counted twice),
+# ingredients and cleaned ingredients. The index is a term-major CSR matrix in
+# plain NumPy arrays (indptr / doc ids / weights) whose entries already hold
+# the full BM25 contribution, so scoring a query is one concatenate of the
+# query terms' rows and a bincount. `python embedding_index.py build recipes`
+# writes it to recipes_bm25.npz next to the FAISS index.
+
+log = get_logger(__name__)
+
+BM25_FILE = "recipes_bm25.npz"
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# Quantities and kitchen words that appear in most ingredient lists
+STOPWORDS = {
+    "a", "an", "and", "or", "of", "the", "to", "for", "with", "in", "on", "into", "plus", "about",
+    "cup", "cups", "tablespoon", "tablespoons", "tbsp", "teaspoon", "teaspoons", "tsp",
+    "oz", "ounce", "ounces", "lb", "lbs", "pound", "pounds", "g", "kg", "ml", "l",
+    "large", "small", "medium", "fresh", "chopped", "sliced", "diced", "minced", "finely",
+    "coarsely", "thinly", "divided", "more", "optional", "taste", "such", "as",
+}
+
+
+def tokenize(text: str) -> List[str]:
+    out = []
+    for tok in TOKEN_RE.findall(str(text or "").lower()):
+        if tok in STOPWORDS or tok.isdigit():
+            continue
+        # Crude plural folding so "lemons" finds "lemon"
+        if len(tok) > 3 and tok.endswith("s") and not tok.endswith("ss"):
+            tok = tok[:-1]
+        out.append(tok)
+    return out
+
+
+def recipe_tokens(r: dict) -> List[str]:
+    title = r.get("title")
+    title = "" if isinstance(title, float) or title is None else str(title)
+    parts = [title, title]
+    for field in ("ingredients", "cleaned_ingredients"):
+        value = r.get(field) or []
+        parts.append(" ".join(map(str, value)) if isinstance(value, list) else str(value))
+    return tokenize(" ".join(parts))
+
+
+class BM25Index:
+    def __init__(self, terms: Sequence[str], indptr: np.ndarray, docs: np.ndarray,
+                 weights: np.ndarray, n_docs: int, keys: Optional[Sequence[str]] = None):
+        self.term_id: Dict[str, int] = {t: i for i, t in enumerate(terms)}
+        self.indptr = indptr
+        self.docs = docs
+        self.weights = weights
+        self.n_docs = n_docs
+        self.keys = list(keys) if keys is not None else None
+
+    def __len__(self):
+        return self.n_docs
+
+    @classmethod
+    def build(cls, recipes: Sequence[dict], keys: Optional[Sequence[str]] = None,
+              k1: float = 1.2, b: float = 0.75) -> "BM25Index":
+        vocab: Dict[str, int] = {}
+        doc_ids: List[int] = []
+        term_ids: List[int] = []
+        for i, r in enumerate(recipes):
+            toks = recipe_tokens(r)
+            term_ids.extend(vocab.setdefault(t, len(vocab)) for t in toks)
+            doc_ids.extend([i] * len(toks))
+        n_docs, n_terms = len(recipes), len(vocab)
+        doc_ids_arr = np.asarray(doc_ids, dtype=np.int64)
+        term_ids_arr = np.asarray(term_ids, dtype=np.int64)
+
+        # (term, doc) pairs with their counts, sorted term-major
+        pairs, tf = np.unique(term_ids_arr * max(n_docs, 1) + doc_ids_arr, return_counts=True)
+        p_terms, p_docs = pairs // max(n_docs, 1), pairs % max(n_docs, 1)
+        doc_len = np.bincount(doc_ids_arr, minlength=n_docs).astype(np.float32)
+        avgdl = float(doc_len.mean()) if n_docs else 0.0
+        df = np.bincount(p_terms, minlength=n_terms)
+        idf = np.log1p((n_docs - df + 0.5) / (df + 0.5)).astype(np.float32)
+
+        tf = tf.astype(np.float32)
+        norm = k1 * (1 - b + b * doc_len[p_docs] / (avgdl or 1.0))
+        weights = (idf[p_terms] * tf * (k1 + 1) / (tf + norm)).astype(np.float32)
+        indptr = np.zeros(n_terms + 1, dtype=np.int64)
+        np.cumsum(df, out=indptr[1:])
+        terms = [None] * n_terms
+        for t, i in vocab.items():
+            terms[i] = t
+        return cls(terms, indptr, p_docs.astype(np.int32), weights, n_docs, keys)
+
+    def save(self, path: Path):
+        terms = sorted(self.term_id, key=self.term_id.get)
+        tmp = path.with_name(path.name + ".tmp.npz")
+        np.savez(tmp, terms=np.asarray(terms, dtype=str), indptr=self.indptr, docs=self.docs,
+                 weights=self.weights, n_docs=np.int64(self.n_docs),
+                 keys=np.asarray(self.keys or [], dtype=str))
+        tmp.replace(path)
+
+    @classmethod
+    def load(cls, path: Path) -> "BM25Index":
+        with np.load(path, allow_pickle=False) as z:
+            keys = z["keys"].tolist()
+            return cls(z["terms"].tolist(), z["indptr"], z["docs"], z["weights"],
+                       int(z["n_docs"]), keys or None)
+
+    def scores(self, query: str) -> np.ndarray:
+        ids = [self.term_id[t] for t in set(tokenize(query)) if t in self.term_id]
+        if not ids:
+            return np.zeros(self.n_docs, dtype=np.float32)
+        slices = [slice(self.indptr[i], self.indptr[i + 1]) for i in ids]
+        docs = np.concatenate([self.docs[s] for s in slices])
+        weights = np.concatenate([self.weights[s] for s in slices])
+        return np.bincount(docs, weights=weights, minlength=self.n_docs).astype(np.float32)
+
+    def search(self, query: str, k: int = 10) -> List[Tuple[int, float]]:
+        """Top `k` (recipe position, score) pairs with a positive score, best first."""
+        score = self.scores(query)
+        hits = np.flatnonzero(score > 0)
+        if not len(hits):
+            return []
+        if len(hits) > k:
+            hits = hits[np.argpartition(-score[hits], k - 1)[:k]]
+        hits = hits[np.argsort(-score[hits], kind="stable")]
+        return [(int(i), float(score[i])) for i in hits]
+
+
+def load_or_build(recipes: Sequence[dict], keys: Sequence[str], path: Optional[Path] = None) -> BM25Index:
+    """The persisted index if it was built for exactly these recipes, else a fresh one."""
+    if path is not None and path.exists():
+        try:
+            index = BM25Index.load(path)
+            if index.keys == list(keys):
+                log.info(f"Loaded BM25 index from {path}")
+                return index
+            log.warning(f"{path.name} was built for other recipes; rebuilding in memory")
+        except Exception as e:
+            log.warning(f"Error loading {path}: {e}")
+    started = time.perf_counter()
+    index = BM25Index.build(recipes, keys)
+    log.info(f"Built BM25 index over {len(recipes)} recipes in {time.perf_counter() - started:.2f}s")
+    return index
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[int]], k: int = 60) -> List[int]:
+    """Merge ranked id lists: score(id) = sum of 1 / (k + rank)."""
+    fused: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking):
+            fused[item] = fused.get(item, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(fused, key=lambda i: -fused[i])
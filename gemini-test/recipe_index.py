@@ -0,0 +1,82 @@
+import re
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# RECIPE INDEX
+#
+# id -> recipe dict plus an inverted index over title tokens, built once at
+# startup. Scoring is the same as the old linear scan in main.py: +3 when the
+# whole query is a substring of the title, +1 per shared token, and the first
+# recipe wins ties.
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def title_of(r: dict) -> str:
+    title = r.get("title") or r.get("Title") or "Untitled"
+    # Missing titles come through pandas as NaN floats
+    return str(title) if not isinstance(title, float) else ""
+
+
+class RecipeIndex:
+    def __init__(self, recipes: Sequence[dict]):
+        self.recipes = recipes
+        # id -> position, so snapshot-backed recipes are only decoded when returned
+        self.by_id: Dict[str, int] = {}
+        self.titles: List[str] = []
+        postings: Dict[str, List[int]] = {}
+        field = getattr(recipes, "field", None)
+        for i in range(len(recipes)):
+            r = {"id": field("id", i), "title": field("title", i)} if field else recipes[i]
+            rid = r.get("id")
+            if rid and rid not in self.by_id:
+                self.by_id[rid] = i
+            tl = title_of(r).lower()
+            self.titles.append(tl)
+            for tok in set(TOKEN_RE.findall(tl)):
+                postings.setdefault(tok, []).append(i)
+        self.postings = {t: np.asarray(ids, dtype=np.int64) for t, ids in postings.items()}
+
+    def __len__(self):
+        return len(self.recipes)
+
+    def get(self, rid: str) -> Optional[dict]:
+        i = self.by_id.get(rid)
+        return self.recipes[i] if i is not None else None
+
+    def candidates(self, q: str, k: int = 10) -> List[Tuple[int, int]]:
+        """Top `k` (recipe position, score) pairs for a title query, best first."""
+        ql = str(q).lower().strip()
+        if not ql:
+            return []
+        tokens = set(TOKEN_RE.findall(ql))
+        lists = [self.postings[t] for t in tokens if t in self.postings]
+        if not lists:
+            # No shared token: only a substring ("chick" in "chicken") can score
+            hits = [(i, 3) for i, tl in enumerate(self.titles) if ql in tl]
+            return hits[:k]
+
+        ids, overlap = np.unique(np.concatenate(lists), return_counts=True)
+        scored: List[Tuple[int, int]] = []
+        for level in sorted(set(overlap.tolist()), reverse=True):
+            # A lower overlap level can still win only through the +3 substring bonus
+            if len(scored) >= k and level + 3 < scored[k - 1][1]:
+                break
+            level_ids = ids[overlap == level].tolist()
+            sub = [i for i in level_ids if ql in self.titles[i]]
+            scored += [(i, level + 3) for i in sub[:k]]
+            if len(sub) < k:
+                sub_set = set(sub)
+                scored += [(i, level) for i in level_ids if i not in sub_set][:k]
+            scored.sort(key=lambda x: (-x[1], x[0]))
+            scored = scored[:k]
+        return scored[:k]
+
+    def lookup(self, q: str) -> Optional[dict]:
+        """Recipe by exact id, else the best-scoring title match."""
+        r = self.get(str(q))
+        if r is not None:
+            return r
+        best = self.candidates(q, k=1)
+        return self.recipes[best[0][0]] if best else None
@@ -0,0 +1,47 @@
+import os
+from typing import List, Optional
+
+import numpy as np
+
+from embedding_index import RowMap
+from recipe_bm25 import BM25Index, reciprocal_rank_fusion
+from telemetry import span
+from vector_index import is_compressed, search as search_vectors
+
+# RECIPE RETRIEVAL
+#
+# FAISS over the recipe embeddings, merged with BM25 by reciprocal rank fusion
+# (recipe_bm25.py). main.py's retrieve_recipes and benchmarks/micro.py both go
+# through hybrid_search, so the benchmark measures what the service runs.
+#
+#   MATKOMPIS_HYBRID=0          FAISS only
+#   MATKOMPIS_HYBRID_DEPTH=4    both retrievers fetch top_k * depth candidates
+#   MATKOMPIS_RRF_K=60          fusion constant
+#   MATKOMPIS_RERANK=4          re-score 4 * k candidates of a compressed index
+
+HYBRID = os.getenv("MATKOMPIS_HYBRID", "1") not in ("0", "false", "no")
+HYBRID_DEPTH = int(os.getenv("MATKOMPIS_HYBRID_DEPTH", "4"))
+RRF_K = int(os.getenv("MATKOMPIS_RRF_K", "60"))
+RERANK = int(os.getenv("MATKOMPIS_RERANK", "0"))
+
+
+def needs_rerank_vectors(index, rerank: int = RERANK) -> bool:
+    """Whether hybrid_search wants the float embeddings to re-score `index`'s candidates."""
+    return rerank > 1 and is_compressed(index)
+
+
+def hybrid_search(query: str, query_emb: np.ndarray, index, rows: RowMap, bm25: Optional[BM25Index],
+                  top_k: int = 5, embeddings: Optional[np.ndarray] = None, rerank: int = RERANK,
+                  depth_factor: int = HYBRID_DEPTH, rrf_k: int = RRF_K) -> List[int]:
+    """Loaded recipe positions of the best `top_k` recipes; FAISS only when `bm25` is None."""
+    # Both retrievers go deeper than top_k so the fusion has something to merge
+    depth = top_k * depth_factor if bm25 is not None else top_k
+    with span("faiss_search"):
+        _, indices = search_vectors(index, query_emb, depth, embeddings, rerank, metric="l2")
+    dense = rows.lookup(i for i in indices[0] if i >= 0)
+    if bm25 is None:
+        return dense[:top_k]
+
+    with span("bm25_search"):
+        lexical = [i for i, _ in bm25.search(query, depth)]
+    return reciprocal_rank_fusion([dense, lexical], rrf_k)[:top_k]
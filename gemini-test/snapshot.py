@@ -0,0 +1,251 @@
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from catalog import ProductCatalog, build_catalog
+from loaders import DATA_DIR, assign_recipe_ids, load_all_products, load_recipes, recipes_csv_path
+from telemetry import get_logger
+
+# CATALOG SNAPSHOT
+#
+# `python snapshot.py build` compiles products, recipes (with their ids) and the
+# parsed numeric catalog into one versioned directory of .npy files:
+#
+#   manifest.json               format, version, row counts, source paths and fingerprint
+#   catalog_<column>.npy        numeric catalog columns
+#   <table>_<field>.offsets.npy / .bytes.npy
+#                               string tables: one UTF-8 blob plus row offsets
+#
+# Everything is memory-mapped on load, so startup no longer parses JSON/CSV and
+# rows are only turned into dicts when they are accessed. If the snapshot is
+# missing or older than the raw files, the service falls back to the loaders.
+
+log = get_logger(__name__)
+
+SNAPSHOT_FORMAT = 2
+
+PRODUCT_FIELDS = ("name", "store", "url", "price", "size", "unit_price", "description", "nutrition")
+RECIPE_FIELDS = ("id", "title", "ingredients", "instructions", "steps", "image", "cleaned_ingredients")
+
+
+def snapshot_dir() -> Path:
+    return Path(os.getenv("MATKOMPIS_SNAPSHOT_DIR") or Path(__file__).parent / "snapshot")
+
+
+class StringTable:
+    """Read-only list of strings backed by a byte blob and an offsets array."""
+
+    def __init__(self, offsets: np.ndarray, blob: np.ndarray):
+        self.offsets = offsets
+        self.blob = blob
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> str:
+        return self.blob[self.offsets[i]:self.offsets[i + 1]].tobytes().decode("utf-8")
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    @staticmethod
+    def write(folder: Path, name: str, values: Iterable[str]):
+        encoded = [v.encode("utf-8") for v in values]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+        np.save(folder / f"{name}.offsets.npy", offsets)
+        np.save(folder / f"{name}.bytes.npy", np.frombuffer(b"".join(encoded), dtype=np.uint8))
+
+    @classmethod
+    def load(cls, folder: Path, name: str) -> "StringTable":
+        return cls(np.load(folder / f"{name}.offsets.npy", mmap_mode="r"),
+                   np.load(folder / f"{name}.bytes.npy", mmap_mode="r"))
+
+
+class RecordTable(Sequence):
+    """Rows of JSON-encoded fields that come back as plain dicts on access."""
+
+    def __init__(self, tables: Dict[str, StringTable]):
+        self.tables = tables
+        self._len = len(next(iter(tables.values()))) if tables else 0
+
+    def __len__(self):
+        return self._len
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(self._len))]
+        if i < 0:
+            i += self._len
+        if not 0 <= i < self._len:
+            raise IndexError(i)
+        row = {}
+        for field, table in self.tables.items():
+            raw = table[i]
+            if raw:  # "" marks a key the source row did not have
+                row[field] = json.loads(raw)
+        return row
+
+    def field(self, name: str, i: int):
+        """One field without decoding the whole row."""
+        raw = self.tables[name][i]
+        return json.loads(raw) if raw else None
+
+    @staticmethod
+    def write(folder: Path, prefix: str, rows: Sequence[dict], fields: Sequence[str]):
+        for field in fields:
+            StringTable.write(folder, f"{prefix}_{field}",
+                              (json.dumps(r[field], ensure_ascii=False) if field in r else "" for r in rows))
+
+    @classmethod
+    def load(cls, folder: Path, prefix: str, fields: Sequence[str]) -> "RecordTable":
+        return cls({f: StringTable.load(folder, f"{prefix}_{f}") for f in fields})
+
+
+def source_files(data_dir: Path = DATA_DIR, recipes_csv: Optional[Path] = None) -> List[Path]:
+    files = sorted(data_dir.glob("hemkop_*.json")) + sorted(data_dir.glob("ica_*.json"))
+    recipes_csv = recipes_csv or recipes_csv_path()
+    if recipes_csv.exists():
+        files.append(recipes_csv)
+    return files
+
+
+def source_fingerprint(files: Sequence[Path]) -> Dict[str, List[int]]:
+    out = {}
+    for f in files:
+        st = f.stat()
+        out[f.name] = [st.st_size, st.st_mtime_ns]
+    return out
+
+
+class Snapshot:
+    def __init__(self, folder: Path, manifest: dict, products: RecordTable,
+                 recipes: RecordTable, catalog: ProductCatalog):
+        self.folder = folder
+        self.manifest = manifest
+        self.version = manifest["version"]
+        self.products = products
+        self.recipes = recipes
+        self.catalog = catalog
+
+
+def build_snapshot(out_dir: Optional[Path] = None, data_dir: Path = DATA_DIR,
+                   recipes_csv: Optional[Path] = None) -> Path:
+    out_dir = Path(out_dir or snapshot_dir())
+    recipes_csv = recipes_csv or recipes_csv_path()
+    started = time.perf_counter()
+
+    fingerprint = source_fingerprint(source_files(data_dir, recipes_csv))
+    products = load_all_products(data_dir)
+    catalog = build_catalog(products)
+    recipes = assign_recipe_ids(load_recipes(recipes_csv))
+
+    tmp = out_dir.with_name(out_dir.name + ".tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+    RecordTable.write(tmp, "products", products, PRODUCT_FIELDS)
+    RecordTable.write(tmp, "recipes", recipes, RECIPE_FIELDS)
+    for name, col in catalog.columns.items():
+        np.save(tmp / f"catalog_{name}.npy", col)
+    np.save(tmp / "catalog_store_codes.npy", catalog.store_codes)
+    np.save(tmp / "catalog_pack_units.npy", catalog.pack_units)
+    StringTable.write(tmp, "catalog_keys", catalog.keys)
+
+    version = hashlib.sha1(json.dumps([SNAPSHOT_FORMAT, fingerprint], sort_keys=True).encode()).hexdigest()[:12]
+    manifest = {
+        "format": SNAPSHOT_FORMAT,
+        "version": version,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "products": len(products),
+        "recipes": len(recipes),
+        "catalog_columns": list(catalog.columns),
+        "store_names": catalog.store_names,
+        # Where the sources were read from, so load_snapshot checks the same files
+        "data_dir": str(Path(data_dir).resolve()),
+        "recipes_csv": str(Path(recipes_csv).resolve()),
+        "sources": fingerprint,
+    }
+    with open(tmp / "manifest.json", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+    # Swap the finished directory in so a running loader never sees half a snapshot
+    old = out_dir.with_name(out_dir.name + ".old")
+    shutil.rmtree(old, ignore_errors=True)
+    if out_dir.exists():
+        os.replace(out_dir, old)
+    os.replace(tmp, out_dir)
+    shutil.rmtree(old, ignore_errors=True)
+    log.info(f"Snapshot {version}: {len(products)} products, {len(recipes)} recipes "
+             f"in {time.perf_counter() - started:.1f}s -> {out_dir}")
+    return out_dir
+
+
+def load_snapshot(folder: Optional[Path] = None, data_dir: Optional[Path] = None,
+                  recipes_csv: Optional[Path] = None, check_sources: bool = True) -> Optional[Snapshot]:
+    """Open the snapshot, or return None if it is missing, stale or unreadable.
+
+    Freshness is checked against `data_dir` and `recipes_csv`, by default the
+    files the snapshot was built from.
+    """
+    folder = Path(folder or snapshot_dir())
+    manifest_path = folder / "manifest.json"
+    if not manifest_path.exists():
+        return None
+    try:
+        with open(manifest_path, encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("format") != SNAPSHOT_FORMAT:
+            log.warning(f"Snapshot format {manifest.get('format')} != {SNAPSHOT_FORMAT}, ignoring {folder}")
+            return None
+        data_dir = Path(data_dir or manifest.get("data_dir") or DATA_DIR)
+        recipes_csv = Path(recipes_csv or manifest.get("recipes_csv") or recipes_csv_path())
+        if check_sources and source_fingerprint(source_files(data_dir, recipes_csv)) != manifest["sources"]:
+            log.warning(f"Snapshot {manifest['version']} is older than the raw data, ignoring it "
+                        f"(rebuild with `python snapshot.py build`)")
+            return None
+
+        products = RecordTable.load(folder, "products", PRODUCT_FIELDS)
+        recipes = RecordTable.load(folder, "recipes", RECIPE_FIELDS)
+        columns = {name: np.load(folder / f"catalog_{name}.npy", mmap_mode="r")
+                   for name in manifest["catalog_columns"]}
+        catalog = ProductCatalog(
+            columns,
+            np.arange(len(products), dtype=np.int64),
+            list(StringTable.load(folder, "catalog_keys")),
+            np.load(folder / "catalog_store_codes.npy", mmap_mode="r"),
+            manifest["store_names"],
+            np.load(folder / "catalog_pack_units.npy", mmap_mode="r"),
+        )
+    except Exception as e:
+        log.warning(f"Error loading snapshot from {folder}: {e}")
+        return None
+    log.info(f"Loaded snapshot {manifest['version']}: {len(products)} products, {len(recipes)} recipes")
+    return Snapshot(folder, manifest, products, recipes, catalog)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compile products and recipes into a columnar snapshot")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="Build the snapshot from the raw JSON/CSV files")
+    build.add_argument("--out", type=Path, default=None,
+                       help="Output directory (default: $MATKOMPIS_SNAPSHOT_DIR, else snapshot/ next to this file)")
+    build.add_argument("--data", type=Path, default=DATA_DIR, help="Folder with hemkop_*/ica_* JSON files")
+    build.add_argument("--recipes", type=Path, default=None,
+                       help="Recipes CSV (default: $MATKOMPIS_RECIPES_CSV, else recipes.csv next to this file)")
+    info = sub.add_parser("info", help="Print the manifest of an existing snapshot")
+    info.add_argument("--dir", type=Path, default=None)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        build_snapshot(args.out, args.data, args.recipes)
+    else:
+        snap = load_snapshot(args.dir, check_sources=False)
+        print(json.dumps(snap.manifest if snap else {"error": "no snapshot"}, indent=2, ensure_ascii=False))
@@ -0,0 +1,307 @@
+import bisect
+import contextvars
+import functools
+import inspect
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+# TELEMETRY
+#
+# Logging, per-stage timing spans and Prometheus metrics, without extra
+# dependencies.
+#
+#   log = get_logger(__name__)          logging.Logger under "matkompis.<module>"
+#   log_event(log, "route", intent=...) one structured record; JSON lines with
+#                                       MATKOMPIS_LOG_FORMAT=json
+#   with span("faiss_search"): ...      time a stage of the current request
+#   @traced("retrieve_recipes")         same, for a whole sync or async function
+#
+# Spans go into matkompis_stage_seconds{stage, intent} and into the current
+# request's Trace. Stages that finish before set_intent() (classification
+# itself) are held back and observed under the intent once it is set, or
+# under "unknown" when the request ends first (Trace.flush). main.py's
+# middleware opens the Trace, records request latency, and logs one line per
+# request with all its stage timings.
+# GET /metrics renders everything in the Prometheus text format.
+
+LOG_FORMAT = os.getenv("MATKOMPIS_LOG_FORMAT", "text").lower()
+LOG_LEVEL = os.getenv("MATKOMPIS_LOG_LEVEL", "INFO").upper()
+
+# Latency buckets in seconds: sub-millisecond lookups up to slow LLM calls
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+# LOGGING
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        out = {
+            "time": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        out.update(getattr(record, "fields", None) or {})
+        if record.exc_info:
+            out["exception"] = self.formatException(record.exc_info)
+        return json.dumps(out, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        text = super().format(record)
+        fields = getattr(record, "fields", None)
+        if fields:
+            text += " " + " ".join(f"{k}={json.dumps(v, ensure_ascii=False, default=str)}" for k, v in fields.items())
+        return text
+
+
+_configured = False
+
+
+def setup_logging(level: str = LOG_LEVEL, fmt: str = LOG_FORMAT):
+    """Configure the "matkompis" loggers once; called on import of this module."""
+    global _configured
+    if _configured:
+        return
+    handler = logging.StreamHandler()
+    handler.setFormatter(JsonFormatter() if fmt == "json"
+                         else TextFormatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    root = logging.getLogger("matkompis")
+    root.addHandler(handler)
+    root.setLevel(level)
+    root.propagate = False
+    _configured = True
+
+
+def get_logger(name: str) -> logging.Logger:
+    return logging.getLogger(f"matkompis.{name.rsplit('.', 1)[-1]}")
+
+
+def log_event(logger: logging.Logger, message: str, level: int = logging.INFO, **fields):
+    logger.log(level, message, extra={"fields": fields})
+
+
+setup_logging()
+
+
+# METRICS
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: Tuple[str, ...], values: Tuple[str, ...]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + "}"
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: Iterable[str] = ()):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self.values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1.0):
+        with self._lock:
+            self.values[labels] = self.values.get(labels, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self.values.items())
+        for labels, value in items:
+            lines.append(f"{self.name}{_labels(self.labels, labels)} {value:g}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: Iterable[str] = (), buckets: Tuple[float, ...] = BUCKETS):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> (count per bucket, +Inf included last; sum)
+        self.values: Dict[Tuple[str, ...], List[Any]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self.values.get(labels)
+            if entry is None:
+                entry = self.values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][i] += 1
+            entry[1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        names = self.labels + ("le",)
+        with self._lock:
+            items = sorted((k, (list(v[0]), v[1])) for k, v in self.values.items())
+        for labels, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                lines.append(f"{self.name}_bucket{_labels(names, labels + (le,))} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labels, labels)} {total:.6f}")
+            lines.append(f"{self.name}_count{_labels(self.labels, labels)} {cumulative}")
+        return lines
+
+
+class Collected:
+    """Values read at scrape time from a callback returning {label values: value}."""
+
+    def __init__(self, name: str, help: str, kind: str, labels: Iterable[str],
+                 collect: Callable[[], Dict[Tuple[str, ...], float]]):
+        self.name, self.help, self.kind, self.labels, self.collect = name, help, kind, tuple(labels), collect
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        try:
+            values = self.collect()
+        except Exception as e:
+            get_logger("telemetry").warning(f"Collecting {self.name} failed: {e}")
+            return []
+        for labels, value in sorted(values.items()):
+            if value is not None:
+                lines.append(f"{self.name}{_labels(self.labels, labels)} {float(value):g}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: Dict[str, Any] = {}
+
+    def _add(self, metric):
+        return self.metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, help: str, labels: Iterable[str] = ()) -> Counter:
+        return self._add(Counter(name, help, labels))
+
+    def histogram(self, name: str, help: str, labels: Iterable[str] = ()) -> Histogram:
+        return self._add(Histogram(name, help, labels))
+
+    def collect(self, name: str, help: str, kind: str, labels: Iterable[str],
+                fn: Callable[[], Dict[Tuple[str, ...], float]]) -> Collected:
+        metric = Collected(name, help, kind, labels, fn)
+        self.metrics[name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self.metrics.values():
+            lines += metric.render()
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.histogram("matkompis_stage_seconds", "Time spent per request stage", ("stage", "intent"))
+
+
+# SPANS
+
+class Trace:
+    """Stage timings of one request; shared by the tasks and threads serving it."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.intent = "unknown"
+        self.resolved = False
+        self.stages: List[Tuple[str, float]] = []
+        # Stages not yet in STAGE_SECONDS because the intent was still unknown
+        self._pending: List[Tuple[str, float]] = []
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, seconds: float):
+        with self._lock:
+            self.stages.append((stage, seconds))
+            if not self.resolved:
+                self._pending.append((stage, seconds))
+                return
+            intent = self.intent
+        STAGE_SECONDS.observe(seconds, stage, intent)
+
+    def set_intent(self, intent: str):
+        with self._lock:
+            self.intent, self.resolved = intent, True
+        self.flush()
+
+    def flush(self):
+        """Observe the held-back stages under the current intent."""
+        with self._lock:
+            pending, self._pending = self._pending, []
+            intent = self.intent
+        for stage, seconds in pending:
+            STAGE_SECONDS.observe(seconds, stage, intent)
+
+    def summary(self) -> Dict[str, float]:
+        """Milliseconds per stage, summed over repeats."""
+        out: Dict[str, float] = {}
+        with self._lock:
+            for stage, seconds in self.stages:
+                out[stage] = round(out.get(stage, 0.0) + seconds * 1000, 3)
+        return out
+
+
+_trace: contextvars.ContextVar[Optional[Trace]] = contextvars.ContextVar("matkompis_trace", default=None)
+
+
+def start_trace() -> Tuple[Trace, contextvars.Token]:
+    trace = Trace()
+    return trace, _trace.set(trace)
+
+
+def end_trace(token: contextvars.Token):
+    _trace.reset(token)
+
+
+def current_trace() -> Optional[Trace]:
+    return _trace.get()
+
+
+def set_intent(intent: str):
+    trace = _trace.get()
+    if trace is not None:
+        trace.set_intent(intent)
+
+
+def record_stage(stage: str, seconds: float):
+    trace = _trace.get()
+    if trace is None:
+        STAGE_SECONDS.observe(seconds, stage, "none")
+    else:
+        trace.add(stage, seconds)
+
+
+@contextmanager
+def span(stage: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - started)
+
+
+def traced(stage: str):
+    """Decorator form of span() for sync and async functions."""
+    def wrap(fn):
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def run_async(*args, **kwargs):
+                with span(stage):
+                    return await fn(*args, **kwargs)
+            return run_async
+
+        @functools.wraps(fn)
+        def run(*args, **kwargs):
+            with span(stage):
+                return fn(*args, **kwargs)
+        return run
+    return wrap
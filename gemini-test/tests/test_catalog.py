@@ -0,0 +1,55 @@
+import math
+
+import pytest
+
+from catalog import build_catalog, parse_pack_size
+
+
+@pytest.mark.parametrize("size, name, description, expected", [
+    ("0.5L", "Mjölk", "", (0.5, "l")),
+    ("6 per frp", "Ägg", "", (6.0, "st")),
+    (None, "Kalops 400g Dafgård", "", (0.4, "kg")),
+    (None, "Ca 850 gram", "", (0.85, "kg")),
+    (None, "Fläskfilé", "Ca 850 gram. Svensk gris.", (0.85, "kg")),
+    # Multipacks are count times the size of each
+    (None, "Jasminris Boil-in-bag 4x125g", "", (0.5, "kg")),
+    (None, "Kyckling Burgare 10x90g", "", (0.9, "kg")),
+    (None, "Laxfilé 4x125 G 4-pack", "", (0.5, "kg")),
+])
+def test_parse_pack_size(size, name, description, expected):
+    amount, unit = parse_pack_size(size, name, description)
+    assert unit == expected[1]
+    assert amount == pytest.approx(expected[0])
+
+
+@pytest.mark.parametrize("name, description", [
+    ("Kycklingpastej Bredbar", "Klimatsmart alternativ (1,39kg CO₂e/kg). Gluten- och mjölkfri."),
+    ("Gravad Lax Skivad", "Dillgravad i Sverige. Omega-3 fettsyror: 1,4 g/100g. Har varit fryst."),
+    ("Peperoni Pizza Salami Skivad", "INGREDIENSER: Kycklingkött, kryddmedel, pepperoni 0,7g, socker"),
+    ("Potatismos Klassiskt 33 Port", "I förpackningen finns det ca 80 st potatisar som räcker till 33 portioner."),
+    ("Gravad Lax Skivad", "Gravad lax i skivor. ASC-märkt. 300 gram."),
+    ("Havregurt", "Protein 3 g/100 g"),
+])
+def test_parse_pack_size_ignores_description_text(name, description):
+    assert parse_pack_size(None, name, description) is None
+
+
+def test_per_unit_figures_are_not_pack_sizes():
+    assert parse_pack_size(None, "Laxfilé 2,5 g/100g omega-3") is None
+    amount, unit = parse_pack_size(None, "Nötfärs 1,2kg CO2e/kg 500g")
+    assert (amount, unit) == (pytest.approx(0.5), "kg")
+
+
+def test_unit_price_left_unknown_without_pack_size():
+    products = [
+        {"store": "Hemköp", "name": "Kycklingpastej Bredbar", "price": "15,95",
+         "description": "Klimatsmart alternativ (1,39kg CO₂e/kg)."},
+        {"store": "Hemköp", "name": "Jasminris Boil-in-bag 4x125g", "price": "26,50",
+         "description": "Boil-in-bag jasminris. 4 st x 125 gram"},
+        {"store": "Ica", "name": "Jasminris 500g", "price": "52,00", "size": "0.5kg",
+         "unit_price": "104,00 kr/kg"},
+    ]
+    unit_price = build_catalog(products).columns["unit_price"]
+    assert math.isnan(unit_price[0])
+    assert unit_price[1] == pytest.approx(53.0)
+    assert unit_price[2] == pytest.approx(104.0)
@@ -0,0 +1,27 @@
+import pytest
+
+from intent_cache import normalize_query
+
+
+@pytest.mark.parametrize("a, b", [
+    ("🔍 How much protein is in Kycklingfilé?", "how much protein is in kycklingfilé"),
+    ("Recipes  with   chicken!", "recipes with chicken"),
+    ("<500 kcal meals", "< 500 kcal meals"),
+    ("1,5 dl milk", "1.5 dl milk"),
+])
+def test_same_key(a, b):
+    assert normalize_query(a) == normalize_query(b)
+
+
+@pytest.mark.parametrize("a, b", [
+    ("meals <500 kcal", "meals >500 kcal"),
+    ("protein >= 20", "protein <= 20"),
+    ("1.5 dl milk", "1 5 dl milk"),
+])
+def test_different_key(a, b):
+    assert normalize_query(a) != normalize_query(b)
+
+
+def test_examples():
+    assert normalize_query("Under <1,5 g salt!") == "under < 1.5 g salt"
+    assert normalize_query("Milk, eggs. Flour") == "milk eggs flour"
@@ -0,0 +1,40 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from intent_router import EXAMPLES, IntentRouter, nutrient_slots, recipe_detail_rule
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("How much protein is in tofu?", {"product": "tofu", "nutrient": "protein"}),
+    ("Hur mycket protein i kyckling", {"product": "kyckling", "nutrient": "protein"}),
+    ("How much fat does salmon have?", {"product": "salmon", "nutrient": "fat"}),
+])
+def test_nutrient_rules(query, expected):
+    assert nutrient_slots(query) == expected
+
+
+@pytest.mark.parametrize("query", [
+    "nonfat yoghurt in a smoothie",
+    "saltimbocca in a pan",
+    "sugar-free cake in 10 minutes",
+])
+def test_nutrient_words_inside_other_words(query):
+    assert nutrient_slots(query) is None
+
+
+def test_examples_agree_with_rules():
+    for intent, examples in EXAMPLES.items():
+        if intent == "recipe_detail":
+            continue
+        for example in examples:
+            assert recipe_detail_rule(example) is None, example
+
+
+def test_rule_hits_counted_across_threads():
+    router = IntentRouter()
+    with ThreadPoolExecutor(8) as pool:
+        results = list(pool.map(router.route, ["How much does salmon cost?"] * 2000))
+    assert all(r["intent"] == "price_query" for r in results)
+    assert router.stats()["rule_hits"] == 2000
+    assert router.stats()["local_ratio"] == 1.0
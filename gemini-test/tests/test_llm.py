@@ -0,0 +1,60 @@
+import asyncio
+
+import pytest
+
+from llm import FakeBackend, LLMClient
+
+
+class FlakyStream(FakeBackend):
+    """Fails the first `failures` streams, before or after their first chunk."""
+
+    def __init__(self, failures: int = 1, after_first_chunk: bool = False):
+        super().__init__(latency=0.0, chunks=4)
+        self.failures = failures
+        self.after_first_chunk = after_first_chunk
+        self.streams = 0
+
+    async def stream_async(self, prompt, model_name, timeout):
+        self.streams += 1
+        failing = self.streams <= self.failures
+        if failing and not self.after_first_chunk:
+            raise ConnectionError("reset before the first chunk")
+        async for text in super().stream_async(prompt, model_name, timeout):
+            yield text
+            if failing:
+                raise ConnectionError("reset mid-stream")
+
+
+def client(backend, **kwargs):
+    return LLMClient(backend, concurrency=4, timeout=0.05, retries=2, backoff=0.0, **kwargs)
+
+
+async def collect(llm, prompt):
+    return "".join([text async for text in llm.stream_async(prompt)])
+
+
+def test_timeouts_are_retried_then_raised():
+    llm = client(FakeBackend(latency=0.2))
+    with pytest.raises(TimeoutError):
+        llm.generate("hello")
+    with pytest.raises(TimeoutError):
+        asyncio.run(llm.generate_async("hello"))
+    stats = llm.stats()
+    assert (stats["calls"], stats["retries"], stats["failures"]) == (6, 4, 2)
+
+
+def test_stream_retried_before_first_chunk():
+    backend = FlakyStream(failures=1)
+    llm = client(backend)
+    assert asyncio.run(collect(llm, "hello")) == FakeBackend.respond("hello")
+    assert backend.streams == 2
+    assert llm.stats()["retries"] == 1
+
+
+def test_stream_not_retried_after_first_chunk():
+    backend = FlakyStream(failures=1, after_first_chunk=True)
+    llm = client(backend)
+    with pytest.raises(ConnectionError):
+        asyncio.run(collect(llm, "hello"))
+    assert backend.streams == 1
+    assert llm.stats()["retries"] == 0
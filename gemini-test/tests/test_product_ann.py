@@ -0,0 +1,26 @@
+import json
+
+import numpy as np
+
+import artifacts
+from artifacts import ARTIFACTS
+from embedding_index import write_embeddings
+from product_ann import ProductANN
+
+
+def test_filtered_index_rebuilds_when_canonical_groups_change(monkeypatch, tmp_path):
+    fresh = {name: artifacts.Artifact(a.name, a.filename, a.loader) for name, a in ARTIFACTS._artifacts.items()}
+    monkeypatch.setattr(ARTIFACTS, "_artifacts", fresh)
+    monkeypatch.setattr(ARTIFACTS, "search_dirs", [tmp_path])
+    matrix = np.eye(4, dtype=np.float32)
+    write_embeddings(tmp_path, "product_embeddings.npy", matrix, ["a", "b", "c", "d"], ["1", "2", "3", "4"], "test")
+
+    keep = [np.arange(4)]
+    ann = ProductANN(row_filter=lambda embeddings: keep[0])
+    assert ann.index()[0].ntotal == 4
+    # Same embeddings, new grouping: the filter now keeps fewer rows
+    keep[0] = np.arange(2)
+    (tmp_path / "canonical_groups.json").write_text(json.dumps({"groups": [["a", "c"], ["b", "d"]]}))
+    index, rows, _ = ann.index()
+    assert index.ntotal == 2 and rows.tolist() == [0, 1]
+    assert ann.search(matrix[2:3], k=1)[1][0, 0] in (0, 1)
@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+from catalog import build_catalog
+from product_search import SearchError, search_products
+
+
+def make_catalog(n=50):
+    products = []
+    for i in range(n):
+        # Few distinct values and many missing ones, so most rows tie
+        protein = "" if i % 3 == 0 else f"{i % 4} g"
+        products.append({"store": "Ica", "url": str(i), "name": f"Product {i}", "price": "10,00",
+                         "nutrition": {"protein": protein}})
+    return build_catalog(products)
+
+
+@pytest.mark.parametrize("descending", [True, False])
+def test_pages_cover_every_row_once(descending):
+    catalog = make_catalog()
+    total, everything = search_products(catalog, sort_by="protein", descending=descending, limit=len(catalog))
+    pages = [search_products(catalog, sort_by="protein", descending=descending, offset=o, limit=7)[1]
+             for o in range(0, total, 7)]
+    assert np.array_equal(np.concatenate(pages), everything)
+    assert sorted(everything.tolist()) == list(range(total))
+
+
+def test_unknown_sort_column_rejected_on_empty_page():
+    with pytest.raises(SearchError):
+        search_products(make_catalog(), sort_by="nonsense", offset=1000)
+
+
+def test_per_kr_ranks_by_unit_price_not_pack_price():
+    catalog = build_catalog([
+        # 50 g for 20,90 kr: cheap on the shelf, 418 kr/kg
+        {"store": "Ica", "url": "small", "name": "Proteinbar 50g", "price": "20,90",
+         "nutrition": {"protein": "30 g"}},
+        # 1 kg for 60 kr
+        {"store": "Ica", "url": "large", "name": "Kvarg 1kg", "price": "60,00",
+         "nutrition": {"protein": "25 g"}},
+    ])
+    _, rows = search_products(catalog, sort_by="protein_per_kr", descending=True)
+    assert [catalog.keys[r] for r in rows] == ["Ica|large", "Ica|small"]
@@ -0,0 +1,25 @@
+from rag_context import CHARS_PER_TOKEN, build_context
+
+
+def recipe(title, n=4):
+    return {
+        "title": title,
+        "cleaned_ingredients": [f"{title.lower()} ingredient {i}" for i in range(n)],
+        "steps": [f"Step {i} of {title}. Then more." for i in range(3)],
+    }
+
+
+def test_short_recipe_does_not_drop_the_rest():
+    recipes = [{"title": "Toast", "cleaned_ingredients": []}, recipe("Lentil Soup"), recipe("Bean Chili")]
+    text, info = build_context(recipes)
+    assert "Lentil Soup" in text and "Bean Chili" in text
+    assert info["recipes"] == 2
+    assert info["dropped"] == 1
+
+
+def test_context_stays_within_budget():
+    recipes = [recipe(f"Recipe {i}", 12) for i in range(10)]
+    text, info = build_context(recipes, budget=30)
+    assert len(text) <= 30 * CHARS_PER_TOKEN
+    assert 0 < info["recipes"] < 10
+    assert info["recipes"] + info["dropped"] == 10
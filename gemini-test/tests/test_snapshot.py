@@ -0,0 +1,33 @@
+from pathlib import Path
+
+import loaders
+from snapshot import build_snapshot, load_snapshot, source_files
+
+
+def test_recipes_csv_does_not_depend_on_cwd(monkeypatch, tmp_path):
+    monkeypatch.delenv("MATKOMPIS_RECIPES_CSV", raising=False)
+    before = loaders.recipes_csv_path()
+    monkeypatch.chdir(tmp_path)
+    assert loaders.recipes_csv_path() == before
+    assert before.parent == Path(loaders.__file__).parent
+
+
+def test_source_files_same_from_any_cwd(monkeypatch, tmp_path):
+    monkeypatch.delenv("MATKOMPIS_RECIPES_CSV", raising=False)
+    here = source_files()
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "recipes.csv").write_text("Title\n")
+    assert source_files() == here
+
+
+def test_snapshot_from_other_recipes_csv_is_fresh(monkeypatch, tmp_path):
+    monkeypatch.delenv("MATKOMPIS_RECIPES_CSV", raising=False)
+    recipes = tmp_path / "other_recipes.csv"
+    recipes.write_text("Title,Ingredients,Instructions\nPannkakor,\"['mjöl', 'mjölk']\",Vispa.\n")
+    out = build_snapshot(tmp_path / "snapshot", recipes_csv=recipes)
+
+    snap = load_snapshot(out)
+    assert snap is not None and len(snap.recipes) == 1
+    # A change to the file it was built from makes it stale again
+    recipes.write_text("Title\nPannkakor\nVåfflor\n")
+    assert load_snapshot(out) is None
@@ -0,0 +1,35 @@
+from telemetry import STAGE_SECONDS, end_trace, record_stage, set_intent, span, start_trace
+
+
+def stage_count(stage, intent):
+    entry = STAGE_SECONDS.values.get((stage, intent))
+    return sum(entry[0]) if entry else 0
+
+
+def test_stages_before_set_intent_get_the_resolved_intent():
+    before = stage_count("test_classify", "recipe_search"), stage_count("test_classify", "unknown")
+    trace, token = start_trace()
+    try:
+        with span("test_classify"):
+            pass
+        assert stage_count("test_classify", "recipe_search") == before[0]
+        set_intent("recipe_search")
+        record_stage("test_retrieve", 0.01)
+    finally:
+        end_trace(token)
+    assert stage_count("test_classify", "recipe_search") == before[0] + 1
+    assert stage_count("test_classify", "unknown") == before[1]
+    assert stage_count("test_retrieve", "recipe_search") >= 1
+    assert set(trace.summary()) == {"test_classify", "test_retrieve"}
+
+
+def test_unresolved_stages_are_observed_on_flush():
+    before = stage_count("test_lookup", "unknown")
+    trace, token = start_trace()
+    try:
+        record_stage("test_lookup", 0.001)
+    finally:
+        end_trace(token)
+    trace.flush()
+    trace.flush()
+    assert stage_count("test_lookup", "unknown") == before + 1
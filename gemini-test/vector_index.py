@@ -0,0 +1,113 @@
+from typing import Optional, Tuple
+
+import faiss
+import numpy as np
+
+# VECTOR INDEXES
+#
+# One place that builds the FAISS indexes for recipes (L2, like the notebook's
+# IndexFlatL2) and products (inner product over normalized vectors):
+#
+#   flat  exact float32                        4*d bytes per vector
+#   hnsw  graph over float32 vectors           4*d + ~8*M bytes
+#   ivf   inverted lists over float32 vectors  4*d bytes
+#   fp16  exact scan over float16 vectors      2*d bytes
+#   sq8   exact scan over int8 codes           d bytes
+#   pq    product quantization                 pq_m bytes (e.g. 768 dims -> 96)
+#
+# The compressed kinds (fp16, sq8, pq) can re-rank their top `k * rerank`
+# candidates with the full-precision rows of the memory-mapped embeddings .npy,
+# which only touches the pages of those rows.
+
+INDEX_KINDS = ("flat", "hnsw", "ivf", "fp16", "sq8", "pq")
+COMPRESSED_KINDS = ("fp16", "sq8", "pq")
+METRICS = {"ip": faiss.METRIC_INNER_PRODUCT, "l2": faiss.METRIC_L2}
+
+
+def pq_subquantizers(d: int, requested: int = 0) -> int:
+    """Number of PQ sub-vectors: `requested` if it divides d, else about d/8."""
+    if requested and d % requested == 0:
+        return requested
+    for m in range(max(1, d // 8), 0, -1):
+        if d % m == 0:
+            return m
+    return 1
+
+
+def build_index(embeddings: np.ndarray, kind: str = "flat", metric: str = "ip",
+                hnsw_m: int = 32, ef_construction: int = 80, ef_search: int = 64,
+                nlist: int = 0, nprobe: int = 8, pq_m: int = 0, pq_bits: int = 8):
+    """FAISS index of the given kind over `embeddings`."""
+    if kind not in INDEX_KINDS:
+        raise ValueError(f"Unknown index kind '{kind}'. Use one of {', '.join(INDEX_KINDS)}.")
+    xb = np.ascontiguousarray(embeddings, dtype=np.float32)
+    n, d = xb.shape
+    faiss_metric = METRICS[metric]
+    if kind == "flat":
+        index = faiss.IndexFlatIP(d) if metric == "ip" else faiss.IndexFlatL2(d)
+    elif kind == "hnsw":
+        index = faiss.IndexHNSWFlat(d, hnsw_m, faiss_metric)
+        index.hnsw.efConstruction = ef_construction
+        index.hnsw.efSearch = ef_search
+    elif kind == "ivf":
+        nlist = nlist or max(1, int(4 * np.sqrt(n)))
+        # Training needs a few points per list
+        nlist = max(1, min(nlist, n // 39 or 1))
+        quantizer = faiss.IndexFlatIP(d) if metric == "ip" else faiss.IndexFlatL2(d)
+        index = faiss.IndexIVFFlat(quantizer, d, nlist, faiss_metric)
+        index.train(xb)
+        index.nprobe = min(nprobe, nlist)
+    elif kind == "fp16":
+        index = faiss.IndexScalarQuantizer(d, faiss.ScalarQuantizer.QT_fp16, faiss_metric)
+    elif kind == "sq8":
+        index = faiss.IndexScalarQuantizer(d, faiss.ScalarQuantizer.QT_8bit, faiss_metric)
+        index.train(xb)
+    else:
+        # 2**bits centroids per sub-vector; k-means wants ~39 training points each
+        bits = max(1, min(pq_bits, int(np.log2(max(n // 39, 2)))))
+        index = faiss.IndexPQ(d, pq_subquantizers(d, pq_m), bits, faiss_metric)
+        index.train(xb)
+    index.add(xb)
+    return index
+
+
+def index_bytes(index) -> int:
+    """Serialized size of an index, a close proxy for its resident memory."""
+    return int(faiss.serialize_index(index).nbytes)
+
+
+def exact_rerank(queries: np.ndarray, candidates: np.ndarray, embeddings: np.ndarray,
+                 k: int, metric: str = "ip") -> Tuple[np.ndarray, np.ndarray]:
+    """Re-score candidate rows with the full-precision `embeddings`; same layout as index.search."""
+    nq = len(queries)
+    scores = np.full((nq, k), -np.inf if metric == "ip" else np.inf, dtype=np.float32)
+    rows = np.full((nq, k), -1, dtype=np.int64)
+    for i in range(nq):
+        cand = np.unique(candidates[i][candidates[i] >= 0])
+        if not len(cand):
+            continue
+        vecs = np.asarray(embeddings[cand], dtype=np.float32)
+        if metric == "ip":
+            s = vecs @ queries[i]
+            order = np.argsort(-s, kind="stable")[:k]
+        else:
+            s = ((vecs - queries[i]) ** 2).sum(axis=1)
+            order = np.argsort(s, kind="stable")[:k]
+        scores[i, :len(order)] = s[order]
+        rows[i, :len(order)] = cand[order]
+    return scores, rows
+
+
+def is_compressed(index) -> bool:
+    return isinstance(index, (faiss.IndexScalarQuantizer, faiss.IndexPQ))
+
+
+def search(index, queries: np.ndarray, k: int, embeddings: Optional[np.ndarray] = None,
+           rerank: int = 0, metric: str = "ip") -> Tuple[np.ndarray, np.ndarray]:
+    """index.search, re-ranking `k * rerank` candidates exactly when the index is compressed."""
+    xq = np.ascontiguousarray(queries, dtype=np.float32)
+    k = min(k, index.ntotal)
+    if rerank > 1 and embeddings is not None and is_compressed(index):
+        _, candidates = index.search(xq, min(k * rerank, index.ntotal))
+        return exact_rerank(xq, candidates, embeddings, k, metric)
+    return index.search(xq, k)
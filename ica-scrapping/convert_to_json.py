@@ -1,5 +1,6 @@
 import pandas as pd
 import json
+import re
 
 category_urls = {
     "meat": "https://handlaprivatkund.ica.se/stores/1004181/categories/k%C3%B6tt-chark-f%C3%A5gel/3ed155d4-01df-408f-bffc-f91e7404cab2?source=navigation",
@@ -15,6 +16,18 @@ category_urls = {
     "frozen": "https://handlaprivatkund.ica.se/stores/1004181/categories/fryst/4aeec528-18cd-4b0f-9c50-21ac44e6f3e7?source=navigation",
 }
 
+# "0.72kg 148,61 kr/kg" -> ("0.72kg", "148,61 kr/kg")
+SIZE_RE = re.compile(r"^(?P<size>.*?)\s*(?P<unit_price>\d[\d\s]*(?:,\d+)?\s*kr/\w+.*)?$")
+
+def split_size(value):
+    value = str(value).strip()
+    if not value or value.lower() == "nan":
+        return None, None
+    m = SIZE_RE.match(value)
+    size = (m.group("size") or "").strip() or None
+    unit_price = (m.group("unit_price") or "").strip() or None
+    return size, unit_price
+
 # input and output file paths
 for category in category_urls:
     csv_file = f"ica_category_data/ica_{category}_data.csv"
@@ -37,6 +50,13 @@ for category in category_urls:
             "url": str(row["url"]).strip(),
         }
 
+        # pack size and comparison price ("0.72kg", "148,61 kr/kg")
+        size, unit_price = split_size(row.get("Size", ""))
+        if size:
+            product["size"] = size
+        if unit_price:
+            product["unit_price"] = unit_price
+
         # process nutrition
         nutrition = {}
         for col in nutrition_fields:
@@ -14,6 +14,9 @@ GOOGLE_API_KEY = "your_google_api_key_here"
 os.environ["GOOGLE_API_KEY"] = GOOGLE_API_KEY
 genai.configure(api_key=GOOGLE_API_KEY)
 
+# Created once; generate_recipe reuses it for every question
+MODEL = genai.GenerativeModel('gemini-2.0-flash')
+
 # File paths
 ICA_CSV_PATH = "ica-scrapping/ica_category_data/ica_meat_data.csv"
 RECIPE_CSV_PATH = "recipe_data.csv"
@@ -126,8 +129,6 @@ def generate_recipe(user_query):
         context = "\n".join([doc.page_content for doc in relevant_docs])
         
         # Generate with Gemini
-        model = genai.GenerativeModel('gemini-2.0-flash')
-        
         prompt = f"""
 Based on the following nutrition and recipe information, answer the user's question about creating a recipe.
 
@@ -145,7 +146,7 @@ Provide a detailed recipe including:
 Use ingredients from the provided context when possible.
 """
         
-        response = model.generate_content(prompt)
+        response = MODEL.generate_content(prompt, request_options={"timeout": 60})
         
         # Add sources
         result = response.text + "\n\n--- Sources Used ---\n"